@@ -7,35 +7,56 @@ ve DSÖ klinik eşiklerini uygulayarak kansızlık durumunu belirler.
 
 Kullanım:
     streamlit run app.py
+
+Model kalibre edilmiş tahmin aralıkları içeriyorsa (train.py, bkz. calibration.py)
+aralık ve yanlış sınıflama olasılığı sabit sürede modelden okunur ve veri seti
+yüklenmez; aksi halde benzer vaka analizi kullanılır.
+
+Aşama süreleri (PIPELINE_METRICS_FILE ayarlıysa) metrics.py ile kaydedilir.
+
+Model bir eğitim profili içeriyorsa (train.py, bkz. drift.py) her tahminin
+girdileri sunucu işlemi başına tek bir izleyiciye kaydedilir; bir özellik
+eğitim dağılımından kaydığında sunucu konsoluna uyarı yazılır, form
+değişmez.
+
+Yeniden çalıştırma maliyeti: girdiler, cinsiyet düğmeleri ve sonuçlar bir
+fragment içindedir (st.fragment); bir düğmeye basmak veya değer değiştirmek
+yalnızca bu bölümü yeniden çalıştırır. Stil bloğu işlem başına bir kez
+oluşturulur ve yalnızca tam çalıştırmalarda (sayfa açılışı) gönderilir.
+Tahmin, karar ve belirsizlik sonuçları girdi demeti, cinsiyet, model ve veri
+seti sürümüne göre önbelleğe alınır.
 """
 
 import streamlit as st
-import joblib
-import pandas as pd
-import numpy as np
 import os
+import functools
+import metrics
 from utils import anemia_decision, get_threshold, normalize_gender
+from calibration import calibrated_uncertainty, format_interval, model_calibration
+from drift import format_alert, monitor_for_model
+from similarity import K_NEIGHBORS, summarize_neighbors
+from uncertainty_cache import UncertaintyCache, quantize_features
+from validation import RULE_RANGE, validate
 
 
 # Constants
-MODEL_PATH = os.path.join('model', 'hemoglobin_model.pkl')
+MODEL_DIR = 'model'
 DATA_PATH = os.path.join('data', 'anemia_new.csv')
-K_NEIGHBORS = 30  # Number of similar samples to consider
 
-# Valid ranges for input validation (soft warnings)
-VALID_RANGES = {
-    'RBC': (2.0, 7.0),
-    'MCV': (60.0, 120.0),
-    'MCH': (15.0, 40.0),
-    'MCHC': (25.0, 40.0)
-}
+# Uncertainty result cache (set UNCERTAINTY_CACHE_DB to share it across workers)
+UNCERTAINTY_CACHE_SIZE = 10_000
+UNCERTAINTY_CACHE_DB = os.environ.get('UNCERTAINTY_CACHE_DB')
 
-# Features used for similarity calculation
-SIMILARITY_FEATURES = ['RBC', 'MCV', 'MCH', 'MCHC']
+# Reference store encoding for similarity analysis: float32 (default), float16 or int8
+REFERENCE_ENCODING = os.environ.get('REFERENCE_ENCODING', 'float32')
 
+# Prediction results cached per input tuple (per server process)
+RESULT_CACHE_SIZE = 10_000
 
-def apply_custom_style():
-    """Apply custom CSS styling with animated gradient background."""
+
+@functools.lru_cache(maxsize=None)
+def custom_style_html():
+    """Page CSS (animated gradient background, gender buttons), built once per process."""
     
     # Dark mode colors
     bg_gradient = "linear-gradient(-45deg, #003FFF, #2E0EC7, #8B6AE6, #4CB4BB, #FF5772, #FFC600)"
@@ -46,7 +67,7 @@ def apply_custom_style():
     input_border = "rgba(255, 255, 255, 0.3)"
     divider_color = "rgba(255, 255, 255, 0.3)"
     
-    st.markdown(f"""
+    return f"""
     <style>
     /* Animated Gradient Background */
     .stApp {{
@@ -188,32 +209,148 @@ def apply_custom_style():
     .stCaption {{
         color: {text_secondary} !important;
     }}
+    
+    /* Gender buttons */
+    .gender-btn {{
+        display: flex;
+        flex-direction: column;
+        align-items: center;
+        justify-content: center;
+        padding: 1.5rem;
+        border-radius: 15px;
+        cursor: pointer;
+        transition: all 0.3s ease;
+        text-align: center;
+    }}
+    .gender-btn-female {{
+        background: linear-gradient(135deg, #FF6B9D, #FF5772);
+        border: 3px solid transparent;
+    }}
+    .gender-btn-male {{
+        background: linear-gradient(135deg, #4CB4BB, #2E9DA6);
+        border: 3px solid transparent;
+    }}
+    .gender-btn-selected {{
+        border: 3px solid #FFC600 !important;
+        box-shadow: 0 0 20px rgba(255, 198, 0, 0.5);
+        transform: scale(1.05);
+    }}
+    .gender-icon {{
+        font-size: 2.5rem;
+        margin-bottom: 0.5rem;
+    }}
+    .gender-label {{
+        color: white;
+        font-size: 1.1rem;
+        font-weight: bold;
+    }}
     </style>
-    """, unsafe_allow_html=True)
+    """
 
 
-@st.cache_resource
-def load_model():
-    """Load the trained model (cached for performance)."""
-    if not os.path.exists(MODEL_PATH):
+def apply_custom_style():
+    """Apply custom CSS styling with animated gradient background."""
+    st.markdown(custom_style_html(), unsafe_allow_html=True)
+
+
+def get_model_path():
+    """
+    Model in use: the registry's current version, else the top-level files.
+    
+    Returns:
+        tuple: (path or None, the registry's SHA-256 of it or None); both
+            come from one read of the registry pointer
+    """
+    from model_registry import current_model
+    # Checked once per version in load_model() instead of on every rerun
+    path, pointer = current_model(MODEL_DIR, verify=False)
+    return path, pointer['sha256'] if pointer else None
+
+
+@st.cache_resource(max_entries=1)
+def load_model(model_path, model_version=None, sha256=None):
+    """
+    Load the trained model (cached for the current model path and version
+    only).
+    
+    The path changes whenever a new registry version becomes current, so a
+    retrained model is picked up on the next rerun without a restart; the
+    previous model keeps serving until then and is then evicted, so
+    repeated retraining does not keep old models resident.
+    
+    Raises:
+        ValueError: If the file does not match the registry's `sha256`
+    """
+    if model_path is None:
         return None
-    return joblib.load(MODEL_PATH)
+    if sha256 is not None:
+        from model_registry import check_digest
+        check_digest(model_path, sha256)
+    if model_path.endswith('.json'):
+        from scoring import load_artifact
+        model = load_artifact(model_path)
+        return {'model': model, 'feature_columns': model.feature_columns}
+    
+    import joblib
+    return joblib.load(model_path)
 
 
-@st.cache_data
-def load_dataset():
-    """Load the dataset for similarity analysis (cached)."""
+def get_file_version(path):
+    """Identify the current version of a file (mtime + size), or None if missing."""
+    if not os.path.exists(path):
+        return None
+    stat = os.stat(path)
+    return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+
+def get_dataset_version():
+    """Identify the current dataset file version."""
+    return get_file_version(DATA_PATH)
+
+
+@st.cache_resource(max_entries=1)
+def load_reference_store(dataset_version=None):
+    """
+    Load the compact reference store for similarity analysis (cached for
+    the current dataset version only).
+    
+    Only SIMILARITY_FEATURES and Hb are kept, encoded as REFERENCE_ENCODING.
+    The arrays are read-only memory maps of the stored store (see
+    reference_store.py): every session searches the same pages without
+    copying them, and server processes share them through the OS page
+    cache, so memory does not grow with the number of sessions.
+    """
     if not os.path.exists(DATA_PATH):
         return None
-    return pd.read_csv(DATA_PATH)
+    
+    from reference_store import ReferenceStore
+    return ReferenceStore.from_csv(DATA_PATH, encoding=REFERENCE_ENCODING)
 
 
-def check_range(name, value, valid_range):
-    """Check if value is within typical range, return warning message if not."""
-    min_val, max_val = valid_range
-    if value < min_val or value > max_val:
-        return f"⚠️ {name} = {value} tipik aralığın dışında ({min_val} - {max_val})"
-    return None
+@st.cache_resource
+def get_uncertainty_cache():
+    """Shared uncertainty result cache (one per server process)."""
+    return UncertaintyCache(max_entries=UNCERTAINTY_CACHE_SIZE, db_path=UNCERTAINTY_CACHE_DB)
+
+
+@st.cache_resource(max_entries=1)
+def get_drift_monitor(model_version, _model_data):
+    """
+    Input drift monitor of the current model (one per server process).
+    
+    A new model version starts a fresh monitor against its own training
+    profile; None if the model has no profile (see drift.py).
+    """
+    return monitor_for_model(_model_data)
+
+
+def range_warnings(features):
+    """Warning messages for values outside their typical range (see validation.py)."""
+    report = validate(features, list(features))
+    return [
+        f"⚠️ {v['column']} = {v['value']} tipik aralığın dışında ({v['min']} - {v['max']})"
+        for v in report.violations(RULE_RANGE)
+    ]
 
 
 def predict_hemoglobin(model_data, features):
@@ -229,131 +366,291 @@ def predict_hemoglobin(model_data, features):
     return hemoglobin
 
 
-def find_similar_samples(df, input_features, k=K_NEIGHBORS):
+def render_calibrated(calibrated):
+    """Show the calibrated intervals and the anemia probability."""
+    st.markdown("")
+    st.markdown("#### 📊 Kalibre Edilmiş Tahmin Aralıkları")
+    
+    interval_cols = st.columns(len(calibrated['intervals']))
+    for col, (level, (lower, upper)) in zip(interval_cols, calibrated['intervals'].items()):
+        with col:
+            st.metric(
+                label=f"%{level * 100:.0f} Aralık",
+                value=format_interval(lower, upper, digits=1, unbounded="sınırsız"),
+                help=f"Gerçek Hb değeri bu aralıkta %{level * 100:.0f} olasılıkla bulunur (g/dL)"
+            )
+    
+    with st.expander("📈 Tahmin Belirsizliği Detayları"):
+        st.markdown("""
+        **Aralıklar nasıl hesaplanır?**
+        
+        Model eğitilirken ayrılan test örneklerindeki tahmin hataları, cinsiyete
+        ve tahmin edilen Hb düzeyine göre gruplanarak saklanır (bölünmüş uyumlu
+        tahmin). Aralık ve olasılıklar bu özetten okunur; veri seti taranmaz.
+        """)
+        st.markdown(f"**Kansızlık olasılığı:** %{calibrated['anemia_probability'] * 100:.0f}")
+        st.markdown(f"**Yanlış sınıflama olasılığı:** %{calibrated['misclassification_probability'] * 100:.0f}")
+        st.caption(f"*{calibrated['n_calibration']} test örneğiyle kalibre edilmiştir.*")
+
+
+def predict_result(features, gender, model_version, dataset_version, model_data, reference,
+                   calibration):
     """
-    Find K most similar samples in the dataset based on Euclidean distance.
+    Prediction, clinical decision and uncertainty for one input.
+    
+    Results are cached per server process, keyed by the raw input tuple,
+    gender, model version and dataset version, so pressing predict again
+    with unchanged inputs recomputes nothing.
     
     Args:
-        df: Dataset with features and true Hb values
-        input_features: Dictionary of input feature values
-        k: Number of nearest neighbors to return
+        features (dict): Blood parameters as entered
+        gender (str): "male" or "female"
+        model_version (str): Model path and file version
+        dataset_version (str): Dataset file version (None if unused)
+        model_data (dict): Loaded model
+        reference (ReferenceStore): Similarity reference store, or None
+        calibration (dict): The model's calibration summary, or None
     
     Returns:
-        DataFrame of similar samples with distances
+        dict: 'predicted_hb', 'status', 'threshold', 'calibrated', 'uncertainty'
     """
-    # Extract feature values from dataset
-    X_data = df[SIMILARITY_FEATURES].values
+    return _cached_result(tuple(sorted(features.items())), gender, model_version, dataset_version,
+                          model_data, reference, calibration)
+
+
+@st.cache_data(max_entries=RESULT_CACHE_SIZE, show_spinner=False)
+def _cached_result(features_key, gender, model_version, dataset_version,
+                   _model_data, _reference, _calibration):
+    """predict_result() body; underscored arguments are not hashed (their versions are)."""
+    features = dict(features_key)
+    
+    # Predict Hemoglobin
+    with metrics.stage('app.prediction'):
+        predicted_hb = float(predict_hemoglobin(_model_data, features))
+    
+    # Get clinical decision
+    status = anemia_decision(predicted_hb, gender)
+    threshold = get_threshold(gender)
+    
+    # Calibrated interval (constant time) or similar-sample uncertainty
+    calibrated = None
+    if _calibration is not None:
+        with metrics.stage('app.uncertainty'):
+            calibrated = calibrated_uncertainty(_calibration, predicted_hb, gender, threshold)
+    
+    uncertainty = None
+    if _reference is not None:
+        # The cached neighbors are those of the quantized input, so every
+        # input with the same key gets the same ones; the summary against
+        # this input's prediction is recomputed on every call
+        quantized = quantize_features(features)
+        
+        def compute_neighbors():
+            with metrics.stage('app.neighbor_search'):
+                similar_hb = _reference.nearest_hb(quantized, k=K_NEIGHBORS)
+            return {'neighbor_hb': similar_hb.tolist()}
+        
+        cache = get_uncertainty_cache()
+        # Neighbors only depend on the reference data, not on the model
+        cache_key = cache.make_key(quantized, f"{dataset_version}:{REFERENCE_ENCODING}", K_NEIGHBORS)
+        with metrics.stage('app.uncertainty_lookup'):
+            neighbors = cache.get_or_compute(cache_key, compute_neighbors)
+        with metrics.stage('app.uncertainty'):
+            uncertainty = summarize_neighbors(neighbors['neighbor_hb'], predicted_hb,
+                                              len(_reference))
     
-    # Build input vector
-    input_vector = np.array([input_features[col] for col in SIMILARITY_FEATURES])
+    return {
+        'predicted_hb': predicted_hb,
+        'status': status,
+        'threshold': threshold,
+        'calibrated': calibrated,
+        'uncertainty': uncertainty
+    }
+
+
+def render_results(result, gender):
+    """Show the prediction, uncertainty and anemia status."""
+    predicted_hb = result['predicted_hb']
+    status = result['status']
+    threshold = result['threshold']
+    calibrated = result['calibrated']
+    uncertainty = result['uncertainty']
     
-    # Calculate Euclidean distances
-    distances = np.sqrt(np.sum((X_data - input_vector) ** 2, axis=1))
+    st.markdown("---")
+    st.markdown("### 📊 Sonuçlar")
     
-    # Add distances to dataframe
-    df_with_dist = df.copy()
-    df_with_dist['_distance'] = distances
+    # Main prediction result
+    st.markdown(f"**Tahmini Hemoglobin: {predicted_hb:.2f} g/dL**")
     
-    # Sort by distance and get top K
-    similar = df_with_dist.nsmallest(k, '_distance')
+    # Uncertainty information with percentages
+    if calibrated:
+        st.markdown(
+            f"*%{calibrated['coverage'] * 100:.0f} tahmin aralığı: "
+            f"{format_interval(calibrated['lower'], calibrated['upper'], unbounded='sınırsız')} g/dL*"
+        )
+    if uncertainty:
+        st.markdown(
+            f"*Veri setindeki {uncertainty['n_samples']} benzer bireye dayanmaktadır*"
+        )
+        st.markdown(
+            f"*Tipik sapma: ±{uncertainty['typical_deviation']:.2f} g/dL*"
+        )
     
-    return similar
-
-
-def calculate_uncertainty(similar_samples, predicted_hb, total_samples):
-    """
-    Calculate prediction uncertainty based on similar samples.
+    st.markdown("")
     
-    Args:
-        similar_samples: DataFrame of similar samples
-        predicted_hb: Model's predicted Hemoglobin value
-        total_samples: Total number of samples in dataset
+    # Metrics in columns (4 columns to include confidence)
+    if uncertainty or calibrated:
+        result_col1, result_col2, result_col3, result_col4 = st.columns(4)
+    else:
+        result_col1, result_col2, result_col3 = st.columns(3)
+        result_col4 = None
     
-    Returns:
-        Dictionary with uncertainty metrics including percentages
-    """
-    true_hb_values = similar_samples['Hb'].values
+    with result_col1:
+        st.metric(
+            label="Tahmini Hb",
+            value=f"{predicted_hb:.2f} g/dL"
+        )
     
-    # Calculate metrics
-    mean_hb = np.mean(true_hb_values)
-    std_hb = np.std(true_hb_values)
-    min_hb = np.min(true_hb_values)
-    max_hb = np.max(true_hb_values)
+    with result_col2:
+        gender_display = "kadın" if gender == "female" else "erkek"
+        st.metric(
+            label="Eşik Değer",
+            value=f"{threshold:.1f} g/dL",
+            help=f"DSÖ {gender_display} eşiği"
+        )
     
-    # MAE between prediction and true values of similar samples
-    mae = np.mean(np.abs(true_hb_values - predicted_hb))
+    with result_col3:
+        st.metric(
+            label="Cinsiyet",
+            value="Kadın" if gender == "female" else "Erkek"
+        )
     
-    # Calculate percentage of similar samples within ±1 g/dL of prediction
-    within_1 = np.sum(np.abs(true_hb_values - predicted_hb) <= 1.0)
-    within_1_pct = (within_1 / len(true_hb_values)) * 100
+    if result_col4 and calibrated:
+        with result_col4:
+            st.metric(
+                label="Yanlış Sınıflama",
+                value=f"{calibrated['misclassification_probability'] * 100:.0f}%",
+                help="Kansızlık kararının gerçek Hb değerine göre yanlış olma olasılığı"
+            )
+    elif result_col4 and uncertainty:
+        with result_col4:
+            st.metric(
+                label="Güven",
+                value=f"{uncertainty['confidence_pct']:.0f}%",
+                help="Bilinen vakalara benzerliğe dayanmaktadır"
+            )
     
-    # Calculate percentage within ±2 g/dL
-    within_2 = np.sum(np.abs(true_hb_values - predicted_hb) <= 2.0)
-    within_2_pct = (within_2 / len(true_hb_values)) * 100
+    if calibrated:
+        render_calibrated(calibrated)
     
-    # Confidence score based on how close prediction is to mean of similar samples
-    # Lower difference = higher confidence
-    diff_from_mean = abs(predicted_hb - mean_hb)
-    # Scale: if diff is 0, confidence is 100%; if diff >= 3, confidence approaches 50%
-    confidence_pct = max(50, 100 - (diff_from_mean * 16.67))
-    confidence_pct = min(100, confidence_pct)
+    # Percentage metrics display
+    if uncertainty:
+        st.markdown("")
+        st.markdown("#### 📊 Benzerlik Analizi")
     
-    return {
-        'n_samples': len(similar_samples),
-        'total_samples': total_samples,
-        'mean_hb': mean_hb,
-        'std_hb': std_hb,
-        'min_hb': min_hb,
-        'max_hb': max_hb,
-        'mae': mae,
-        'typical_deviation': std_hb,
-        'within_1_pct': within_1_pct,
-        'within_2_pct': within_2_pct,
-        'confidence_pct': confidence_pct
-    }
-
-
-def main():
-    # Page configuration
-    st.set_page_config(
-        page_title="Kansızlık Teşhis Sistemi",
-        page_icon="🩸",
-        layout="centered"
-    )
+        pct_col1, pct_col2, pct_col3 = st.columns(3)
     
-    # Apply custom styling
-    apply_custom_style()
+        with pct_col1:
+            st.metric(
+                label="±1 g/dL İçinde",
+                value=f"{uncertainty['within_1_pct']:.0f}%",
+                help="Tahminin 1 g/dL içindeki benzer vakaların yüzdesi"
+            )
     
-    # Header
-    st.title("Hemoglobin Tahmini & Kansızlık Teşhisi")
+        with pct_col2:
+            st.metric(
+                label="±2 g/dL İçinde",
+                value=f"{uncertainty['within_2_pct']:.0f}%",
+                help="Tahminin 2 g/dL içindeki benzer vakaların yüzdesi"
+            )
+    
+        with pct_col3:
+            st.metric(
+                label="Eşleşme Oranı",
+                value=f"{(uncertainty['n_samples'] / uncertainty['total_samples'] * 100):.1f}%",
+                help=f"{uncertainty['total_samples']} örnekten {uncertainty['n_samples']} tanesi"
+            )
+    
+    # Uncertainty details (expandable)
+    if uncertainty:
+        with st.expander("📈 Tahmin Belirsizliği Detayları"):
+            st.markdown("""
+            **Belirsizlik nasıl hesaplanır?**
+    
+            Veri setimizdeki kan parametrelerine (RBC, MCV, MCH, MCHC) göre
+            benzer bireyleri bulur ve gerçek Hemoglobin değerlerindeki
+            varyasyonu analiz ederiz.
+            """)
+    
+            unc_col1, unc_col2 = st.columns(2)
+    
+            with unc_col1:
+                st.markdown(f"**Benzer örnekler:** {uncertainty['n_samples']}")
+                st.markdown(f"**Gruptaki ortalama Hb:** {uncertainty['mean_hb']:.2f} g/dL")
+                st.markdown(f"**Standart sapma:** ±{uncertainty['std_hb']:.2f} g/dL")
+    
+            with unc_col2:
+                st.markdown(f"**Gruptaki Hb aralığı:** {uncertainty['min_hb']:.1f} - {uncertainty['max_hb']:.1f} g/dL")
+                st.markdown(f"**Tahmin vs. grup MAE:** {uncertainty['mae']:.2f} g/dL")
+    
+            st.caption("*Sapma, veri setindeki benzer vakalar kullanılarak hesaplanmıştır.*")
+    
+    # Anemia status with appropriate styling
     st.markdown("---")
     
+    gender_display = "kadın" if gender == "female" else "erkek"
+    if status == "Kansızlık":
+        st.error(f"### ⚠️ Sonuç: **Kansızlık**")
+        st.markdown(f"Tahmini Hemoglobin ({predicted_hb:.2f} g/dL), {gender_display} için eşik değerin ({threshold:.1f} g/dL) altındadır.")
+    else:
+        st.success(f"### ✅ Sonuç: **Kansızlık Yok**")
+        st.markdown(f"Tahmini Hemoglobin ({predicted_hb:.2f} g/dL), {gender_display} için eşik değer ({threshold:.1f} g/dL) veya üzerindedir.")
+    
+    # Clinical note
+    st.info("💡 **Not:** Bu, eğitim amaçlı bir karar destek aracıdır. Klinik teşhis, sağlık uzmanları tarafından kapsamlı bir değerlendirme gerektirir.")
+
+
+def select_gender(gender):
+    """Gender button callback; runs before the rerun, so the buttons show the new choice."""
+    st.session_state.selected_gender = gender
+
+
+@st.fragment
+def prediction_form():
+    """
+    Inputs, gender selection and results.
+    
+    Interactions in here rerun only this fragment; the page style, header
+    and about section are not sent again. The model and dataset versions
+    are checked on every fragment run, so a new model version is used
+    from the next interaction on.
+    """
+    rerun_start = metrics.clock()
+    
     # Load model and dataset
-    model_data = load_model()
-    dataset = load_dataset()
+    with metrics.stage('app.model_load'):
+        model_path, model_sha256 = get_model_path()
+        model_version = model_path and f"{model_path}@{get_file_version(model_path)}"
+        try:
+            model_data = load_model(model_path, model_version, model_sha256)
+        except ValueError as e:
+            st.error(f"❌ Model dosyası doğrulanamadı: {e}")
+            st.stop()
     
     if model_data is None:
         st.error("❌ Model dosyası bulunamadı. Lütfen önce `python train.py` komutunu çalıştırın.")
         st.stop()
     
-    if dataset is None:
-        st.warning("⚠️ Veri seti bulunamadı. Belirsizlik analizi kullanılamayacak.")
-    
-    # Model info
-    with st.expander("Bu sistem hakkında"):
-        st.markdown("""
-        Bu sistem, kan parametrelerinden Hemoglobin (Hb) değerlerini tahmin etmek için
-        **Lineer Regresyon** kullanır, ardından kansızlık durumunu belirlemek için
-        **DSÖ klinik eşiklerini** uygular.
-        
-        **Kansızlık Eşikleri (DSÖ):**
-        - Erkek: Hb < 13 g/dL → Kansızlık
-        - Kadın: Hb < 12 g/dL → Kansızlık
+    # Calibrated models need no reference dataset
+    calibration = model_calibration(model_data)
+    reference = dataset_version = None
+    if calibration is None:
+        with metrics.stage('app.dataset_load'):
+            dataset_version = get_dataset_version()
+            reference = load_reference_store(dataset_version)
         
-        **Tahmin Belirsizliği:**
-        Sistem, tipik bir sapma aralığı sağlamak için girdinizi veri setindeki
-        benzer bireylerle karşılaştırır.
-        """)
+        if reference is None:
+            st.warning("⚠️ Veri seti bulunamadı. Belirsizlik analizi kullanılamayacak.")
     
     st.markdown("### Kan Parametrelerini Girin")
     
@@ -405,69 +702,30 @@ def main():
     if 'selected_gender' not in st.session_state:
         st.session_state.selected_gender = "female"
     
-    # Custom CSS for gender buttons
-    st.markdown("""
-    <style>
-    .gender-btn {
-        display: flex;
-        flex-direction: column;
-        align-items: center;
-        justify-content: center;
-        padding: 1.5rem;
-        border-radius: 15px;
-        cursor: pointer;
-        transition: all 0.3s ease;
-        text-align: center;
-    }
-    .gender-btn-female {
-        background: linear-gradient(135deg, #FF6B9D, #FF5772);
-        border: 3px solid transparent;
-    }
-    .gender-btn-male {
-        background: linear-gradient(135deg, #4CB4BB, #2E9DA6);
-        border: 3px solid transparent;
-    }
-    .gender-btn-selected {
-        border: 3px solid #FFC600 !important;
-        box-shadow: 0 0 20px rgba(255, 198, 0, 0.5);
-        transform: scale(1.05);
-    }
-    .gender-icon {
-        font-size: 2.5rem;
-        margin-bottom: 0.5rem;
-    }
-    .gender-label {
-        color: white;
-        font-size: 1.1rem;
-        font-weight: bold;
-    }
-    </style>
-    """, unsafe_allow_html=True)
-    
     # Gender selection buttons
     gender_col1, gender_col2 = st.columns(2)
     
     with gender_col1:
         female_selected = st.session_state.selected_gender == "female"
-        if st.button(
+        st.button(
             "👩 Kadın",
             key="female_btn",
             use_container_width=True,
-            type="primary" if female_selected else "secondary"
-        ):
-            st.session_state.selected_gender = "female"
-            st.rerun()
+            type="primary" if female_selected else "secondary",
+            on_click=select_gender,
+            args=("female",)
+        )
     
     with gender_col2:
         male_selected = st.session_state.selected_gender == "male"
-        if st.button(
-            "👨 Erkek", 
+        st.button(
+            "👨 Erkek",
             key="male_btn",
             use_container_width=True,
-            type="primary" if male_selected else "secondary"
-        ):
-            st.session_state.selected_gender = "male"
-            st.rerun()
+            type="primary" if male_selected else "secondary",
+            on_click=select_gender,
+            args=("male",)
+        )
     
     gender = st.session_state.selected_gender
     
@@ -481,157 +739,83 @@ def main():
     if st.button("🔬 Hemoglobin Tahmin Et", type="primary", use_container_width=True):
         
         # Show range warnings
-        warnings = []
-        warnings.append(check_range('RBC', rbc, VALID_RANGES['RBC']))
-        warnings.append(check_range('MCV', mcv, VALID_RANGES['MCV']))
-        warnings.append(check_range('MCH', mch, VALID_RANGES['MCH']))
-        warnings.append(check_range('MCHC', mchc, VALID_RANGES['MCHC']))
+        validation_start = metrics.clock()
+        warnings = range_warnings({'RBC': rbc, 'MCV': mcv, 'MCH': mch, 'MCHC': mchc})
         
         # Display warnings if any
-        warnings = [w for w in warnings if w is not None]
         if warnings:
             for w in warnings:
                 st.warning(w)
         
-        # Build features
+        # Raw inputs: the prediction and the decision near the thresholds
+        # must not depend on caching (only the neighbor search and its
+        # cache key use quantized values, see _cached_result)
         features = {
             'RBC': rbc,
             'MCV': mcv,
             'MCH': mch,
             'MCHC': mchc
         }
+        metrics.observe_since('app.input_validation', validation_start)
         
-        # Predict Hemoglobin
-        predicted_hb = predict_hemoglobin(model_data, features)
+        # Every prediction counts towards drift, cached results included
+        monitor = get_drift_monitor(model_version, model_data)
+        if monitor is not None:
+            with metrics.stage('app.drift'):
+                for alert in monitor.observe(features, gender):
+                    print(f"WARNING: {format_alert(alert)}")
         
-        # Get clinical decision
-        status = anemia_decision(predicted_hb, gender)
-        threshold = get_threshold(gender)
-        
-        # Calculate uncertainty if dataset is available
-        uncertainty = None
-        if dataset is not None:
-            similar_samples = find_similar_samples(dataset, features, k=K_NEIGHBORS)
-            uncertainty = calculate_uncertainty(similar_samples, predicted_hb, len(dataset))
+        # Same inputs, gender and versions -> cached result, nothing recomputed
+        with metrics.stage('app.result_lookup'):
+            result = predict_result(features, gender, model_version, dataset_version,
+                                    model_data, reference, calibration)
         
         # Display results
-        st.markdown("---")
-        st.markdown("### 📊 Sonuçlar")
-        
-        # Main prediction result
-        st.markdown(f"**Tahmini Hemoglobin: {predicted_hb:.2f} g/dL**")
-        
-        # Uncertainty information with percentages
-        if uncertainty:
-            st.markdown(
-                f"*Veri setindeki {uncertainty['n_samples']} benzer bireye dayanmaktadır*"
-            )
-            st.markdown(
-                f"*Tipik sapma: ±{uncertainty['typical_deviation']:.2f} g/dL*"
-            )
-        
-        st.markdown("")
-        
-        # Metrics in columns (4 columns to include confidence)
-        if uncertainty:
-            result_col1, result_col2, result_col3, result_col4 = st.columns(4)
-        else:
-            result_col1, result_col2, result_col3 = st.columns(3)
-            result_col4 = None
-        
-        with result_col1:
-            st.metric(
-                label="Tahmini Hb",
-                value=f"{predicted_hb:.2f} g/dL"
-            )
-        
-        with result_col2:
-            gender_display = "kadın" if gender == "female" else "erkek"
-            st.metric(
-                label="Eşik Değer",
-                value=f"{threshold:.1f} g/dL",
-                help=f"DSÖ {gender_display} eşiği"
-            )
-        
-        with result_col3:
-            st.metric(
-                label="Cinsiyet",
-                value="Kadın" if gender == "female" else "Erkek"
-            )
-        
-        if result_col4 and uncertainty:
-            with result_col4:
-                st.metric(
-                    label="Güven",
-                    value=f"{uncertainty['confidence_pct']:.0f}%",
-                    help="Bilinen vakalara benzerliğe dayanmaktadır"
-                )
-        
-        # Percentage metrics display
-        if uncertainty:
-            st.markdown("")
-            st.markdown("#### 📊 Benzerlik Analizi")
-            
-            pct_col1, pct_col2, pct_col3 = st.columns(3)
-            
-            with pct_col1:
-                st.metric(
-                    label="±1 g/dL İçinde",
-                    value=f"{uncertainty['within_1_pct']:.0f}%",
-                    help="Tahminin 1 g/dL içindeki benzer vakaların yüzdesi"
-                )
-            
-            with pct_col2:
-                st.metric(
-                    label="±2 g/dL İçinde",
-                    value=f"{uncertainty['within_2_pct']:.0f}%",
-                    help="Tahminin 2 g/dL içindeki benzer vakaların yüzdesi"
-                )
-            
-            with pct_col3:
-                st.metric(
-                    label="Eşleşme Oranı",
-                    value=f"{(uncertainty['n_samples'] / uncertainty['total_samples'] * 100):.1f}%",
-                    help=f"{uncertainty['total_samples']} örnekten {uncertainty['n_samples']} tanesi"
-                )
-        
-        # Uncertainty details (expandable)
-        if uncertainty:
-            with st.expander("📈 Tahmin Belirsizliği Detayları"):
-                st.markdown("""
-                **Belirsizlik nasıl hesaplanır?**
-                
-                Veri setimizdeki kan parametrelerine (RBC, MCV, MCH, MCHC) göre
-                benzer bireyleri bulur ve gerçek Hemoglobin değerlerindeki
-                varyasyonu analiz ederiz.
-                """)
-                
-                unc_col1, unc_col2 = st.columns(2)
-                
-                with unc_col1:
-                    st.markdown(f"**Benzer örnekler:** {uncertainty['n_samples']}")
-                    st.markdown(f"**Gruptaki ortalama Hb:** {uncertainty['mean_hb']:.2f} g/dL")
-                    st.markdown(f"**Standart sapma:** ±{uncertainty['std_hb']:.2f} g/dL")
-                
-                with unc_col2:
-                    st.markdown(f"**Gruptaki Hb aralığı:** {uncertainty['min_hb']:.1f} - {uncertainty['max_hb']:.1f} g/dL")
-                    st.markdown(f"**Tahmin vs. grup MAE:** {uncertainty['mae']:.2f} g/dL")
-                
-                st.caption("*Sapma, veri setindeki benzer vakalar kullanılarak hesaplanmıştır.*")
-        
-        # Anemia status with appropriate styling
-        st.markdown("---")
+        render_start = metrics.clock()
+        render_results(result, gender)
+        metrics.observe_since('app.render', render_start)
+    
+    metrics.observe_since('app.fragment_rerun', rerun_start)
+    metrics.flush()
+
+
+def main():
+    rerun_start = metrics.clock()
+    
+    # Page configuration
+    st.set_page_config(
+        page_title="Kansızlık Teşhis Sistemi",
+        page_icon="🩸",
+        layout="centered"
+    )
+    
+    # Apply custom styling (full runs only; fragment reruns keep it)
+    apply_custom_style()
+    
+    # Header
+    st.title("Hemoglobin Tahmini & Kansızlık Teşhisi")
+    st.markdown("---")
+    
+    # Model info
+    with st.expander("Bu sistem hakkında"):
+        st.markdown("""
+        Bu sistem, kan parametrelerinden Hemoglobin (Hb) değerlerini tahmin etmek için
+        **Lineer Regresyon** kullanır, ardından kansızlık durumunu belirlemek için
+        **DSÖ klinik eşiklerini** uygular.
         
-        gender_display = "kadın" if gender == "female" else "erkek"
-        if status == "Kansızlık":
-            st.error(f"### ⚠️ Sonuç: **Kansızlık**")
-            st.markdown(f"Tahmini Hemoglobin ({predicted_hb:.2f} g/dL), {gender_display} için eşik değerin ({threshold:.1f} g/dL) altındadır.")
-        else:
-            st.success(f"### ✅ Sonuç: **Kansızlık Yok**")
-            st.markdown(f"Tahmini Hemoglobin ({predicted_hb:.2f} g/dL), {gender_display} için eşik değer ({threshold:.1f} g/dL) veya üzerindedir.")
+        **Kansızlık Eşikleri (DSÖ):**
+        - Erkek: Hb < 13 g/dL → Kansızlık
+        - Kadın: Hb < 12 g/dL → Kansızlık
         
-        # Clinical note
-        st.info("💡 **Not:** Bu, eğitim amaçlı bir karar destek aracıdır. Klinik teşhis, sağlık uzmanları tarafından kapsamlı bir değerlendirme gerektirir.")
+        **Tahmin Belirsizliği:**
+        Kalibre edilmiş modellerde tahmin aralığı ve yanlış sınıflama olasılığı
+        eğitimde ayrılan test örneklerinin hatalarından hesaplanır; diğer
+        modellerde sistem, tipik bir sapma aralığı sağlamak için girdinizi veri
+        setindeki benzer bireylerle karşılaştırır.
+        """)
+    
+    # Inputs, gender selection and results (reruns on their own)
+    prediction_form()
     
     # Footer
     st.markdown("---")
@@ -641,6 +825,9 @@ def main():
         "</div>",
         unsafe_allow_html=True
     )
+    
+    metrics.observe_since('app.rerun', rerun_start)
+    metrics.flush()
 
 
 if __name__ == "__main__":
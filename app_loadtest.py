@@ -0,0 +1,425 @@
+"""
+Concurrent-Session Load Test for the Streamlit App
+
+Measures how many clinicians one app.py server process can serve. The
+harness starts `streamlit run app.py` and connects N simulated browser
+sessions to it over Streamlit's WebSocket protocol. Each session opens
+the page and then repeats a workflow for CBC values sampled from the
+dataset: enter the four values, pick the gender, press "Tahmin Et". As
+in the browser, every interaction is one rerun request (a fragment rerun
+for widgets inside st.fragment), carrying the current widget values, and
+its latency is the time until the server reports the run finished.
+
+Each session count runs against a fresh server, so the first page load
+pays the cold model load and the peak RSS belongs to that level alone;
+one warm-up page load precedes the measurement. Reported per N:
+    - rerun latency p50/p95/p99/max, overall and per action
+    - throughput (reruns/sec and predictions/sec)
+    - server CPU time, as cores kept busy on average
+    - server RSS after warm-up and at its peak
+
+Server RSS and CPU are read from /proc on Linux, elsewhere from psutil
+if it is installed. The client runs on the same machine; on hosts with
+few cores its own CPU use shows up in the latencies. The client ACKs
+every message immediately (TCP_QUICKACK on Linux): the server does not
+set TCP_NODELAY, so with the usual delayed ACKs of a browser's TCP stack
+the end of each run can arrive ~40 ms later than measured here.
+
+Usage:
+    python app_loadtest.py --sessions 1 2 4 8 16 --workflows 20
+    python app_loadtest.py --sessions 8 --think-ms 500 --output capacity.json
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import subprocess
+import http.client
+
+import numpy as np
+
+
+# Constants
+APP_PATH = 'app.py'
+DATA_PATH = os.path.join('data', 'anemia_new.csv')
+FEATURE_COLUMNS = ['RBC', 'MCV', 'MCH', 'MCHC']
+DEFAULT_SESSIONS = [1, 2, 4, 8]
+DEFAULT_WORKFLOWS = 20
+DEFAULT_PORT = 8599
+SERVER_START_TIMEOUT = 60  # seconds
+RUN_TIMEOUT = 60  # seconds per rerun
+RANDOM_STATE = 42
+
+# Rerun kinds, in workflow order
+ACTION_PAGE_LOAD = 'page_load'
+ACTION_INPUT = 'input'
+ACTION_GENDER = 'gender'
+ACTION_PREDICT = 'predict'
+ACTIONS = (ACTION_PAGE_LOAD, ACTION_INPUT, ACTION_GENDER, ACTION_PREDICT)
+
+# Widget labels in app.py, in FEATURE_COLUMNS order
+INPUT_LABELS = ['RBC (milyon hücre/mcL)', 'MCV (fL)', 'MCH (pg)', 'MCHC (g/dL)']
+INPUT_BOUNDS = [(0.0, 10.0), (0.0, 150.0), (0.0, 50.0), (0.0, 50.0)]
+GENDER_BUTTON_KEYS = {'female': 'female_btn', 'male': 'male_btn'}
+PREDICT_LABEL = 'Tahmin Et'
+
+
+def build_workflows(n_sessions, n_workflows, seed=RANDOM_STATE):
+    """
+    Sample CBC inputs for every session from the dataset.
+    
+    Returns:
+        list: Per session, a list of (values, 'female' or 'male') tuples
+    """
+    import pandas as pd
+    
+    df = pd.read_csv(DATA_PATH).dropna(subset=FEATURE_COLUMNS + ['Gender'])
+    rows = df.sample(n=n_sessions * n_workflows, replace=True, random_state=seed)
+    
+    low, high = np.array(INPUT_BOUNDS).T
+    values = np.clip(rows[FEATURE_COLUMNS].to_numpy(dtype=float), low, high)
+    genders = ['male' if str(g).lower().startswith('m') else 'female' for g in rows['Gender']]
+    workflows = list(zip(values.tolist(), genders))
+    return [workflows[i * n_workflows:(i + 1) * n_workflows] for i in range(n_sessions)]
+
+
+class Session:
+    """
+    One simulated browser tab on the app's WebSocket stream.
+    
+    Widgets are looked up by label (buttons by key) in the elements of the
+    last run; their values are sent with every rerun, as the browser does.
+    """
+    
+    def __init__(self, websocket):
+        self._ws = websocket
+        self._socket = websocket.transport.get_extra_info('socket')
+        self.widgets = {}  # label or key -> (widget id, fragment id)
+        self._values = {}  # widget id -> WidgetState with its current value
+    
+    async def rerun(self, trigger=None):
+        """
+        Request a rerun and wait until it finishes.
+        
+        Args:
+            trigger (str): Label or key of a widget whose change caused the
+                rerun (None: full page run)
+        
+        Returns:
+            list: Exception messages shown by the app during the run
+        """
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+        from streamlit.proto.WidgetStates_pb2 import WidgetState
+        
+        msg = BackMsg()
+        states = dict(self._values)
+        if trigger is not None:
+            widget_id, fragment_id = self.widgets[trigger]
+            msg.rerun_script.fragment_id = fragment_id
+            if widget_id not in states:
+                states[widget_id] = WidgetState(id=widget_id, trigger_value=True)
+        msg.rerun_script.widget_states.widgets.extend(states.values())
+        await self._ws.send(msg.SerializeToString())
+        
+        errors = []
+        while True:
+            forward = ForwardMsg()
+            forward.ParseFromString(await self._ws.recv())
+            self._quick_ack()
+            kind = forward.WhichOneof('type')
+            if kind == 'script_finished':
+                if forward.script_finished == ForwardMsg.FINISHED_WITH_COMPILE_ERROR:
+                    errors.append("Script compilation error")
+                return errors
+            if kind != 'delta' or forward.delta.WhichOneof('type') != 'new_element':
+                continue
+            
+            element = forward.delta.new_element
+            element_type = element.WhichOneof('type')
+            if element_type == 'exception':
+                errors.append(element.exception.message)
+            elif element_type in ('number_input', 'button'):
+                widget = getattr(element, element_type)
+                entry = (widget.id, forward.delta.fragment_id)
+                self.widgets[widget.label] = entry
+                # Keyed widget ids end with '-<key>'
+                self.widgets[widget.id.rsplit('-', 1)[-1]] = entry
+    
+    def _quick_ack(self):
+        """
+        Acknowledge received data right away (Linux).
+        
+        The server sends small messages without TCP_NODELAY; with delayed
+        ACKs the last message of a run would wait ~40 ms for the client's
+        ACK, which would hide the server's own cost.
+        """
+        if self._socket is not None and hasattr(socket, 'TCP_QUICKACK'):
+            self._socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_QUICKACK, 1)
+    
+    def set_value(self, label, value):
+        """Set a number input's value for the next rerun."""
+        from streamlit.proto.WidgetStates_pb2 import WidgetState
+        
+        widget_id = self.widgets[label][0]
+        self._values[widget_id] = WidgetState(id=widget_id, double_value=float(value))
+    
+    def find(self, text):
+        """Label or key of the first known widget containing text."""
+        return next(label for label in self.widgets if text in label)
+
+
+async def _run_session(url, workflows, think_seconds, latencies, errors):
+    """Page load, then input/gender/predict reruns for each workflow."""
+    import websockets
+    
+    async def timed(action, session, trigger=None):
+        start = time.perf_counter()
+        try:
+            run_errors = await asyncio.wait_for(session.rerun(trigger), RUN_TIMEOUT)
+        except asyncio.TimeoutError:
+            errors.append(f"{action}: no response within {RUN_TIMEOUT} s")
+            return
+        latencies[action].append(time.perf_counter() - start)
+        errors.extend(f"{action}: {message}" for message in run_errors)
+        await asyncio.sleep(think_seconds)
+    
+    async with websockets.connect(url, subprotocols=['streamlit'], max_size=None) as ws:
+        session = Session(ws)
+        await timed(ACTION_PAGE_LOAD, session)
+        predict = session.find(PREDICT_LABEL)
+        for values, gender in workflows:
+            for label, value in zip(INPUT_LABELS, values):
+                session.set_value(label, value)
+                await timed(ACTION_INPUT, session, label)
+            await timed(ACTION_GENDER, session, GENDER_BUTTON_KEYS[gender])
+            await timed(ACTION_PREDICT, session, predict)
+
+
+def _process_usage(pid):
+    """
+    Resident memory and CPU time of a process.
+    
+    Returns:
+        tuple: (RSS MB, peak RSS MB, CPU seconds); None where unavailable
+    """
+    status_path = f"/proc/{pid}/status"
+    if os.path.exists(status_path):
+        with open(status_path) as f:
+            fields = dict(line.split(':', 1) for line in f if ':' in line)
+        with open(f"/proc/{pid}/stat") as f:
+            # utime and stime, after the parenthesized command name
+            stat = f.read().rsplit(')', 1)[1].split()
+        cpu = (int(stat[11]) + int(stat[12])) / os.sysconf('SC_CLK_TCK')
+        rss_mb = int(fields['VmRSS'].split()[0]) / 1024
+        return rss_mb, int(fields['VmHWM'].split()[0]) / 1024, cpu
+    
+    try:
+        import psutil
+    except ImportError:
+        return None, None, None
+    process = psutil.Process(pid)
+    memory = process.memory_info()
+    times = process.cpu_times()
+    # Only Windows reports the peak; elsewhere the current RSS stands in
+    peak = getattr(memory, 'peak_wset', memory.rss)
+    return memory.rss / (1 << 20), peak / (1 << 20), times.user + times.system
+
+
+def _wait_for_server(port, process):
+    """Poll the health endpoint until the server answers."""
+    deadline = time.perf_counter() + SERVER_START_TIMEOUT
+    while time.perf_counter() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"streamlit exited with code {process.returncode}")
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            conn.request('GET', '/_stcore/health')
+            if conn.getresponse().status == 200:
+                conn.close()
+                return
+            conn.close()
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"streamlit did not start within {SERVER_START_TIMEOUT} s")
+
+
+def start_server(port):
+    """Start `streamlit run app.py` headless on a local port."""
+    command = [
+        sys.executable, '-m', 'streamlit', 'run', APP_PATH,
+        '--server.headless', 'true',
+        '--server.port', str(port),
+        '--server.fileWatcherType', 'none',
+        '--browser.gatherUsageStats', 'false'
+    ]
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    try:
+        _wait_for_server(port, process)
+    except RuntimeError:
+        process.kill()
+        raise
+    return process
+
+
+def _percentiles(seconds):
+    """Latency percentiles in milliseconds."""
+    ms = np.asarray(seconds) * 1000.0
+    if not len(ms):
+        return {'count': 0}
+    return {
+        'count': int(len(ms)),
+        'p50_ms': float(np.percentile(ms, 50)),
+        'p95_ms': float(np.percentile(ms, 95)),
+        'p99_ms': float(np.percentile(ms, 99)),
+        'max_ms': float(ms.max())
+    }
+
+
+def run_sessions(n_sessions, n_workflows, think_ms=0.0, port=DEFAULT_PORT, seed=RANDOM_STATE):
+    """
+    Run N concurrent sessions against a fresh app server.
+    
+    Args:
+        n_sessions (int): Concurrent sessions
+        n_workflows (int): Input/gender/predict workflows per session
+        think_ms (float): Pause after each interaction (0 = closed loop,
+            measures saturation)
+        port (int): Local port for the server
+        seed (int): Seed for the sampled inputs
+    
+    Returns:
+        dict: Throughput, server CPU and RSS, and latency percentiles
+            ('latency' over all interaction reruns, 'actions' per kind)
+    """
+    url = f"ws://127.0.0.1:{port}/_stcore/stream"
+    workflows = build_workflows(n_sessions, n_workflows, seed)
+    latencies = {action: [] for action in ACTIONS}
+    errors = []
+    
+    async def run_all():
+        # Warm-up: the first run loads the model and reference data
+        await _run_session(url, [], 0.0, {ACTION_PAGE_LOAD: []}, errors)
+        usage_start = _process_usage(server.pid)
+        start = time.perf_counter()
+        await asyncio.gather(*[
+            _run_session(url, workflows[i], think_ms / 1000.0, latencies, errors)
+            for i in range(n_sessions)
+        ])
+        return usage_start, time.perf_counter() - start
+    
+    server = start_server(port)
+    try:
+        (rss_idle, _, cpu_start), elapsed = asyncio.run(run_all())
+        _, peak_rss, cpu_end = _process_usage(server.pid)
+    finally:
+        server.terminate()
+        server.wait()
+    
+    cpu = cpu_end - cpu_start if cpu_start is not None else None
+    interactions = [s for action in ACTIONS[1:] for s in latencies[action]]
+    reruns = len(interactions) + len(latencies[ACTION_PAGE_LOAD])
+    predictions = len(latencies[ACTION_PREDICT])
+    return {
+        'sessions': n_sessions,
+        'reruns': reruns,
+        'predictions': predictions,
+        'errors': len(errors),
+        'first_error': errors[0] if errors else None,
+        'seconds': elapsed,
+        'reruns_per_sec': reruns / elapsed if elapsed > 0 else 0.0,
+        'predictions_per_sec': predictions / elapsed if elapsed > 0 else 0.0,
+        'cpu_seconds': cpu,
+        'cpu_cores': cpu / elapsed if cpu is not None and elapsed > 0 else None,
+        'rss_idle_mb': rss_idle,
+        'peak_rss_mb': peak_rss,
+        'latency': _percentiles(interactions),
+        'actions': {action: _percentiles(latencies[action]) for action in ACTIONS}
+    }
+
+
+def print_results(results):
+    """Print the capacity curve as a table."""
+    def fmt(value, spec):
+        return format(value, spec) if value is not None else '-'
+    
+    print()
+    print("-" * 60)
+    print("  APP CAPACITY (per-rerun latency, ms)")
+    print("-" * 60)
+    print(f"  {'N':>3} {'p50':>7} {'p95':>7} {'p99':>7} {'rerun/s':>8} "
+          f"{'pred/s':>7} {'CPU':>5} {'RSS MB':>7}")
+    for r in results:
+        lat = r['latency']
+        if not lat['count']:
+            print(f"  {r['sessions']:>3}  no completed reruns")
+            continue
+        print(f"  {r['sessions']:>3} {lat['p50_ms']:>7.1f} {lat['p95_ms']:>7.1f} "
+              f"{lat['p99_ms']:>7.1f} {r['reruns_per_sec']:>8.1f} "
+              f"{r['predictions_per_sec']:>7.1f} {fmt(r['cpu_cores'], '>5.2f')} "
+              f"{fmt(r['peak_rss_mb'], '>7.0f')}")
+    
+    print()
+    print("  p95 by action (ms):")
+    for r in results:
+        parts = [
+            f"{action} {r['actions'][action]['p95_ms']:.1f}"
+            for action in ACTIONS if r['actions'][action]['count']
+        ]
+        print(f"  {r['sessions']:>3}  " + ", ".join(parts))
+    
+    for r in results:
+        if r['errors']:
+            print(f"  N={r['sessions']}: {r['errors']} errors, first: {r['first_error']}")
+    print("-" * 60)
+    print()
+
+
+def parse_args(argv=None):
+    """Parse command-line arguments."""
+    parser = argparse.ArgumentParser(description="Concurrent-session load test for app.py")
+    parser.add_argument('--sessions', type=int, nargs='+', default=DEFAULT_SESSIONS,
+                        help="Concurrent session counts to measure")
+    parser.add_argument('--workflows', type=int, default=DEFAULT_WORKFLOWS,
+                        help="Input/gender/predict workflows per session")
+    parser.add_argument('--think-ms', type=float, default=0.0,
+                        help="Pause after each interaction (default: none)")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--output', help="Write the results as JSON")
+    args = parser.parse_args(argv)
+    
+    if any(n <= 0 for n in args.sessions) or args.workflows <= 0:
+        parser.error("--sessions and --workflows must be positive")
+    if args.think_ms < 0:
+        parser.error("--think-ms cannot be negative")
+    if not os.path.exists(APP_PATH):
+        parser.error(f"{APP_PATH} not found; run from the project directory")
+    
+    return args
+
+
+def main(argv=None):
+    """Measure the capacity curve and print a summary."""
+    args = parse_args(argv)
+    
+    print(f"Running {args.workflows} workflows per session against {APP_PATH} "
+          f"(think time {args.think_ms:g} ms)...")
+    results = []
+    for n in args.sessions:
+        print(f"  {n} concurrent session(s)...")
+        results.append(run_sessions(n, args.workflows, args.think_ms, args.port))
+    print_results(results)
+    
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results saved to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
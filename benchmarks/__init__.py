@@ -0,0 +1,18 @@
+"""
+Performance Benchmarks
+
+Times the main pipeline stages at several dataset sizes:
+    - train.py end-to-end (subprocess, including imports and saving)
+    - data load (binary dataset cache)
+    - predict_hemoglobin (single sample) and batch prediction
+    - find_similar_samples (KD-tree and full scan) and calculate_uncertainty
+    - Streamlit app reruns (first render and predict click)
+
+Results are saved as JSON and can be compared against a saved baseline
+with a regression threshold.
+
+Usage (from the project root):
+    python -m benchmarks --sizes 1000 100000
+    python -m benchmarks --save-baseline
+    python -m benchmarks --baseline benchmarks/results/baseline.json --threshold 0.25
+"""
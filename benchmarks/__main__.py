@@ -0,0 +1,118 @@
+"""
+Benchmark Runner
+
+Usage (from the project root):
+    python -m benchmarks                          # 1k and 100k rows
+    python -m benchmarks --sizes 1000 100000 10000000
+    python -m benchmarks --save-baseline
+    python -m benchmarks --baseline benchmarks/results/baseline.json
+"""
+
+import os
+import sys
+import argparse
+import tempfile
+
+from benchmarks import cases
+from benchmarks.harness import (
+    DEFAULT_REPEAT, DEFAULT_THRESHOLD,
+    compare, format_seconds, load_results, save_results
+)
+
+
+# Defaults
+DEFAULT_SIZES = [1_000, 100_000]
+RESULTS_DIR = os.path.join(cases.PROJECT_ROOT, 'benchmarks', 'results')
+LATEST_RESULTS = os.path.join(RESULTS_DIR, 'latest.json')
+BASELINE_RESULTS = os.path.join(RESULTS_DIR, 'baseline.json')
+
+
+def parse_args(argv=None):
+    """Parse command-line arguments."""
+    parser = argparse.ArgumentParser(description="Hemoglobin pipeline benchmarks")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help="Synthetic dataset sizes in rows (default: 1000 100000)")
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT,
+                        help=f"Timed rounds per case (default: {DEFAULT_REPEAT})")
+    parser.add_argument('--output', default=LATEST_RESULTS,
+                        help="Where to write the results JSON")
+    parser.add_argument('--baseline', default=None,
+                        help="Baseline results JSON to compare against")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help=f"Allowed relative slowdown (default: {DEFAULT_THRESHOLD})")
+    parser.add_argument('--save-baseline', action='store_true',
+                        help=f"Also write the results to {BASELINE_RESULTS}")
+    parser.add_argument('--skip-train', action='store_true',
+                        help="Skip the train.py end-to-end case")
+    parser.add_argument('--skip-app', action='store_true',
+                        help="Skip the Streamlit rerun cases")
+    return parser.parse_args(argv)
+
+
+def print_results(results):
+    """Print a timing table."""
+    print("-" * 60)
+    print("  BENCHMARK RESULTS (per call)")
+    print("-" * 60)
+    print(f"  {'Benchmark':<34}{'median':>12}{'min':>12}")
+    for name, timing in results.items():
+        print(f"  {name:<34}{format_seconds(timing['median_s']):>12}"
+              f"{format_seconds(timing['min_s']):>12}")
+    print("-" * 60)
+
+
+def print_comparison(rows, threshold):
+    """Print a baseline comparison table."""
+    print()
+    print("-" * 60)
+    print(f"  BASELINE COMPARISON (regression: >{threshold:.0%} slower)")
+    print("-" * 60)
+    for name, base, now, ratio, regressed in rows:
+        flag = "  REGRESSION" if regressed else ""
+        print(f"  {name:<34}{format_seconds(base):>10} -> {format_seconds(now):>10}"
+              f"  x{ratio:.2f}{flag}")
+    print("-" * 60)
+
+
+def main(argv=None):
+    """Run the benchmarks and optionally compare against a baseline."""
+    args = parse_args(argv)
+    sys.path.insert(0, cases.PROJECT_ROOT)
+    
+    from predict import load_model
+    model_data = load_model()
+    
+    results = {}
+    for n_rows in args.sizes:
+        print(f"Running benchmarks on {n_rows:,} rows...")
+        with tempfile.TemporaryDirectory(prefix='hb_bench_') as workdir:
+            results.update(cases.run_size(
+                n_rows, workdir, model_data, args.repeat,
+                include_train=not args.skip_train
+            ))
+    
+    if not args.skip_app:
+        print("Running Streamlit rerun benchmarks...")
+        results.update(cases.bench_app_rerun(args.repeat))
+    
+    print()
+    print_results(results)
+    
+    save_results(results, args.output)
+    print(f"Results saved to: {args.output}")
+    if args.save_baseline:
+        save_results(results, BASELINE_RESULTS)
+        print(f"Baseline saved to: {BASELINE_RESULTS}")
+    
+    if args.baseline:
+        rows = compare(results, load_results(args.baseline), args.threshold)
+        print_comparison(rows, args.threshold)
+        regressions = [row[0] for row in rows if row[4]]
+        if regressions:
+            print(f"Regressions: {', '.join(regressions)}")
+            sys.exit(1)
+        print("No regressions against the baseline.")
+
+
+if __name__ == "__main__":
+    main()
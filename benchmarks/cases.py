@@ -0,0 +1,249 @@
+"""
+Benchmark Cases and Synthetic Datasets
+
+Synthetic datasets of any size are drawn from data/anemia_new.csv by
+bootstrap resampling with small Gaussian jitter, so they keep the real
+feature distributions and correlations. Each case returns a timing dict
+from harness.time_call(); names are '<case>@<rows>' so results at
+different sizes can be compared independently.
+"""
+
+import os
+import sys
+import contextlib
+import subprocess
+
+import numpy as np
+
+from benchmarks.harness import time_call
+
+
+# Paths
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SOURCE_DATA = os.path.join(PROJECT_ROOT, 'data', 'anemia_new.csv')
+
+# Relative jitter applied to resampled numeric columns
+JITTER_SCALE = 0.01
+GENERATE_CHUNK_ROWS = 1_000_000
+RANDOM_STATE = 42
+
+# Sample used for single-sample benchmarks
+SAMPLE_FEATURES = {'RBC': 4.5, 'MCV': 80.0, 'MCH': 27.0, 'MCHC': 33.0}
+
+# Inputs per batch uncertainty call
+BATCH_QUERIES = 1_000
+
+
+def generate_dataset(n_rows, filepath, random_state=RANDOM_STATE):
+    """
+    Write a synthetic CSV with the same columns as data/anemia_new.csv.
+    
+    Rows are generated in chunks, so 10M-row files do not need the whole
+    table in memory.
+    
+    Args:
+        n_rows (int): Number of rows to write
+        filepath (str): Output CSV path
+        random_state (int): Seed for reproducible datasets
+    """
+    import pandas as pd
+    
+    source = pd.read_csv(SOURCE_DATA).dropna()
+    numeric = [col for col in source.columns if col not in ('Gender', 'Decision_Class')]
+    scale = source[numeric].std().to_numpy() * JITTER_SCALE
+    rng = np.random.default_rng(random_state)
+    
+    written = 0
+    while written < n_rows:
+        size = min(GENERATE_CHUNK_ROWS, n_rows - written)
+        chunk = source.iloc[rng.integers(0, len(source), size)].reset_index(drop=True)
+        values = chunk[numeric].to_numpy(dtype=float)
+        values += rng.normal(0.0, 1.0, values.shape) * scale
+        chunk[numeric] = np.clip(values, 0.0, None).round(2)
+        chunk.to_csv(filepath, mode='w' if written == 0 else 'a',
+                     header=written == 0, index=False)
+        written += size
+
+
+@contextlib.contextmanager
+def _quiet():
+    """Silence the print-based progress output of the pipeline functions."""
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def _repeat_for(n_rows, repeat):
+    """Fewer rounds for very large inputs."""
+    return max(1, repeat if n_rows <= 100_000 else repeat // 3)
+
+
+def bench_train(workdir, n_rows, repeat):
+    """
+    Run train.py end-to-end in a subprocess.
+    
+    The script runs with workdir as its working directory, so it reads
+    workdir/data/anemia_new.csv and writes workdir/model/ instead of the
+    project's committed model files.
+    """
+    script = os.path.join(PROJECT_ROOT, 'train.py')
+    
+    def run():
+        subprocess.run([sys.executable, script], cwd=workdir, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    
+    return time_call(run, repeat=_repeat_for(n_rows, repeat), number=1)
+
+
+def bench_load(data_path, n_rows, repeat):
+    """Time train.load_data (memory-mapped dataset cache, built on the first call)."""
+    from train import load_data
+    
+    def run():
+        with _quiet():
+            load_data(data_path)
+    
+    return time_call(run, repeat=_repeat_for(n_rows, repeat))
+
+
+def bench_predict(model_data, X, repeat):
+    """Time single-sample and batch prediction."""
+    from predict import predict_hemoglobin, predict_hemoglobin_batch
+    
+    return {
+        'predict_single': time_call(
+            lambda: predict_hemoglobin(model_data, SAMPLE_FEATURES),
+            repeat=repeat
+        ),
+        'predict_batch': time_call(
+            lambda: predict_hemoglobin_batch(model_data, X),
+            repeat=_repeat_for(len(X), repeat)
+        )
+    }
+
+
+def bench_similarity(df, predicted_hb, repeat):
+    """Time index build, neighbour search (KD-tree and full scan) and uncertainty."""
+    from similarity import (
+        SIMILARITY_FEATURES, build_index, find_similar_samples, calculate_uncertainty,
+        calculate_uncertainty_batch
+    )
+    
+    n_rows = len(df)
+    results = {'build_index': time_call(lambda: build_index(df),
+                                        repeat=_repeat_for(n_rows, repeat))}
+    
+    index = build_index(df)
+    results['find_similar_kdtree'] = time_call(
+        lambda: find_similar_samples(df, SAMPLE_FEATURES, index=index),
+        repeat=repeat
+    )
+    results['find_similar_scan'] = time_call(
+        lambda: find_similar_samples(df, SAMPLE_FEATURES),
+        repeat=_repeat_for(n_rows, repeat)
+    )
+    
+    similar = find_similar_samples(df, SAMPLE_FEATURES, index=index)
+    results['calculate_uncertainty'] = time_call(
+        lambda: calculate_uncertainty(similar, predicted_hb, n_rows),
+        repeat=repeat
+    )
+    
+    # BATCH_QUERIES inputs in one tiled scan
+    queries = df[SIMILARITY_FEATURES].to_numpy(dtype=float)[:BATCH_QUERIES]
+    predictions = np.full(len(queries), predicted_hb)
+    results['uncertainty_batch'] = time_call(
+        lambda: calculate_uncertainty_batch(df, queries, predictions),
+        repeat=_repeat_for(n_rows, repeat)
+    )
+    return results
+
+
+def bench_reference_store(df, repeat):
+    """Time compact reference store builds and neighbour searches per encoding."""
+    from reference_store import ENCODINGS, ReferenceStore
+    
+    results = {}
+    for encoding in ENCODINGS:
+        results[f"store_build_{encoding}"] = time_call(
+            lambda: ReferenceStore.from_frame(df, encoding),
+            repeat=_repeat_for(len(df), repeat)
+        )
+        store = ReferenceStore.from_frame(df, encoding)
+        results[f"store_nearest_{encoding}"] = time_call(
+            lambda: store.nearest_hb(SAMPLE_FEATURES),
+            repeat=repeat
+        )
+    return results
+
+
+def run_size(n_rows, workdir, model_data, repeat, include_train=True):
+    """
+    Run every data-size dependent case on one synthetic dataset.
+    
+    Args:
+        n_rows (int): Dataset size
+        workdir (str): Scratch directory for the dataset and trained model
+        model_data (dict): Loaded model used for the scoring cases
+        repeat (int): Timed rounds per case
+        include_train (bool): Also run train.py end-to-end
+    
+    Returns:
+        dict: '<case>@<rows>' -> timing dict
+    """
+    import pandas as pd
+    
+    data_dir = os.path.join(workdir, 'data')
+    os.makedirs(data_dir, exist_ok=True)
+    data_path = os.path.join(data_dir, 'anemia_new.csv')
+    generate_dataset(n_rows, data_path)
+    
+    timings = {'data_load': bench_load(data_path, n_rows, repeat)}
+    if include_train:
+        timings['train_end_to_end'] = bench_train(workdir, n_rows, repeat)
+    
+    df = pd.read_csv(data_path)
+    X = df[model_data['feature_columns']].to_numpy(dtype=float)
+    timings.update(bench_predict(model_data, X, repeat))
+    
+    from predict import predict_hemoglobin
+    predicted_hb = float(predict_hemoglobin(model_data, SAMPLE_FEATURES))
+    timings.update(bench_similarity(df, predicted_hb, repeat))
+    timings.update(bench_reference_store(df, repeat))
+    
+    return {f"{name}@{n_rows}": timing for name, timing in timings.items()}
+
+
+def bench_app_rerun(repeat):
+    """
+    Time Streamlit script reruns with streamlit.testing's AppTest.
+    
+    'app_first_run' is a fresh session (cold st.cache_* on the first
+    round only); 'app_predict_rerun' is the rerun triggered by the
+    predict button in an existing session.
+    """
+    import warnings
+    from streamlit.logger import set_log_level
+    from streamlit.testing.v1 import AppTest
+    
+    set_log_level('error')
+    
+    app_path = os.path.join(PROJECT_ROOT, 'app.py')
+    previous_cwd = os.getcwd()
+    os.chdir(PROJECT_ROOT)
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            
+            first_run = time_call(
+                lambda: AppTest.from_file(app_path, default_timeout=60).run(),
+                repeat=repeat
+            )
+            
+            at = AppTest.from_file(app_path, default_timeout=60).run()
+            at.button(key='male_btn').click().run()
+            predict_button = [b for b in at.button if 'Tahmin' in b.label][0]
+            predict_rerun = time_call(lambda: predict_button.click().run(), repeat=repeat)
+    finally:
+        os.chdir(previous_cwd)
+    
+    return {'app_first_run': first_run, 'app_predict_rerun': predict_rerun}
@@ -0,0 +1,132 @@
+"""
+Benchmark Timing, Result Files and Baseline Comparison
+"""
+
+import os
+import sys
+import json
+import time
+import platform
+from datetime import datetime, timezone
+
+
+# Defaults
+DEFAULT_REPEAT = 5
+MIN_ROUND_SECONDS = 0.05  # Calibrated rounds last at least this long
+DEFAULT_THRESHOLD = 0.20  # 20% slower than baseline counts as a regression
+
+
+def calibrate(fn, min_seconds=MIN_ROUND_SECONDS):
+    """
+    Pick how many calls make one timed round (like timeit's autorange).
+    
+    Fast functions are called many times per round so timer resolution
+    and per-round noise stay small relative to the measurement.
+    """
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        if time.perf_counter() - start >= min_seconds:
+            return number
+        number *= 2
+
+
+def time_call(fn, repeat=DEFAULT_REPEAT, number=None, setup=None):
+    """
+    Time a function call.
+    
+    Args:
+        fn (callable): Zero-argument function to time
+        repeat (int): Number of timed rounds
+        number (int): Calls per round (per-call time is reported);
+            calibrated with calibrate() when None
+        setup (callable): Optional function run before each round, untimed
+    
+    Returns:
+        dict: Per-call 'min_s', 'median_s', 'max_s' and the loop counts
+    """
+    if number is None:
+        number = calibrate(fn)
+    
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        times.append((time.perf_counter() - start) / number)
+    
+    times.sort()
+    return {
+        'min_s': times[0],
+        'median_s': times[len(times) // 2],
+        'max_s': times[-1],
+        'repeat': repeat,
+        'number': number
+    }
+
+
+def environment_info():
+    """Describe the machine and library versions the results came from."""
+    info = {
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'cpu_count': os.cpu_count()
+    }
+    for module in ('numpy', 'pandas', 'sklearn'):
+        if module in sys.modules:
+            info[module] = getattr(sys.modules[module], '__version__', None)
+    return info
+
+
+def save_results(results, filepath):
+    """Write results with environment info to a JSON file."""
+    os.makedirs(os.path.dirname(filepath) or '.', exist_ok=True)
+    with open(filepath, 'w', encoding='utf-8') as f:
+        json.dump({'environment': environment_info(), 'results': results}, f, indent=2)
+
+
+def load_results(filepath):
+    """Read the 'results' section of a saved result file."""
+    with open(filepath, encoding='utf-8') as f:
+        return json.load(f)['results']
+
+
+def compare(current, baseline, threshold=DEFAULT_THRESHOLD, stat='min_s'):
+    """
+    Compare timings against a baseline.
+    
+    The fastest round ('min_s') is compared by default: it is the least
+    affected by scheduler and cache noise on short benchmarks.
+    
+    Args:
+        current (dict): name -> timing dict
+        baseline (dict): name -> timing dict
+        threshold (float): Allowed relative slowdown (0.2 = 20%)
+        stat (str): Timing field to compare ('min_s' or 'median_s')
+    
+    Returns:
+        list: (name, baseline_s, current_s, ratio, regressed) for benchmarks
+            present in both
+    """
+    rows = []
+    for name in sorted(set(current) & set(baseline)):
+        base = baseline[name][stat]
+        now = current[name][stat]
+        ratio = now / base if base > 0 else float('inf')
+        rows.append((name, base, now, ratio, ratio > 1.0 + threshold))
+    return rows
+
+
+def format_seconds(seconds):
+    """Human-readable duration."""
+    if seconds < 1e-3:
+        return f"{seconds * 1e6:.1f} us"
+    if seconds < 1.0:
+        return f"{seconds * 1e3:.2f} ms"
+    return f"{seconds:.2f} s"
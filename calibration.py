@@ -0,0 +1,246 @@
+"""
+Calibrated Prediction Intervals (Split Conformal)
+
+train.py scores its held-out test set, which the model never saw, and
+stores a summary of the residuals (true Hb - predicted Hb) in the model
+artifact. At inference time an interval and an anemia probability are
+looked up from that summary in constant time; no dataset is loaded.
+
+Interval: the split-conformal half width for coverage 1 - a is the
+ceil((n + 1)(1 - a))-th smallest absolute residual of the n calibration
+rows, so predicted_hb +/- half_width contains the true Hb with
+probability >= 1 - a for new samples from the same population.
+
+Residuals are grouped (Mondrian conformal) by cohort and by PREDICTION_BINS
+equal-count bins of predicted Hb, because the error differs between low
+and normal Hb. A group with fewer than MIN_CELL_SAMPLES calibration rows
+falls back to its cohort, then to all rows.
+
+Anemia probability: each group also keeps RESIDUAL_GRID quantiles of the
+signed residual. P(true Hb < threshold) is the residual distribution
+function at threshold - predicted_hb (linear interpolation), and the
+misclassification probability is that value, or its complement when the
+prediction is below the threshold.
+
+Building the summary needs NumPy; the lookups only use the standard
+library.
+
+Usage:
+    calibration = build_calibration(y_test, model.predict(X_test), genders_test)
+    result = calibrated_uncertainty(calibration, predicted_hb, 'female', threshold=12.0)
+"""
+
+import math
+import bisect
+
+
+# Constants
+CALIBRATION_KEY = 'calibration'  # model artifact metadata key
+CALIBRATION_METHOD = 'split-conformal'
+COVERAGE_LEVELS = (0.80, 0.90, 0.95)
+DEFAULT_COVERAGE = 0.90
+PREDICTION_BINS = 3
+MIN_CELL_SAMPLES = 30
+RESIDUAL_GRID = 41  # signed residual quantiles per group (every 2.5%)
+
+
+def _cell(residuals, levels):
+    """Conformal half widths and signed residual quantiles of one group."""
+    import numpy as np
+    
+    n = len(residuals)
+    abs_sorted = np.sort(np.abs(residuals))
+    half_widths = []
+    for level in levels:
+        rank = math.ceil((n + 1) * level)
+        # Too few rows for this coverage: the interval is unbounded
+        half_widths.append(float(abs_sorted[rank - 1]) if rank <= n else None)
+    
+    grid = np.linspace(0.0, 1.0, RESIDUAL_GRID)
+    return {
+        'n': int(n),
+        'half_widths': half_widths,
+        'residual_quantiles': [float(q) for q in np.quantile(residuals, grid)]
+    }
+
+
+def build_calibration(y_true, y_pred, genders=None, levels=COVERAGE_LEVELS,
+                      n_bins=PREDICTION_BINS):
+    """
+    Summarize held-out residuals for calibrated intervals.
+    
+    Args:
+        y_true: True Hb of the calibration rows (not used for fitting)
+        y_pred: Model predictions for the same rows
+        genders: Gender per row (rows with an unknown value only count
+            towards the pooled group); None pools all rows
+        levels (tuple): Coverage levels to store
+        n_bins (int): Predicted-Hb bins per cohort
+    
+    Returns:
+        dict: JSON-serializable calibration summary
+    
+    Raises:
+        ValueError: If there are no calibration rows
+    """
+    import numpy as np
+    from utils import normalize_gender
+    
+    y_true = np.asarray(y_true, dtype=float)
+    y_pred = np.asarray(y_pred, dtype=float)
+    if len(y_true) == 0:
+        raise ValueError("No calibration rows (the test set is empty)")
+    
+    residuals = y_true - y_pred
+    levels = [float(level) for level in levels]
+    
+    # Interior edges of equal-count bins of the predictions
+    edges = [float(e) for e in np.quantile(y_pred, np.arange(1, n_bins) / n_bins)]
+    bins = np.searchsorted(edges, y_pred, side='right')
+    
+    cohorts = np.full(len(y_true), None, dtype=object)
+    if genders is not None:
+        genders = np.asarray(genders, dtype=object)
+        for value in set(genders.tolist()):
+            try:
+                cohorts[genders == value] = normalize_gender(str(value))
+            except ValueError:
+                continue
+    
+    groups = {}
+    for cohort in sorted(set(cohorts.tolist()) - {None}):
+        in_cohort = cohorts == cohort
+        cohort_cells = []
+        for b in range(n_bins):
+            mask = in_cohort & (bins == b)
+            cohort_cells.append(_cell(residuals[mask], levels)
+                                if mask.sum() >= MIN_CELL_SAMPLES else None)
+        groups[cohort] = {
+            'all': _cell(residuals[in_cohort], levels) if in_cohort.sum() >= MIN_CELL_SAMPLES else None,
+            'bins': cohort_cells
+        }
+    
+    return {
+        'method': CALIBRATION_METHOD,
+        'n_calibration': int(len(y_true)),
+        'levels': levels,
+        'bin_edges': edges,
+        'pooled': _cell(residuals, levels),
+        'groups': groups
+    }
+
+
+def model_calibration(model_data):
+    """Calibration summary stored with a loaded model, or None."""
+    metadata = getattr(model_data['model'], 'metadata', None) or {}
+    return metadata.get(CALIBRATION_KEY)
+
+
+def _select_cell(calibration, predicted_hb, gender):
+    """Most specific group with enough calibration rows."""
+    group = calibration['groups'].get(gender) if gender is not None else None
+    if group is not None:
+        b = bisect.bisect_right(calibration['bin_edges'], predicted_hb)
+        cell = group['bins'][b] or group['all']
+        if cell is not None:
+            return cell
+    return calibration['pooled']
+
+
+def _residual_cdf(cell, value):
+    """P(residual <= value) from the stored quantile grid."""
+    if not math.isfinite(value):
+        raise ValueError(f"Residual must be finite, got {value}")
+    quantiles = cell['residual_quantiles']
+    if value < quantiles[0]:
+        return 0.0
+    if value >= quantiles[-1]:
+        return 1.0
+    
+    i = bisect.bisect_right(quantiles, value) - 1
+    low, high = quantiles[i], quantiles[i + 1]
+    fraction = (value - low) / (high - low) if high > low else 1.0
+    return (i + fraction) / (len(quantiles) - 1)
+
+
+def prediction_interval(calibration, predicted_hb, gender=None, coverage=DEFAULT_COVERAGE):
+    """
+    Calibrated interval around a prediction.
+    
+    Args:
+        calibration (dict): Summary from build_calibration()
+        predicted_hb (float): Model prediction (g/dL)
+        gender (str): Normalized gender ("male"/"female"), or None
+        coverage (float): One of the stored levels
+    
+    Returns:
+        tuple: (lower, upper) in g/dL; (None, None) if the group has too
+            few rows for the coverage (the interval is unbounded; None
+            keeps the result valid JSON, unlike infinity)
+    
+    Raises:
+        ValueError: If the coverage level is not stored
+    """
+    try:
+        position = calibration['levels'].index(coverage)
+    except ValueError:
+        raise ValueError(
+            f"Coverage {coverage} not calibrated "
+            f"(available: {', '.join(str(level) for level in calibration['levels'])})"
+        ) from None
+    
+    half_width = _select_cell(calibration, predicted_hb, gender)['half_widths'][position]
+    if half_width is None:
+        return None, None
+    return predicted_hb - half_width, predicted_hb + half_width
+
+
+def format_interval(lower, upper, digits=2, unbounded='unbounded'):
+    """Display text of an interval from prediction_interval()."""
+    if lower is None or upper is None:
+        return unbounded
+    return f"{lower:.{digits}f} - {upper:.{digits}f}"
+
+
+def anemia_probability(calibration, predicted_hb, gender, threshold):
+    """P(true Hb < threshold) given the prediction."""
+    cell = _select_cell(calibration, predicted_hb, gender)
+    return _residual_cdf(cell, threshold - predicted_hb)
+
+
+def calibrated_uncertainty(calibration, predicted_hb, gender, threshold,
+                           coverage=DEFAULT_COVERAGE):
+    """
+    Interval and anemia probabilities for one prediction (constant time).
+    
+    Returns:
+        dict: 'lower'/'upper' at 'coverage', 'intervals' (coverage ->
+            (lower, upper) for every stored level; None bounds when the
+            interval is unbounded), 'anemia_probability',
+            'misclassification_probability' of the rule-based status and
+            'n_calibration' rows behind the estimate
+    
+    Raises:
+        ValueError: If the coverage level is not stored or the prediction
+            is not finite
+    """
+    if not math.isfinite(predicted_hb):
+        raise ValueError(f"Predicted Hb must be finite, got {predicted_hb}")
+    
+    lower, upper = prediction_interval(calibration, predicted_hb, gender, coverage)
+    intervals = {
+        level: prediction_interval(calibration, predicted_hb, gender, level)
+        for level in calibration['levels']
+    }
+    p_anemia = anemia_probability(calibration, predicted_hb, gender, threshold)
+    
+    return {
+        'lower': lower,
+        'upper': upper,
+        'coverage': coverage,
+        'intervals': intervals,
+        'anemia_probability': p_anemia,
+        # The rule calls anemia below the threshold
+        'misclassification_probability': 1.0 - p_anemia if predicted_hb < threshold else p_anemia,
+        'n_calibration': _select_cell(calibration, predicted_hb, gender)['n']
+    }
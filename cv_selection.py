@@ -0,0 +1,228 @@
+"""
+Repeated K-Fold Model Selection
+
+Compares candidate regressors (plain OLS, ridge and lasso over an alpha
+grid) on several feature subsets with repeated k-fold cross-validation.
+
+Fold indices are drawn once and shared by every candidate, so all
+candidates are scored on identical splits. The feature matrix holding
+every column any candidate uses is built once and sent to each worker
+process once (pool initializer); a candidate selects its columns by
+index. Work is split per fold: each task fits every candidate on one
+train/validation split, so all cores stay busy even with few candidates.
+
+Ridge and lasso are fitted on standardized features (scaler fitted on
+the training fold only) so the penalty treats all features alike; OLS is
+fitted unscaled like the production model.
+
+Usage:
+    python train.py --select
+    python train.py --select --folds 10 --repeats 5 --alphas 0.01 0.1 1 10
+"""
+
+import os
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+
+# Candidate feature subsets (Gender is never a model feature)
+FEATURE_SETS = {
+    'base': ['RBC', 'MCV', 'MCH', 'MCHC'],
+    'base+PCV': ['RBC', 'MCV', 'MCH', 'MCHC', 'PCV'],
+    'base+Age': ['RBC', 'MCV', 'MCH', 'MCHC', 'Age'],
+    'base+PCV+Age': ['RBC', 'MCV', 'MCH', 'MCHC', 'PCV', 'Age'],
+}
+MODEL_TYPES = ('ols', 'ridge', 'lasso')
+DEFAULT_ALPHAS = (0.001, 0.01, 0.1, 1.0, 10.0)
+DEFAULT_FOLDS = 5
+DEFAULT_REPEATS = 3
+LASSO_MAX_ITER = 10_000
+CONFIDENCE_Z = 1.96  # 95% normal band on the mean across folds
+
+# Worker process state, set once per process by _init_worker()
+_X = None
+_y = None
+
+
+def build_candidates(feature_sets, model_types=MODEL_TYPES, alphas=DEFAULT_ALPHAS):
+    """
+    Expand feature subsets x model types x alphas into a candidate list.
+    
+    Returns:
+        list: Dicts with 'name', 'model', 'alpha' and 'features'
+    """
+    candidates = []
+    for set_name in feature_sets:
+        features = FEATURE_SETS[set_name]
+        for model_type in model_types:
+            for alpha in ([None] if model_type == 'ols' else alphas):
+                label = model_type if alpha is None else f"{model_type}(alpha={alpha:g})"
+                candidates.append({
+                    'name': f"{label} [{set_name}]",
+                    'model': model_type,
+                    'alpha': alpha,
+                    'features': features
+                })
+    return candidates
+
+
+def _make_estimator(model_type, alpha):
+    """Create an unfitted estimator for a candidate."""
+    from sklearn.linear_model import LinearRegression, Ridge, Lasso
+    from sklearn.pipeline import make_pipeline
+    from sklearn.preprocessing import StandardScaler
+    
+    if model_type == 'ols':
+        return LinearRegression()
+    if model_type == 'ridge':
+        return make_pipeline(StandardScaler(), Ridge(alpha=alpha))
+    if model_type == 'lasso':
+        return make_pipeline(StandardScaler(), Lasso(alpha=alpha, max_iter=LASSO_MAX_ITER))
+    raise ValueError(f"Unknown model type: {model_type}")
+
+
+def _init_worker(X, y):
+    """Receive the shared feature matrix once per worker process."""
+    global _X, _y
+    _X, _y = X, y
+    
+    # Import scikit-learn up front so fit timings exclude import time
+    _make_estimator('ols', None)
+
+
+def _evaluate_fold(train_idx, test_idx, candidates):
+    """
+    Fit and score every candidate on one split.
+    
+    Args:
+        train_idx, test_idx (np.ndarray): Row indices of the split
+        candidates (list): (model_type, alpha, column_indices) tuples
+    
+    Returns:
+        list: (MAE, RMSE, R2, fit_seconds) per candidate
+    """
+    # Rows are gathered once per split; candidates only select columns
+    X_train_all, X_test_all = _X[train_idx], _X[test_idx]
+    y_train, y_test = _y[train_idx], _y[test_idx]
+    total_ss = float(((y_test - y_test.mean()) ** 2).sum())
+    
+    results = []
+    for model_type, alpha, columns in candidates:
+        X_train = X_train_all[:, columns]
+        X_test = X_test_all[:, columns]
+        
+        start = time.perf_counter()
+        estimator = _make_estimator(model_type, alpha)
+        with warnings.catch_warnings():
+            # Small alphas can stop lasso before full convergence
+            warnings.simplefilter('ignore')
+            estimator.fit(X_train, y_train)
+        residual = y_test - estimator.predict(X_test)
+        elapsed = time.perf_counter() - start
+        
+        sq_error = float(residual @ residual)
+        results.append((
+            float(np.abs(residual).mean()),
+            float(np.sqrt(sq_error / len(residual))),
+            1.0 - sq_error / total_ss if total_ss > 0 else float('nan'),
+            elapsed
+        ))
+    return results
+
+
+def fold_indices(n_samples, n_folds=DEFAULT_FOLDS, n_repeats=DEFAULT_REPEATS, random_state=42):
+    """Precompute (train_idx, test_idx) for every repeat and fold."""
+    from sklearn.model_selection import RepeatedKFold
+    
+    splitter = RepeatedKFold(n_splits=n_folds, n_repeats=n_repeats, random_state=random_state)
+    return list(splitter.split(np.empty((n_samples, 1))))
+
+
+def run_selection(df, target_column, candidates, n_folds=DEFAULT_FOLDS,
+                  n_repeats=DEFAULT_REPEATS, random_state=42, workers=None):
+    """
+    Cross-validate all candidates.
+    
+    Args:
+        df: Dataset with every candidate feature and the target
+        target_column (str): Target column name
+        candidates (list): From build_candidates()
+        n_folds (int): Folds per repeat
+        n_repeats (int): Number of reshuffled repeats
+        random_state (int): Seed of the fold assignment
+        workers (int): Process count (default: all cores)
+    
+    Returns:
+        dict: 'leaderboard' (sorted by mean RMSE), 'seconds' (wall-clock)
+            and 'workers'
+    """
+    start = time.perf_counter()
+    
+    columns = sorted({col for c in candidates for col in c['features']})
+    data = df.dropna(subset=columns + [target_column])
+    X = np.ascontiguousarray(data[columns].to_numpy(dtype=float))
+    y = data[target_column].to_numpy(dtype=float)
+    
+    position = {col: i for i, col in enumerate(columns)}
+    specs = [
+        (c['model'], c['alpha'], [position[col] for col in c['features']])
+        for c in candidates
+    ]
+    splits = fold_indices(len(y), n_folds, n_repeats, random_state)
+    
+    workers = max(1, min(workers or os.cpu_count() or 1, len(splits)))
+    if workers == 1:
+        _init_worker(X, y)
+        fold_results = [_evaluate_fold(train_idx, test_idx, specs) for train_idx, test_idx in splits]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(X, y)) as pool:
+            futures = [pool.submit(_evaluate_fold, train_idx, test_idx, specs)
+                       for train_idx, test_idx in splits]
+            fold_results = [future.result() for future in futures]
+    
+    # fold_results[fold][candidate] -> scores[candidate, fold, metric]
+    scores = np.array(fold_results).transpose(1, 0, 2)
+    n_splits = len(splits)
+    
+    leaderboard = []
+    for candidate, candidate_scores in zip(candidates, scores):
+        row = {'name': candidate['name'], 'n_rows': len(y), 'n_splits': n_splits,
+               'fit_seconds': float(candidate_scores[:, 3].sum())}
+        for i, metric in enumerate(('MAE', 'RMSE', 'R2')):
+            values = candidate_scores[:, i]
+            row[metric] = float(values.mean())
+            row[f"{metric}_ci"] = 0.0
+            if n_splits > 1:
+                row[f"{metric}_ci"] = float(CONFIDENCE_Z * values.std(ddof=1) / np.sqrt(n_splits))
+        leaderboard.append(row)
+    
+    leaderboard.sort(key=lambda row: row['RMSE'])
+    return {
+        'leaderboard': leaderboard,
+        'seconds': time.perf_counter() - start,
+        'workers': workers
+    }
+
+
+def print_leaderboard(result):
+    """Print the cross-validation leaderboard from run_selection()."""
+    leaderboard = result['leaderboard']
+    n_splits = leaderboard[0]['n_splits'] if leaderboard else 0
+    
+    print("-" * 96)
+    print(f"  MODEL SELECTION LEADERBOARD ({n_splits} splits, mean ± 95% band)")
+    print("-" * 96)
+    print(f"  {'#':>2}  {'Candidate':<34}{'MAE':>15}{'RMSE':>15}{'R2':>15}{'fit s':>9}")
+    for rank, row in enumerate(leaderboard, start=1):
+        print(f"  {rank:>2}  {row['name']:<34}"
+              f"{row['MAE']:>8.4f} ±{row['MAE_ci']:.3f}"
+              f"{row['RMSE']:>8.4f} ±{row['RMSE_ci']:.3f}"
+              f"{row['R2']:>8.4f} ±{row['R2_ci']:.3f}"
+              f"{row['fit_seconds']:>9.2f}")
+    print("-" * 96)
+    print(f"  Wall-clock: {result['seconds']:.2f} s on {result['workers']} worker(s)")
+    print("-" * 96)
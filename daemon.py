@@ -0,0 +1,288 @@
+"""
+Resident Prediction Daemon
+
+Keeps the trained model loaded and answers prediction requests over a
+Unix domain socket, so per-sample CLI calls skip the pandas/sklearn/joblib
+import and model unpickling cost.
+
+Protocol: one JSON object per line.
+    Request:  {"features": {"RBC": 4.5, "MCV": 80, "MCH": 27, "MCHC": 33},
+               "gender": "f"}
+    Response: {"predicted_hb": 11.9, "gender": "female", "threshold": 12.0,
+               "status": "Normal", "warnings": [], "calibrated": {...} or null}
+              or {"error": "..."}
+
+"calibrated" holds the prediction interval and misclassification
+probability of models trained with calibration (see calibration.py).
+Its "lower"/"upper" (and the bounds in "intervals") are null when the
+interval is unbounded (too few calibration rows for the coverage).
+
+The daemon follows the model registry (see model_registry.py): a new
+current model version is loaded by a background thread and swapped in
+between requests, so retraining does not require a restart.
+
+The default socket lives in $XDG_RUNTIME_DIR, else in a per-user
+directory under the temp directory created with mode 0700, so other
+local users cannot bind it first. The socket itself is made owner-only,
+and the client checks that the daemon runs as the same user before it
+sends a request.
+
+This module only imports the standard library at top level; the client
+side (request_prediction) stays cheap to import.
+
+Usage:
+    python daemon.py
+    python predict.py --rbc 4.5 --mcv 80 --mch 27 --mchc 33 --gender f
+"""
+
+import os
+import sys
+import json
+import stat
+import struct
+import signal
+import socket
+import getpass
+import argparse
+import tempfile
+import socketserver
+
+
+def _user_socket_dir():
+    """Per-user socket directory: $XDG_RUNTIME_DIR, else <tmp>/hemoglobin-<uid>."""
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR')
+    if runtime_dir:
+        return runtime_dir
+    user = os.getuid() if hasattr(os, 'getuid') else getpass.getuser()
+    return os.path.join(tempfile.gettempdir(), f"hemoglobin-{user}")
+
+
+# Constants
+SOCKET_FILENAME = 'hemoglobin_predict.sock'
+DEFAULT_SOCKET_PATH = os.environ.get(
+    'PREDICT_DAEMON_SOCKET',
+    os.path.join(_user_socket_dir(), SOCKET_FILENAME)
+)
+CLIENT_TIMEOUT = 5.0  # seconds
+MAX_LINE_BYTES = 64 * 1024
+
+
+def _peer_uid(sock, socket_path):
+    """User id of the process behind a connected socket (of the socket file without SO_PEERCRED)."""
+    if hasattr(socket, 'SO_PEERCRED'):
+        creds = sock.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize('3i'))
+        return struct.unpack('3i', creds)[1]
+    return os.stat(socket_path).st_uid
+
+
+def request_prediction(features, gender, socket_path=DEFAULT_SOCKET_PATH,
+                       timeout=CLIENT_TIMEOUT):
+    """
+    Send one prediction request to a running daemon.
+    
+    Args:
+        features (dict): Blood parameters {RBC, MCV, MCH, MCHC}
+        gender (str): "male", "female", "m", or "f"
+        socket_path (str): Daemon socket path
+        timeout (float): Socket timeout in seconds
+    
+    Returns:
+        dict: Daemon response, or None if no daemon is reachable
+    
+    Raises:
+        ValueError: If the daemon rejects the request
+    """
+    if not hasattr(socket, 'AF_UNIX') or not os.path.exists(socket_path):
+        return None
+    
+    request = json.dumps({'features': features, 'gender': gender}) + '\n'
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(socket_path)
+            # Never send samples to, or trust answers from, another user's process
+            if hasattr(os, 'getuid') and _peer_uid(sock, socket_path) != os.getuid():
+                print(f"WARNING: {socket_path} belongs to another user; ignoring it")
+                return None
+            sock.sendall(request.encode('utf-8'))
+            with sock.makefile('rb') as stream:
+                line = stream.readline(MAX_LINE_BYTES)
+    except OSError:
+        # Stale socket file or daemon shutting down
+        return None
+    
+    if not line:
+        return None
+    
+    response = json.loads(line)
+    if 'error' in response:
+        raise ValueError(response['error'])
+    return response
+
+
+class _PredictionHandler(socketserver.StreamRequestHandler):
+    """Answer newline-delimited JSON requests on one connection."""
+    
+    def handle(self):
+        while True:
+            line = self.rfile.readline(MAX_LINE_BYTES)
+            if not line:
+                break
+            
+            try:
+                request = json.loads(line)
+                response = self.server.score(request['features'], request['gender'])
+            except (ValueError, KeyError, TypeError) as e:
+                response = {'error': str(e)}
+            except Exception as e:
+                # Reply instead of dropping the connection on an unexpected failure
+                response = {'error': f"Internal error: {type(e).__name__}: {e}"}
+            
+            self.wfile.write((json.dumps(response, ensure_ascii=False) + '\n').encode('utf-8'))
+
+
+class PredictionDaemon(socketserver.ThreadingUnixStreamServer):
+    """Unix socket server holding the loaded model (a dict or a ModelHandle)."""
+    
+    daemon_threads = True
+    
+    def __init__(self, socket_path, model_data):
+        self.models = model_data
+        super().__init__(socket_path, _PredictionHandler)
+        # Owner-only, whatever the umask and directory permissions
+        os.chmod(socket_path, stat.S_IRUSR | stat.S_IWUSR)
+    
+    @property
+    def model_data(self):
+        """The model for the next request (the handle's current version)."""
+        return getattr(self.models, 'model_data', self.models)
+    
+    def score(self, features, gender):
+        """Run the prediction pipeline for one sample."""
+        from calibration import calibrated_uncertainty, model_calibration
+        from predict import predict_hemoglobin
+        from utils import anemia_decision, get_threshold, normalize_gender
+        from validation import RULE_RANGE, validate
+        
+        # One model for the whole request, even if a new version is swapped in meanwhile
+        model_data = self.model_data
+        feature_columns = model_data['feature_columns']
+        missing = [col for col in feature_columns if col not in features]
+        if missing:
+            raise ValueError(f"Missing features: {missing}")
+        
+        values = {col: float(features[col]) for col in feature_columns}
+        report = validate(values, feature_columns)
+        report.raise_for_errors(strict=True)
+        warnings = [
+            f"{v['column']}={v['value']} is outside typical range ({v['min']}-{v['max']})"
+            for v in report.violations(RULE_RANGE)
+        ]
+        
+        gender = normalize_gender(gender)
+        predicted_hb = float(predict_hemoglobin(model_data, values))
+        threshold = get_threshold(gender)
+        
+        calibration = model_calibration(model_data)
+        calibrated = None
+        if calibration is not None:
+            calibrated = calibrated_uncertainty(calibration, predicted_hb, gender, threshold)
+        
+        return {
+            'predicted_hb': predicted_hb,
+            'gender': gender,
+            'threshold': threshold,
+            'status': anemia_decision(predicted_hb, gender),
+            'warnings': warnings,
+            'calibrated': calibrated
+        }
+
+
+def _ensure_private_dir(directory):
+    """
+    Create the default socket directory with mode 0700.
+    
+    Raises:
+        RuntimeError: If it exists but another user owns it or others
+            can access it
+    """
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    if not hasattr(os, 'getuid'):
+        return
+    info = os.stat(directory)
+    if info.st_uid != os.getuid() or info.st_mode & 0o077:
+        raise RuntimeError(f"Socket directory {directory} must be owned by you with mode 0700")
+
+
+def _remove_stale_socket(socket_path):
+    """
+    Remove a socket file left behind by a daemon that is no longer running.
+    
+    Raises:
+        RuntimeError: If another daemon is still listening on the path
+    """
+    if not os.path.exists(socket_path):
+        return
+    
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(socket_path)
+        except OSError:
+            os.unlink(socket_path)
+            return
+    
+    raise RuntimeError(f"A daemon is already running on {socket_path}")
+
+
+def parse_args(argv=None):
+    """Parse command-line arguments."""
+    parser = argparse.ArgumentParser(description="Resident hemoglobin prediction daemon")
+    parser.add_argument('--socket', default=DEFAULT_SOCKET_PATH,
+                        help=f"Unix socket path (default: {DEFAULT_SOCKET_PATH})")
+    parser.add_argument('--reload-interval', type=float, default=1.0,
+                        help="Seconds between checks for a new model version; "
+                             "0 disables hot reload (default: 1.0)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Load the model once and serve requests until interrupted."""
+    args = parse_args(argv)
+    
+    if not hasattr(socket, 'AF_UNIX'):
+        print("ERROR: Unix domain sockets are not supported on this platform.")
+        return
+    
+    from model_registry import ModelHandle
+    from predict import MODEL_DIR, load_model
+    
+    try:
+        if os.path.dirname(os.path.abspath(args.socket)) == os.path.abspath(_user_socket_dir()):
+            _ensure_private_dir(os.path.dirname(os.path.abspath(args.socket)))
+        _remove_stale_socket(args.socket)
+        models = ModelHandle(load_model, MODEL_DIR, check_interval=args.reload_interval)
+    except (FileNotFoundError, RuntimeError, ValueError) as e:
+        print(f"ERROR: {e}")
+        return
+    print(f"Model loaded successfully ({models.version or models.model_path}).")
+    if args.reload_interval > 0:
+        models.start()
+    
+    server = PredictionDaemon(args.socket, models)
+    print(f"Listening on {args.socket}")
+    
+    # Treat SIGTERM like Ctrl+C so the socket file is removed on shutdown
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print()
+        print("Daemon stopped.")
+    finally:
+        server.server_close()
+        if os.path.exists(args.socket):
+            os.unlink(args.socket)
+
+
+if __name__ == "__main__":
+    main()
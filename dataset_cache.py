@@ -0,0 +1,330 @@
+"""
+Binary Columnar Dataset Cache
+
+Converts a CSV dataset once into a typed binary layout and memory-maps
+it on later loads, so start-up no longer depends on CSV parsing speed.
+
+Layout (next to the CSV, e.g. data/.cache/anemia_new/):
+    manifest.json        source checksum, row count, column dtypes,
+                         categories and the current data directory
+    <checksum>/<col>.bin one raw array per column (native byte order)
+
+Column types:
+    - numeric columns: float32 (lab values carry at most 4 significant
+      digits, float32 keeps ~7)
+    - EXACT_COLUMNS (the regression target): float64, bit-identical to
+      the CSV values
+    - integer columns: int32
+    - text columns (Gender): categorical, int8/int32 codes + categories
+
+The cache is validated against the source file's size and mtime; when
+they differ the SHA-256 checksum decides whether the CSV content really
+changed, and the cache is rebuilt if it did. Rebuilds write a new data
+directory and switch the manifest atomically, so processes that already
+mapped the old files keep working. An existing data directory for the
+same checksum is never replaced (--force only rewrites the manifest).
+
+Usage:
+    df = load_csv('data/anemia_new.csv')
+    python dataset_cache.py data/anemia_new.csv     # build ahead of time
+"""
+
+import os
+import sys
+import json
+import errno
+import shutil
+import hashlib
+import argparse
+import tempfile
+
+import numpy as np
+
+
+# Constants
+CACHE_FORMAT = 'columnar-csv-cache'
+CACHE_VERSION = 1
+CACHE_DIRNAME = '.cache'
+EXACT_COLUMNS = ('Hb',)
+CONVERT_CHUNK_ROWS = 500_000
+HASH_BLOCK_BYTES = 1 << 20
+
+
+def cache_dir_for(csv_path):
+    """Cache directory of a CSV file: <csv dir>/.cache/<csv stem>/."""
+    directory, filename = os.path.split(os.path.abspath(csv_path))
+    return os.path.join(directory, CACHE_DIRNAME, os.path.splitext(filename)[0])
+
+
+def file_checksum(path):
+    """SHA-256 of a file, read in blocks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_BYTES), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _source_signature(csv_path):
+    stat = os.stat(csv_path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def _write_json_atomic(path, data):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def _read_manifest(cache_dir):
+    path = os.path.join(cache_dir, 'manifest.json')
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get('format') != CACHE_FORMAT or manifest.get('version') != CACHE_VERSION:
+        return None
+    return manifest
+
+
+def _column_dtype(name, series):
+    """Storage dtype of a column, decided from the first chunk."""
+    if series.dtype.kind == 'f':
+        return 'float64' if name in EXACT_COLUMNS else 'float32'
+    if series.dtype.kind in 'iub':
+        return 'int32'
+    return 'category'
+
+
+def _chunk_values(name, dtype, values, lookup):
+    """Convert one chunk of a column to its storage array."""
+    if dtype == 'category':
+        for value in values.dropna().unique():
+            lookup.setdefault(value, len(lookup))
+        return values.map(lookup).fillna(-1).to_numpy(dtype=np.int32)
+    
+    if dtype == 'int32' and values.dtype.kind not in 'iub':
+        raise ValueError(f"Column {name} has non-integer values after the first chunk")
+    return values.to_numpy(dtype=dtype)
+
+
+def build_cache(csv_path, chunk_rows=CONVERT_CHUNK_ROWS):
+    """
+    Convert a CSV file into the columnar cache.
+    
+    The CSV is read in chunks, so conversion memory does not grow with
+    the file size.
+    
+    Returns:
+        dict: The new manifest
+    
+    Raises:
+        FileNotFoundError: If the CSV doesn't exist
+        ValueError: If an integer column has missing or fractional values
+            after the first chunk
+    """
+    import pandas as pd
+    
+    if not os.path.exists(csv_path):
+        raise FileNotFoundError(f"Data file not found: {csv_path}")
+    
+    cache_dir = cache_dir_for(csv_path)
+    os.makedirs(cache_dir, exist_ok=True)
+    
+    signature = _source_signature(csv_path)
+    checksum = file_checksum(csv_path)
+    building_dir = tempfile.mkdtemp(dir=cache_dir, prefix='building-')
+    
+    dtypes = {}
+    lookups = {}
+    files = {}
+    n_rows = 0
+    try:
+        for chunk in pd.read_csv(csv_path, chunksize=chunk_rows):
+            if not dtypes:
+                for i, name in enumerate(chunk.columns):
+                    dtypes[name] = _column_dtype(name, chunk[name])
+                    lookups[name] = {}
+                    files[name] = open(os.path.join(building_dir, f"{i}.bin"), 'wb')
+            
+            for name, dtype in dtypes.items():
+                files[name].write(_chunk_values(name, dtype, chunk[name], lookups[name]).tobytes())
+            n_rows += len(chunk)
+    except BaseException:
+        shutil.rmtree(building_dir, ignore_errors=True)
+        raise
+    finally:
+        for f in files.values():
+            f.close()
+    
+    columns = []
+    for i, (name, dtype) in enumerate(dtypes.items()):
+        column = {'name': name, 'dtype': dtype, 'file': f"{i}.bin", 'storage': dtype}
+        if dtype == 'category':
+            column['categories'] = list(lookups[name])
+            column['storage'] = 'int8' if len(lookups[name]) < 127 else 'int32'
+            if column['storage'] == 'int8':
+                path = os.path.join(building_dir, column['file'])
+                np.fromfile(path, dtype=np.int32).astype(np.int8).tofile(path)
+        columns.append(column)
+    
+    # Data directories are named by content, so readers of the previous
+    # version keep their files until the manifest has switched. A
+    # directory for this checksum is already complete (it was renamed
+    # into place) and may hold a published reference store other
+    # processes map, so it is kept and this build discarded.
+    data_dir = checksum[:16]
+    final_dir = os.path.join(cache_dir, data_dir)
+    try:
+        os.rename(building_dir, final_dir)
+    except OSError as e:
+        shutil.rmtree(building_dir, ignore_errors=True)
+        # Renaming onto an existing non-empty directory fails
+        if e.errno not in (errno.EEXIST, errno.ENOTEMPTY) or not os.path.isdir(final_dir):
+            raise
+    
+    manifest = {
+        'format': CACHE_FORMAT,
+        'version': CACHE_VERSION,
+        'source': os.path.basename(csv_path),
+        'checksum': checksum,
+        'source_size': signature['size'],
+        'source_mtime_ns': signature['mtime_ns'],
+        'n_rows': n_rows,
+        'data_dir': data_dir,
+        'columns': columns
+    }
+    _write_json_atomic(os.path.join(cache_dir, 'manifest.json'), manifest)
+    
+    # Remove superseded versions (open memory maps stay valid on POSIX)
+    for entry in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, entry)
+        if os.path.isdir(path) and entry != data_dir and not entry.startswith('building-'):
+            shutil.rmtree(path, ignore_errors=True)
+    
+    return manifest
+
+
+def ensure_cache(csv_path):
+    """
+    Return a manifest that matches the current CSV, rebuilding if needed.
+    
+    A matching size and mtime is trusted; otherwise the checksum is
+    compared, so a touched but unchanged file is not reconverted.
+    """
+    if not os.path.exists(csv_path):
+        raise FileNotFoundError(f"Data file not found: {csv_path}")
+    
+    cache_dir = cache_dir_for(csv_path)
+    manifest = _read_manifest(cache_dir)
+    if manifest is None:
+        return build_cache(csv_path)
+    
+    signature = _source_signature(csv_path)
+    same_size = signature['size'] == manifest['source_size']
+    if same_size and signature['mtime_ns'] == manifest['source_mtime_ns']:
+        return manifest
+    
+    if same_size and file_checksum(csv_path) == manifest['checksum']:
+        manifest['source_mtime_ns'] = signature['mtime_ns']
+        _write_json_atomic(os.path.join(cache_dir, 'manifest.json'), manifest)
+        return manifest
+    
+    return build_cache(csv_path)
+
+
+def load_columns(csv_path, columns=None):
+    """
+    Memory-map cached columns of a CSV file.
+    
+    Args:
+        csv_path (str): Source CSV
+        columns (list): Columns to load (default: all)
+    
+    Returns:
+        tuple: (dict of name -> read-only array or (codes, categories), manifest)
+    """
+    manifest = ensure_cache(csv_path)
+    data_dir = os.path.join(cache_dir_for(csv_path), manifest['data_dir'])
+    
+    arrays = {}
+    for column in manifest['columns']:
+        if columns is not None and column['name'] not in columns:
+            continue
+        path = os.path.join(data_dir, column['file'])
+        if manifest['n_rows'] == 0:
+            values = np.empty(0, dtype=column['storage'])
+        else:
+            values = np.memmap(path, dtype=column['storage'], mode='r',
+                               shape=(manifest['n_rows'],))
+        if column['dtype'] == 'category':
+            values = (values, column['categories'])
+        arrays[column['name']] = values
+    return arrays, manifest
+
+
+def load_csv(csv_path, columns=None):
+    """
+    Load a CSV dataset as a DataFrame backed by the memory-mapped cache.
+    
+    Falls back to parsing the CSV when the cache cannot be written or
+    read (e.g. a read-only checkout).
+    
+    Args:
+        csv_path (str): Source CSV
+        columns (list): Columns to load (default: all, in file order)
+    
+    Returns:
+        pd.DataFrame: Numeric columns as float32/float64/int32 views of the
+            cache files, text columns as pandas categoricals
+    
+    Raises:
+        FileNotFoundError: If the CSV doesn't exist
+    """
+    import pandas as pd
+    
+    try:
+        arrays, _ = load_columns(csv_path, columns)
+    except FileNotFoundError:
+        raise
+    except (OSError, ValueError) as e:
+        print(f"WARNING: Dataset cache unavailable ({e}); parsing {csv_path}")
+        return pd.read_csv(csv_path, usecols=columns)
+    
+    data = {}
+    for name, values in arrays.items():
+        if isinstance(values, tuple):
+            codes, categories = values
+            values = pd.Categorical.from_codes(np.asarray(codes), categories=categories)
+        data[name] = values
+    return pd.DataFrame(data, copy=False)
+
+
+def main(argv=None):
+    """Build (or validate) the cache of one or more CSV files."""
+    parser = argparse.ArgumentParser(description="Build the binary columnar dataset cache")
+    parser.add_argument('csv', nargs='+', help="CSV files to convert")
+    parser.add_argument('--force', action='store_true', help="Reconvert even if the cache is current "
+                             "(an existing data directory with the same checksum is kept)")
+    args = parser.parse_args(argv)
+    
+    for csv_path in args.csv:
+        try:
+            manifest = build_cache(csv_path) if args.force else ensure_cache(csv_path)
+        except (FileNotFoundError, ValueError) as e:
+            print(f"ERROR: {e}")
+            sys.exit(1)
+        print(f"{csv_path}: {manifest['n_rows']:,} rows cached in {cache_dir_for(csv_path)}")
+
+
+if __name__ == "__main__":
+    main()
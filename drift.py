@@ -0,0 +1,492 @@
+"""
+Input Drift Monitoring
+
+train.py summarizes the training rows of every model feature and stores
+the profile in the compact model artifact: mean, std, min/max,
+PROFILE_GRID quantiles and the fraction of training rows in each bin
+between adjacent quantiles, for all rows and for each gender.
+
+A DriftMonitor compares the samples a scoring path sees with that
+profile in constant memory. Per cohort and feature it keeps Welford
+running moments, min/max and the number of samples in each profile bin.
+The bin counts double as the quantile sketch: live quantiles are
+interpolated within the bins, so nothing grows with the number of
+samples and recording one is a binary search and a few additions.
+
+Samples are judged in tumbling windows of `window` samples per cohort
+(window=None: one window for everything, as a batch run wants). Per
+cohort and feature the report has:
+    psi         population stability index of the window's bin fractions
+                against the training fractions
+    mean_shift  (window mean - training mean) in training SDs
+    std_ratio   window std / training std
+A feature drifts if psi >= PSI_DRIFT or |mean_shift| >= MEAN_SHIFT_DRIFT,
+and gets a warning at PSI_WARNING or MEAN_SHIFT_WARNING. The current
+window is judged once it has MIN_WINDOW_SAMPLES samples, the last
+complete one until then.
+
+Recording samples one at a time (observe) only uses the standard
+library; building a profile and recording a batch (update) use NumPy.
+
+Usage:
+    profile = build_profile(X_train, genders_train, FEATURE_COLUMNS)
+    
+    monitor = monitor_for_model(model_data)
+    for alert in monitor.observe({'RBC': 4.5, 'MCV': 80, 'MCH': 27, 'MCHC': 33}, 'female'):
+        print(f"WARNING: {format_alert(alert)}")
+    print_report(monitor.report())
+"""
+
+import math
+import bisect
+import threading
+
+
+# Constants
+DRIFT_KEY = 'drift_profile'  # model artifact metadata key
+PROFILE_GRID = 21  # feature quantiles per cohort (every 5%), bin edges in between
+ALL_COHORT = 'all'
+MIN_PROFILE_SAMPLES = 100  # smaller gender cohorts are only profiled pooled
+DEFAULT_WINDOW = 5000  # samples per cohort and tumbling window
+MIN_WINDOW_SAMPLES = 200
+CHECK_INTERVAL = 100  # samples between alert checks
+SCALAR_BATCH_ROWS = 32  # smaller batches are recorded row by row (NumPy call overhead)
+
+# Drift thresholds (PSI rule of thumb: < 0.1 stable, > 0.25 shifted)
+PSI_WARNING = 0.1
+PSI_DRIFT = 0.25
+PSI_FLOOR = 1e-4  # empty bins would make the index infinite
+MEAN_SHIFT_WARNING = 0.25  # training SDs
+MEAN_SHIFT_DRIFT = 0.5
+
+REPORT_QUANTILES = (0.05, 0.5, 0.95)
+STATUS_ORDER = ('ok', 'insufficient_data', 'warning', 'drift')
+METRIC_NAME = 'hemoglobin_input_drift'
+
+
+def _feature_profile(values):
+    """Moments, quantiles and bin fractions of one feature in one cohort."""
+    import numpy as np
+    
+    quantiles = np.quantile(values, np.linspace(0.0, 1.0, PROFILE_GRID))
+    # Edges lie halfway between neighboring distinct values: lab values tie
+    # on a 0.1 grid, and a value read as float32 must not change bins
+    uniques = np.unique(values)
+    above = np.searchsorted(uniques, quantiles[1:-1], side='right')
+    edges = sorted({float(uniques[i - 1] + uniques[i]) / 2
+                    for i in above if 0 < i < len(uniques)})
+    counts = np.bincount(np.searchsorted(edges, values, side='right'),
+                         minlength=len(edges) + 1)
+    return {
+        'mean': float(values.mean()),
+        'std': float(values.std()),
+        'min': float(values.min()),
+        'max': float(values.max()),
+        'quantiles': [float(q) for q in quantiles],
+        'edges': edges,
+        'expected': [float(c) for c in counts / len(values)]
+    }
+
+
+def build_profile(X, genders=None, feature_columns=None):
+    """
+    Summarize the training feature distribution for drift monitoring.
+    
+    Args:
+        X: (n, n_features) training feature matrix
+        genders: Gender per row (rows with an unknown value only count
+            towards the pooled cohort); None pools all rows
+        feature_columns (list): Column names of X
+    
+    Returns:
+        dict: JSON-serializable profile
+    
+    Raises:
+        ValueError: If there are no training rows
+    """
+    import numpy as np
+    from utils import normalize_gender
+    
+    X = np.asarray(X, dtype=float)
+    if len(X) == 0:
+        raise ValueError("No training rows to profile")
+    feature_columns = list(feature_columns or [f"x{j}" for j in range(X.shape[1])])
+    
+    cohorts = np.full(len(X), None, dtype=object)
+    if genders is not None:
+        genders = np.asarray(genders, dtype=object)
+        for value in set(genders.tolist()):
+            try:
+                cohorts[genders == value] = normalize_gender(str(value))
+            except ValueError:
+                continue
+    
+    groups = {ALL_COHORT: np.ones(len(X), dtype=bool)}
+    for cohort in sorted(set(cohorts.tolist()) - {None}):
+        in_cohort = cohorts == cohort
+        if in_cohort.sum() >= MIN_PROFILE_SAMPLES:
+            groups[cohort] = in_cohort
+    
+    return {
+        'features': feature_columns,
+        'cohorts': {
+            cohort: {
+                'n': int(mask.sum()),
+                'features': {col: _feature_profile(X[mask, j])
+                             for j, col in enumerate(feature_columns)}
+            }
+            for cohort, mask in groups.items()
+        }
+    }
+
+
+def model_drift_profile(model_data):
+    """Drift profile stored with a loaded model, or None."""
+    metadata = getattr(model_data['model'], 'metadata', None) or {}
+    return metadata.get(DRIFT_KEY)
+
+
+def monitor_for_model(model_data, window=DEFAULT_WINDOW):
+    """DriftMonitor against a loaded model's profile, or None if it has none."""
+    profile = model_drift_profile(model_data)
+    return DriftMonitor(profile, window) if profile is not None else None
+
+
+class _FeatureStats:
+    """Running moments and profile-bin counts of one feature."""
+    
+    __slots__ = ('n', 'mean', 'm2', 'min', 'max', 'counts')
+    
+    def __init__(self, n_bins):
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.counts = [0] * n_bins
+    
+    def add(self, x, b):
+        """Welford update with one value in bin b."""
+        self.n += 1
+        delta = x - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (x - self.mean)
+        if x < self.min:
+            self.min = x
+        if x > self.max:
+            self.max = x
+        self.counts[b] += 1
+    
+    def combine(self, n, mean, m2, low, high, counts):
+        """Merge the moments of another sample (Chan et al.)."""
+        if n == 0:
+            return
+        total = self.n + n
+        delta = mean - self.mean
+        self.m2 += m2 + delta * delta * self.n * n / total
+        self.mean += delta * n / total
+        self.n = total
+        self.min = min(self.min, low)
+        self.max = max(self.max, high)
+        self.counts = [a + b for a, b in zip(self.counts, counts)]
+    
+    def to_dict(self):
+        return {'n': self.n, 'mean': self.mean, 'm2': self.m2,
+                'min': self.min, 'max': self.max, 'counts': list(self.counts)}
+    
+    def std(self):
+        return math.sqrt(self.m2 / self.n) if self.n else 0.0
+    
+    def quantile(self, q, edges):
+        """Quantile interpolated within the profile bins, clipped to min/max."""
+        target = q * self.n
+        cumulative = 0
+        for b, count in enumerate(self.counts):
+            if count and cumulative + count >= target:
+                low = max(edges[b - 1] if b > 0 else self.min, self.min)
+                high = min(edges[b] if b < len(edges) else self.max, self.max)
+                return low + (high - low) * (target - cumulative) / count
+            cumulative += count
+        return self.max
+
+
+def _psi(counts, expected, n):
+    """Population stability index of bin counts against expected fractions."""
+    psi = 0.0
+    for count, e in zip(counts, expected):
+        a = max(count / n, PSI_FLOOR)
+        e = max(e, PSI_FLOOR)
+        psi += (a - e) * math.log(a / e)
+    return psi
+
+
+def _worst(statuses):
+    return max(statuses, key=STATUS_ORDER.index, default='ok')
+
+
+class _Cohort:
+    """Current and last complete window of one cohort."""
+    
+    def __init__(self, profile, feature_columns):
+        self.profile = profile
+        self.edges = [profile['features'][col]['edges'] for col in feature_columns]
+        self.current = self._new_window()
+        self.previous = None
+        self.n_total = 0
+        self.n_windows = 0
+    
+    def _new_window(self):
+        return [_FeatureStats(len(edges) + 1) for edges in self.edges]
+    
+    def roll(self, window):
+        """Start a new window once the current one is full."""
+        if window is not None and self.current[0].n >= window:
+            self.previous = self.current
+            self.current = self._new_window()
+            self.n_windows += 1
+    
+    def judged(self):
+        """Window the report is based on."""
+        if self.current[0].n >= MIN_WINDOW_SAMPLES or self.previous is None:
+            return self.current
+        return self.previous
+
+
+class DriftMonitor:
+    """
+    Constant-memory comparison of scored samples with the training profile.
+    
+    Thread-safe; recording returns the (cohort, feature) pairs that newly
+    reached 'drift' since the last check, so callers can log them once.
+    """
+    
+    def __init__(self, profile, window=DEFAULT_WINDOW):
+        self.profile = profile
+        self.window = window
+        self.feature_columns = list(profile['features'])
+        self._cohorts = {name: _Cohort(cohort, self.feature_columns)
+                         for name, cohort in profile['cohorts'].items()}
+        self._cohort_codes = None
+        self._lock = threading.Lock()
+        self._since_check = 0
+        self._flagged = set()
+    
+    def observe(self, features, gender=None):
+        """
+        Record one sample.
+        
+        Args:
+            features: Mapping with the profile's feature names, or a
+                sequence in profile['features'] order
+            gender (str): Normalized gender ("male"/"female"), or None
+        
+        Returns:
+            list: New drift alerts (see format_alert())
+        """
+        if hasattr(features, 'keys'):
+            values = [float(features[col]) for col in self.feature_columns]
+        else:
+            values = [float(x) for x in features]
+        # Missing or infinite values would spoil the running moments for good
+        if not all(math.isfinite(x) for x in values):
+            return []
+        
+        cohorts = [self._cohorts[ALL_COHORT]]
+        if gender in self._cohorts and gender != ALL_COHORT:
+            cohorts.append(self._cohorts[gender])
+        
+        with self._lock:
+            for cohort in cohorts:
+                for stats, edges, x in zip(cohort.current, cohort.edges, values):
+                    stats.add(x, bisect.bisect_right(edges, x))
+                cohort.n_total += 1
+                cohort.roll(self.window)
+            self._since_check += 1
+            return self._check() if self._since_check >= CHECK_INTERVAL else []
+    
+    def update(self, X, codes):
+        """
+        Record a batch of samples.
+        
+        Args:
+            X (np.ndarray): (n, n_features) matrix in profile['features']
+                order; rows with a missing or infinite value are skipped
+            codes (np.ndarray): Cohort codes from utils.encode_gender()
+        
+        Returns:
+            list: New drift alerts (see format_alert())
+        """
+        import numpy as np
+        from utils import encode_gender
+        
+        if self._cohort_codes is None:
+            self._cohort_codes = {name: int(encode_gender([name])[0])
+                                  for name in self._cohorts if name != ALL_COHORT}
+        
+        X = np.asarray(X, dtype=float)
+        if len(X) <= SCALAR_BATCH_ROWS:
+            names = {code: name for name, code in self._cohort_codes.items()}
+            alerts = []
+            for row, code in zip(X.tolist(), np.asarray(codes).tolist()):
+                alerts += self.observe(row, names.get(code))
+            return alerts
+        
+        complete = np.isfinite(X).all(axis=1)
+        X = X[complete]
+        codes = np.asarray(codes)[complete]
+        
+        with self._lock:
+            for name, cohort in self._cohorts.items():
+                rows = X if name == ALL_COHORT else X[codes == self._cohort_codes[name]]
+                if not len(rows):
+                    continue
+                # Contiguous columns: the per-feature passes below scan them
+                columns = np.ascontiguousarray(rows.T)
+                for stats, edges, values in zip(cohort.current, cohort.edges, columns):
+                    mean = values.mean()
+                    counts = np.bincount(np.searchsorted(edges, values, side='right'),
+                                         minlength=len(edges) + 1)
+                    stats.combine(len(values), float(mean), float(((values - mean) ** 2).sum()),
+                                  float(values.min()), float(values.max()), counts.tolist())
+                cohort.n_total += len(rows)
+                cohort.roll(self.window)
+            self._since_check += len(X)
+            return self._check() if self._since_check >= CHECK_INTERVAL else []
+    
+    def state(self):
+        """Current-window statistics, for merge_state() in another process."""
+        with self._lock:
+            return {name: [stats.to_dict() for stats in cohort.current]
+                    for name, cohort in self._cohorts.items()}
+    
+    def merge_state(self, state):
+        """Add the statistics of another monitor on the same profile (window=None)."""
+        with self._lock:
+            for name, features in state.items():
+                cohort = self._cohorts[name]
+                for stats, other in zip(cohort.current, features):
+                    stats.combine(other['n'], other['mean'], other['m2'],
+                                  other['min'], other['max'], other['counts'])
+                cohort.n_total += features[0]['n'] if features else 0
+    
+    def _check(self):
+        """New drift alerts; a pair alerts again after it went back below PSI_DRIFT."""
+        self._since_check = 0
+        alerts = []
+        for name, cohort in self._cohorts.items():
+            for col, result in self._features(cohort).items():
+                key = (name, col)
+                if result['status'] != 'drift':
+                    self._flagged.discard(key)
+                elif key not in self._flagged:
+                    self._flagged.add(key)
+                    alerts.append({'cohort': name, 'feature': col, **result})
+        return alerts
+    
+    def _features(self, cohort):
+        """Per-feature drift measures of a cohort's judged window."""
+        results = {}
+        for col, stats, edges in zip(self.feature_columns, cohort.judged(), cohort.edges):
+            trained = cohort.profile['features'][col]
+            result = {'n': stats.n, 'psi': None, 'mean_shift': None, 'std_ratio': None,
+                      'status': 'insufficient_data'}
+            if stats.n >= MIN_WINDOW_SAMPLES:
+                psi = _psi(stats.counts, trained['expected'], stats.n)
+                shift = (stats.mean - trained['mean']) / trained['std'] if trained['std'] > 0 else 0.0
+                if psi >= PSI_DRIFT or abs(shift) >= MEAN_SHIFT_DRIFT:
+                    status = 'drift'
+                elif psi >= PSI_WARNING or abs(shift) >= MEAN_SHIFT_WARNING:
+                    status = 'warning'
+                else:
+                    status = 'ok'
+                result.update({
+                    'psi': psi,
+                    'mean_shift': shift,
+                    'std_ratio': stats.std() / trained['std'] if trained['std'] > 0 else None,
+                    'status': status
+                })
+            results[col] = result
+        return results
+    
+    def report(self):
+        """
+        Drift measures per cohort and feature.
+        
+        Returns:
+            dict: 'status' (worst over all cohorts), 'window' and per cohort
+                'status', 'n_total', 'n_windows' and per feature the
+                measures, the window mean/std and REPORT_QUANTILES next to
+                the training values
+        """
+        with self._lock:
+            cohorts = {}
+            for name, cohort in self._cohorts.items():
+                features = self._features(cohort)
+                for col, stats, edges in zip(self.feature_columns, cohort.judged(), cohort.edges):
+                    trained = cohort.profile['features'][col]
+                    result = features[col]
+                    result['mean'] = stats.mean if stats.n else None
+                    result['std'] = stats.std() if stats.n else None
+                    result['training_mean'] = trained['mean']
+                    result['training_std'] = trained['std']
+                    result['quantiles'] = {
+                        str(q): stats.quantile(q, edges) if stats.n else None
+                        for q in REPORT_QUANTILES
+                    }
+                    result['training_quantiles'] = {
+                        str(q): trained['quantiles'][round(q * (PROFILE_GRID - 1))]
+                        for q in REPORT_QUANTILES
+                    }
+                cohorts[name] = {
+                    'status': _worst(f['status'] for f in features.values()),
+                    'n_total': cohort.n_total,
+                    'n_windows': cohort.n_windows,
+                    'features': features
+                }
+        return {
+            'status': _worst(c['status'] for c in cohorts.values()),
+            'window': self.window,
+            'cohorts': cohorts
+        }
+
+
+def format_alert(alert):
+    """One-line description of a drift alert."""
+    return (f"Input drift in {alert['feature']} ({alert['cohort']}): PSI {alert['psi']:.2f}, "
+            f"mean {alert['mean_shift']:+.2f} training SD over {alert['n']:,} samples")
+
+
+def print_report(report):
+    """Print a drift report as a per-cohort table."""
+    print()
+    print("-" * 60)
+    print("  INPUT DRIFT (vs training data)")
+    print("-" * 60)
+    for name, cohort in report['cohorts'].items():
+        n = max((f['n'] for f in cohort['features'].values()), default=0)
+        print(f"  {name}: {cohort['status']} ({n:,} samples)")
+        for col, result in cohort['features'].items():
+            if result['psi'] is None:
+                continue
+            print(f"    {col:<5} PSI {result['psi']:5.2f}   mean {result['mean_shift']:+5.2f} SD   "
+                  f"std x{result['std_ratio'] or 0:.2f}   {result['status']}")
+    print("-" * 60)
+
+
+def to_prometheus(report):
+    """Render a drift report as Prometheus gauges (cohort and feature labels)."""
+    lines = []
+    for measure, description in (('psi', 'Population stability index of the inputs.'),
+                                 ('mean_shift', 'Input mean shift in training SDs.')):
+        lines.append(f"# HELP {METRIC_NAME}_{measure} {description}")
+        lines.append(f"# TYPE {METRIC_NAME}_{measure} gauge")
+        for name, cohort in report['cohorts'].items():
+            for col, result in cohort['features'].items():
+                if result[measure] is not None:
+                    lines.append(f'{METRIC_NAME}_{measure}{{cohort="{name}",feature="{col}"}} '
+                                 f'{result[measure]:.6g}')
+    lines.append(f"# HELP {METRIC_NAME}_status Drift status (0 ok, 1 insufficient data, 2 warning, 3 drift).")
+    lines.append(f"# TYPE {METRIC_NAME}_status gauge")
+    for name, cohort in report['cohorts'].items():
+        lines.append(f'{METRIC_NAME}_status{{cohort="{name}"}} {STATUS_ORDER.index(cohort["status"])}')
+    return "\n".join(lines) + "\n"
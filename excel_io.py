@@ -0,0 +1,194 @@
+"""
+Streaming Excel Workbooks for Batch Scoring
+
+Analyzer exports (.xlsx) are read with openpyxl's read-only mode, which
+parses the sheet XML row by row, and handed to the scoring loop as
+pandas chunks of chunk_size rows. Results are written to a write-only
+workbook, which streams appended rows to a temporary file until the
+workbook is saved. Either way only one chunk is held in memory, plus the
+input's shared-string table (each distinct text value once).
+
+Header cells are matched to the pipeline's column names ignoring case,
+spaces, underscores and a trailing unit in parentheses ("MCV (fL)" ->
+MCV), and through COLUMN_ALIASES for names analyzers commonly use
+("HGB", "Sex", "Cinsiyet"). Matched columns are renamed to the pipeline
+name; other columns are passed through unchanged. Title rows above the
+header are skipped: the header is the first of the first
+HEADER_SEARCH_ROWS rows with a known column name.
+
+openpyxl is imported on first use.
+
+Usage:
+    python predict.py --input lab_export.xlsx --output scored.xlsx --uncertainty
+    
+    for chunk in read_workbook_chunks('lab_export.xlsx', 10_000, ['RBC', 'MCV', 'MCH', 'MCHC']):
+        ...
+"""
+
+import re
+
+
+# Constants
+WORKBOOK_EXTENSIONS = ('.xlsx', '.xlsm')
+RESULTS_SHEET = 'Results'
+HEADER_SEARCH_ROWS = 20
+
+# Dataset columns recognized in workbook headers
+KNOWN_COLUMNS = ['Gender', 'Age', 'Hb', 'RBC', 'PCV', 'MCV', 'MCH', 'MCHC']
+
+# Other header names analyzers use (normalized, see _normalize_name)
+COLUMN_ALIASES = {
+    'sex': 'Gender',
+    'cinsiyet': 'Gender',
+    'yas': 'Age',
+    'yaş': 'Age',
+    'hgb': 'Hb',
+    'hemoglobin': 'Hb',
+    'haemoglobin': 'Hb',
+    'hct': 'PCV',
+    'hematocrit': 'PCV',
+}
+
+
+def is_workbook(path):
+    """True if the path has an Excel workbook extension."""
+    return path.lower().endswith(WORKBOOK_EXTENSIONS)
+
+
+def _normalize_name(name):
+    """'MCV (fL)' -> 'mcv'; None for empty header cells."""
+    if name is None:
+        return None
+    text = re.sub(r'\(.*\)\s*$', '', str(name))
+    return re.sub(r'[\s_]+', '', text).lower() or None
+
+
+def map_columns(header, columns=KNOWN_COLUMNS):
+    """
+    Pipeline column names for a workbook header row.
+    
+    Args:
+        header (tuple): Header cell values
+        columns (list): Pipeline column names to recognize
+    
+    Returns:
+        tuple: (names, number of recognized columns); unrecognized cells
+            keep their text, empty ones become 'Unnamed: <position>'
+    """
+    lookup = dict(COLUMN_ALIASES)
+    lookup.update({_normalize_name(col): col for col in columns})
+    
+    names = []
+    recognized = 0
+    for j, cell in enumerate(header):
+        column = lookup.get(_normalize_name(cell))
+        if column is not None and column not in names:
+            recognized += 1
+            names.append(column)
+        else:
+            names.append(str(cell).strip() if cell is not None else f"Unnamed: {j}")
+    return names, recognized
+
+
+def _frame(rows, names, numeric_columns):
+    """DataFrame of buffered rows; numeric columns as float64 (text and blanks -> NaN)."""
+    import pandas as pd
+    
+    df = pd.DataFrame.from_records(rows, columns=names)
+    for col in numeric_columns:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce').astype('float64')
+    return df
+
+
+def read_workbook_chunks(path, chunk_size, numeric_columns, sheet=None):
+    """
+    Stream a worksheet as DataFrames of at most chunk_size rows.
+    
+    Args:
+        path (str): .xlsx workbook
+        chunk_size (int): Rows per chunk
+        numeric_columns (list): Columns converted to float64
+        sheet (str): Worksheet name (default: the first sheet)
+    
+    Yields:
+        pd.DataFrame: Rows in sheet order, columns named as map_columns()
+            returns them; completely empty rows are skipped
+    
+    Raises:
+        ValueError: If the sheet doesn't exist or has no header row
+    """
+    from openpyxl import load_workbook
+    
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        if sheet is None:
+            worksheet = workbook.worksheets[0]
+        elif sheet in workbook.sheetnames:
+            worksheet = workbook[sheet]
+        else:
+            raise ValueError(f"Worksheet not found: {sheet} (available: {', '.join(workbook.sheetnames)})")
+        
+        rows = worksheet.iter_rows(values_only=True)
+        names = None
+        for _, header in zip(range(HEADER_SEARCH_ROWS), rows):
+            candidate, recognized = map_columns(header, KNOWN_COLUMNS + list(numeric_columns))
+            if recognized:
+                names = candidate
+                break
+        if names is None:
+            raise ValueError(
+                f"No header row with known columns ({', '.join(KNOWN_COLUMNS)}) "
+                f"in the first {HEADER_SEARCH_ROWS} rows of {path}"
+            )
+        
+        width = len(names)
+        buffer = []
+        for row in rows:
+            if all(value is None for value in row):
+                continue
+            if len(row) < width:
+                row = row + (None,) * (width - len(row))
+            buffer.append(row[:width])
+            if len(buffer) == chunk_size:
+                yield _frame(buffer, names, numeric_columns)
+                buffer = []
+        if buffer:
+            yield _frame(buffer, names, numeric_columns)
+    finally:
+        workbook.close()
+
+
+class WorkbookWriter:
+    """
+    Write-only workbook with one sheet, filled chunk by chunk.
+    
+    Nothing is written to `path` until save(); used as a context manager
+    the workbook is only saved if no exception occurred.
+    """
+    
+    def __init__(self, path, sheet_name=RESULTS_SHEET):
+        from openpyxl import Workbook
+        
+        self.path = path
+        self._workbook = Workbook(write_only=True)
+        self._worksheet = self._workbook.create_sheet(sheet_name)
+    
+    def append(self, df, header=False):
+        """Append a DataFrame's rows (and its column names first if header); NaN -> empty cell."""
+        if header:
+            self._worksheet.append([str(col) for col in df.columns])
+        cells = df.astype(object).where(df.notna(), None)
+        for row in cells.itertuples(index=False, name=None):
+            self._worksheet.append(row)
+    
+    def save(self):
+        self._workbook.save(self.path)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.save()
+        return False
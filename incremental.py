@@ -0,0 +1,190 @@
+"""
+Incremental Model Updates
+
+Ordinary least squares is fully determined by the sufficient statistics
+of its training rows (row count, means and centered cross-products, see
+sufficient_stats.py). train.py stores them in the compact model artifact,
+so new labeled rows are folded in by summarizing only those rows, merging
+and solving the 4x4 system again. The cost is O(new rows), and the result
+equals a full refit on the old training rows plus the new ones up to
+floating-point rounding.
+
+train.py publishes each update as a new model registry version (see
+model_registry.py). Its metadata records the total number of training
+samples ('n_train'), how many of them were added incrementally
+('n_incremental') and the updates since the last full training
+('update_count'). Before the new
+rows are absorbed, the current model is scored on them; that prequential
+error is kept in 'last_update'. 'test_metrics' still describes the
+original holdout evaluation and the drift profile ('drift_profile', see
+drift.py) the original training rows. The calibrated prediction
+intervals ('calibration', see calibration.py) are dropped: their
+residuals belong to the previous coefficients, so they carry no coverage
+guarantee for the updated model, and consumers fall back to the
+similar-sample analysis until the next full training.
+
+Usage:
+    python train.py --update data/new_measurements.csv
+    
+    model = update_model(load_artifact('model/hemoglobin_model.json'), X_new, y_new)
+"""
+
+import os
+from datetime import datetime, timezone
+
+import numpy as np
+
+from calibration import CALIBRATION_KEY
+from scoring import LinearModel
+from sufficient_stats import DEFAULT_CHUNK_SIZE, RegressionStatistics
+
+
+# Metadata key of the stored sufficient statistics
+STATISTICS_KEY = 'sufficient_statistics'
+
+
+def model_statistics(model):
+    """
+    Sufficient statistics stored in a model artifact.
+    
+    Returns:
+        RegressionStatistics: Or None for artifacts written before they
+            were stored
+    
+    Raises:
+        ValueError: If the statistics do not match the model's features
+    """
+    data = model.metadata.get(STATISTICS_KEY)
+    if data is None:
+        return None
+    
+    stats = RegressionStatistics.from_dict(data)
+    if len(stats.mean_x) != len(model.feature_columns):
+        raise ValueError(
+            f"Stored statistics have {len(stats.mean_x)} features, "
+            f"model has {len(model.feature_columns)}"
+        )
+    return stats
+
+
+def _summarize(model, chunks):
+    """Statistics and prequential error sums of new (X, y) chunks."""
+    batch = RegressionStatistics(len(model.feature_columns))
+    abs_error = sq_error = 0.0
+    for X, y in chunks:
+        residual = y - model.predict(X)
+        abs_error += float(np.abs(residual).sum())
+        sq_error += float(residual @ residual)
+        batch.update(X, y)
+    return batch, abs_error, sq_error
+
+
+def _apply(model, stats, batch, abs_error, sq_error, source):
+    """Merge a batch into the model's statistics and build the new version."""
+    if batch.n == 0:
+        raise ValueError("No complete rows to add")
+    
+    merged = RegressionStatistics.from_dict(stats.to_dict())
+    merged.merge(batch)
+    coefficients, intercept = merged.solve()
+    
+    columns = model.feature_columns
+    metadata = dict(model.metadata)
+    # Residuals of the previous coefficients say nothing about the new ones
+    metadata.pop(CALIBRATION_KEY, None)
+    metadata.update({
+        'update_count': int(metadata.get('update_count', 0)) + 1,
+        'updated_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'n_train': int(merged.n),
+        'n_incremental': int(metadata.get('n_incremental', 0)) + int(batch.n),
+        'feature_mean': dict(zip(columns, map(float, merged.mean_x))),
+        'feature_std': dict(zip(columns, map(float, merged.feature_std()))),
+        'target_mean': float(merged.mean_y),
+        'target_std': merged.target_std(),
+        'last_update': {
+            'source': source,
+            'rows': int(batch.n),
+            'prequential_MAE': abs_error / batch.n,
+            'prequential_RMSE': float(np.sqrt(sq_error / batch.n))
+        },
+        STATISTICS_KEY: merged.to_dict()
+    })
+    return LinearModel(coefficients, intercept, columns, metadata)
+
+
+def update_model(model, X, y, stats=None, source='api'):
+    """
+    Fold new labeled rows into a model.
+    
+    Args:
+        model (LinearModel): Current model (from scoring.load_artifact)
+        X: (n, n_features) new feature rows in model.feature_columns order
+        y: (n,) true Hb values
+        stats (RegressionStatistics): Statistics of the current model's
+            training rows (default: those stored in the artifact)
+        source (str): Label recorded in 'last_update'
+    
+    Returns:
+        LinearModel: The updated model (the input is not modified)
+    
+    Raises:
+        ValueError: If no statistics are available or there are no rows
+    """
+    if stats is None:
+        stats = model_statistics(model)
+    if stats is None:
+        raise ValueError("Model artifact has no sufficient statistics; retrain with 'python train.py'")
+    
+    X = np.asarray(X, dtype=float).reshape(-1, len(model.feature_columns))
+    y = np.asarray(y, dtype=float).reshape(-1)
+    complete = ~(np.isnan(X).any(axis=1) | np.isnan(y))
+    batch = _summarize(model, [(X[complete], y[complete])])
+    return _apply(model, stats, *batch, source)
+
+
+def _iter_csv_rows(paths, feature_columns, target_column, chunk_size, counts):
+    """Yield complete (X, y) chunks of CSV files; counts rows read and dropped."""
+    import pandas as pd
+    
+    columns = list(feature_columns) + [target_column]
+    for path in paths:
+        reader = pd.read_csv(path, usecols=columns, dtype={col: 'float64' for col in columns},
+                             chunksize=chunk_size)
+        for chunk in reader:
+            values = chunk[columns].to_numpy()
+            complete = ~np.isnan(values).any(axis=1)
+            counts['rows'] += len(values)
+            counts['dropped'] += int((~complete).sum())
+            values = values[complete]
+            yield values[:, :-1], values[:, -1]
+
+
+def update_from_csv(model, paths, target_column='Hb', stats=None,
+                    chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Fold the rows of one or more CSV files into a model.
+    
+    Files are streamed in chunks, so memory does not depend on their
+    size. Rows with a missing feature or target are skipped.
+    
+    Returns:
+        tuple: (updated LinearModel, dict with 'rows' and 'dropped')
+    
+    Raises:
+        FileNotFoundError: If a file doesn't exist
+        ValueError: If no statistics are available, a column is missing
+            or there are no complete rows
+    """
+    if stats is None:
+        stats = model_statistics(model)
+    if stats is None:
+        raise ValueError("Model artifact has no sufficient statistics; retrain with 'python train.py'")
+    for path in paths:
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Data file not found: {path}")
+    
+    counts = {'rows': 0, 'dropped': 0}
+    chunks = _iter_csv_rows(paths, model.feature_columns, target_column, chunk_size, counts)
+    batch = _summarize(model, chunks)
+    source = ", ".join(os.path.basename(path) for path in paths)
+    return _apply(model, stats, *batch, source), counts
@@ -0,0 +1,175 @@
+"""
+Load Generator for the Inference Service
+
+Replays samples from the dataset against a running serve.py instance
+from many concurrent clients and reports throughput and latency
+percentiles (p50/p95/p99).
+
+Usage:
+    python serve.py &
+    python loadgen.py --concurrency 32 --requests 5000
+"""
+
+import os
+import json
+import time
+import argparse
+import threading
+import http.client
+from urllib.parse import urlparse
+
+import numpy as np
+import pandas as pd
+
+
+# Constants
+DATA_PATH = os.path.join('data', 'anemia_new.csv')
+FEATURE_COLUMNS = ['RBC', 'MCV', 'MCH', 'MCHC']
+DEFAULT_URL = 'http://127.0.0.1:8000'
+DEFAULT_CONCURRENCY = 16
+DEFAULT_REQUESTS = 2000
+RANDOM_STATE = 42
+
+
+def build_payloads(n, seed=RANDOM_STATE):
+    """Sample request bodies from the dataset."""
+    df = pd.read_csv(DATA_PATH)
+    rows = df.sample(n=n, replace=True, random_state=seed)
+    
+    payloads = []
+    for row in rows[FEATURE_COLUMNS + ['Gender']].itertuples(index=False):
+        sample = dict(zip(FEATURE_COLUMNS, map(float, row[:-1])))
+        sample['Gender'] = row[-1]
+        payloads.append(json.dumps(sample).encode('utf-8'))
+    return payloads
+
+
+def _client(host, port, payloads, latencies, errors):
+    """Send payloads sequentially over one keep-alive connection."""
+    conn = http.client.HTTPConnection(host, port, timeout=30)
+    headers = {'Content-Type': 'application/json'}
+    
+    for body in payloads:
+        start = time.perf_counter()
+        try:
+            conn.request('POST', '/predict', body=body, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            if response.status != 200:
+                errors.append(response.status)
+                continue
+        except (OSError, http.client.HTTPException) as e:
+            errors.append(str(e))
+            conn.close()
+            conn = http.client.HTTPConnection(host, port, timeout=30)
+            continue
+        latencies.append(time.perf_counter() - start)
+    
+    conn.close()
+
+
+def run_load(url, concurrency, n_requests):
+    """
+    Run the load test.
+    
+    Args:
+        url (str): Base URL of the service
+        concurrency (int): Number of concurrent clients
+        n_requests (int): Total requests across all clients
+    
+    Returns:
+        dict: Throughput and latency percentiles in milliseconds
+    """
+    parsed = urlparse(url)
+    payloads = build_payloads(n_requests)
+    
+    latencies = []
+    errors = []
+    threads = [
+        threading.Thread(
+            target=_client,
+            args=(parsed.hostname, parsed.port, payloads[i::concurrency], latencies, errors)
+        )
+        for i in range(concurrency)
+    ]
+    
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    
+    latencies_ms = np.array(latencies) * 1000.0
+    summary = {
+        'requests': len(latencies),
+        'errors': len(errors),
+        'seconds': elapsed,
+        'requests_per_sec': len(latencies) / elapsed if elapsed > 0 else 0.0
+    }
+    if len(latencies_ms):
+        summary.update({
+            'p50_ms': float(np.percentile(latencies_ms, 50)),
+            'p95_ms': float(np.percentile(latencies_ms, 95)),
+            'p99_ms': float(np.percentile(latencies_ms, 99)),
+            'max_ms': float(latencies_ms.max())
+        })
+    return summary
+
+
+def fetch_stats(url):
+    """Get the service's batching counters."""
+    parsed = urlparse(url)
+    conn = http.client.HTTPConnection(parsed.hostname, parsed.port, timeout=10)
+    conn.request('GET', '/stats')
+    stats = json.loads(conn.getresponse().read())
+    conn.close()
+    return stats
+
+
+def parse_args(argv=None):
+    """Parse command-line arguments."""
+    parser = argparse.ArgumentParser(description="Load generator for serve.py")
+    parser.add_argument('--url', default=DEFAULT_URL)
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument('--requests', type=int, default=DEFAULT_REQUESTS)
+    args = parser.parse_args(argv)
+    
+    if args.concurrency <= 0 or args.requests <= 0:
+        parser.error("--concurrency and --requests must be positive")
+    
+    return args
+
+
+def main(argv=None):
+    """Run the load test and print a summary."""
+    args = parse_args(argv)
+    
+    print(f"Sending {args.requests} requests to {args.url} "
+          f"from {args.concurrency} concurrent clients...")
+    summary = run_load(args.url, args.concurrency, args.requests)
+    
+    print()
+    print("-" * 60)
+    print("  LOAD TEST RESULTS")
+    print("-" * 60)
+    print(f"  Requests:    {summary['requests']} ({summary['errors']} errors)")
+    print(f"  Throughput:  {summary['requests_per_sec']:.0f} req/sec")
+    if 'p50_ms' in summary:
+        print(f"  Latency p50: {summary['p50_ms']:.2f} ms")
+        print(f"  Latency p95: {summary['p95_ms']:.2f} ms")
+        print(f"  Latency p99: {summary['p99_ms']:.2f} ms")
+        print(f"  Latency max: {summary['max_ms']:.2f} ms")
+    
+    try:
+        stats = fetch_stats(args.url)
+        print(f"  Mean batch:  {stats['mean_batch_size']:.1f} samples "
+              f"({stats['batches']} batches)")
+    except (OSError, http.client.HTTPException, ValueError):
+        pass
+    print("-" * 60)
+    print()
+
+
+if __name__ == "__main__":
+    main()
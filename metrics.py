@@ -0,0 +1,368 @@
+"""
+Per-Stage Latency Metrics
+
+Lightweight timing hooks for the pipeline stages (model load, input
+validation, prediction, neighbor search, uncertainty, rendering, ...).
+Durations are collected into fixed-bucket histograms, so snapshots from
+several processes and runs can be merged by adding bucket counts, and
+p50/p95/p99 are estimated from the buckets the same way Prometheus'
+histogram_quantile() does.
+
+Collection is off unless a snapshot file is configured, either with the
+PIPELINE_METRICS_FILE environment variable or an entry point's --metrics
+flag. When off, stage() returns a shared no-op context manager and
+clock() returns None, so the hooks cost well under a microsecond.
+
+On flush() the process' counts are merged into the JSON snapshot file
+and a Prometheus text-format copy is written next to it (same name with
+a .prom suffix) for a node_exporter textfile collector.
+
+Usage:
+    with stage('predict.prediction'):
+        predicted_hb = predict_hemoglobin(model_data, features)
+    flush()
+    
+    python metrics.py metrics/pipeline.json               # summary table
+    python metrics.py metrics/pipeline.json --prometheus  # text format
+"""
+
+import os
+import sys
+import json
+import time
+import bisect
+import argparse
+import threading
+import contextlib
+
+
+# Constants
+METRICS_FILE_ENV = 'PIPELINE_METRICS_FILE'
+METRIC_NAME = 'hemoglobin_stage_duration_seconds'
+SNAPSHOT_VERSION = 1
+
+# Histogram bucket upper bounds: 10 us to ~100 s, 8 buckets per decade
+# (each ~33% wider than the previous one)
+BUCKET_BOUNDS = tuple(round(10 ** (exponent / 8.0), 12) for exponent in range(-40, 17))
+QUANTILES = (0.5, 0.95, 0.99)
+
+_NULL_STAGE = contextlib.nullcontext()
+
+
+class Histogram:
+    """Fixed-bucket duration histogram (seconds)."""
+    
+    __slots__ = ('counts', 'count', 'total', 'maximum')
+    
+    def __init__(self):
+        self.counts = [0] * (len(BUCKET_BOUNDS) + 1)  # last bucket is +Inf
+        self.count = 0
+        self.total = 0.0
+        self.maximum = 0.0
+    
+    def observe(self, seconds):
+        """Record one duration."""
+        self.counts[bisect.bisect_left(BUCKET_BOUNDS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.maximum:
+            self.maximum = seconds
+    
+    def merge(self, other):
+        """Add another histogram's observations to this one."""
+        for i, n in enumerate(other.counts):
+            self.counts[i] += n
+        self.count += other.count
+        self.total += other.total
+        self.maximum = max(self.maximum, other.maximum)
+    
+    def quantile(self, q):
+        """
+        Estimate a quantile by linear interpolation inside its bucket.
+        
+        Returns:
+            float: Estimated duration in seconds (0.0 when empty)
+        """
+        if self.count == 0:
+            return 0.0
+        
+        rank = q * self.count
+        cumulative = 0
+        for i, n in enumerate(self.counts):
+            if n and cumulative + n >= rank:
+                lower = BUCKET_BOUNDS[i - 1] if i > 0 else 0.0
+                upper = BUCKET_BOUNDS[i] if i < len(BUCKET_BOUNDS) else self.maximum
+                estimate = lower + (upper - lower) * (rank - cumulative) / n
+                return min(estimate, self.maximum)
+            cumulative += n
+        return self.maximum
+    
+    def summary(self):
+        """Count, sum, max and quantile estimates."""
+        result = {'count': self.count, 'sum_s': self.total, 'max_s': self.maximum}
+        for q in QUANTILES:
+            result[f"p{int(q * 100)}_s"] = self.quantile(q)
+        return result
+    
+    def to_dict(self):
+        """Serializable histogram state."""
+        return {'counts': self.counts, 'count': self.count,
+                'sum_s': self.total, 'max_s': self.maximum}
+    
+    @classmethod
+    def from_dict(cls, data):
+        """Rebuild from to_dict() output."""
+        histogram = cls()
+        if len(data['counts']) != len(histogram.counts):
+            raise ValueError("Histogram bucket layout does not match")
+        histogram.counts = list(data['counts'])
+        histogram.count = data['count']
+        histogram.total = data['sum_s']
+        histogram.maximum = data['max_s']
+        return histogram
+
+
+class MetricsRegistry:
+    """Stage name -> Histogram, safe to update from several threads."""
+    
+    def __init__(self, snapshot_path=None):
+        self.snapshot_path = snapshot_path
+        self.histograms = {}
+        self._lock = threading.Lock()
+    
+    @property
+    def enabled(self):
+        return self.snapshot_path is not None
+    
+    def observe(self, name, seconds):
+        """Record one stage duration."""
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(seconds)
+    
+    @contextlib.contextmanager
+    def _timed(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+    
+    def stage(self, name):
+        """Context manager timing one stage (a shared no-op when disabled)."""
+        if self.snapshot_path is None:
+            return _NULL_STAGE
+        return self._timed(name)
+    
+    def copy(self):
+        """Return a copy of the collected histograms."""
+        with self._lock:
+            copies = {}
+            for name, histogram in self.histograms.items():
+                copies[name] = Histogram()
+                copies[name].merge(histogram)
+        return copies
+    
+    def take(self):
+        """Return the collected histograms and start from empty ones."""
+        with self._lock:
+            histograms, self.histograms = self.histograms, {}
+        return histograms
+
+
+REGISTRY = MetricsRegistry(os.environ.get(METRICS_FILE_ENV) or None)
+
+
+def configure(snapshot_path):
+    """Enable collection into snapshot_path (None disables it)."""
+    REGISTRY.snapshot_path = snapshot_path
+
+
+def is_enabled():
+    """True when stage timings are being collected."""
+    return REGISTRY.enabled
+
+
+def stage(name):
+    """Time a `with` block as stage `name`."""
+    return REGISTRY.stage(name)
+
+
+def clock():
+    """Start time for observe_since(), or None when collection is off."""
+    if REGISTRY.snapshot_path is None:
+        return None
+    return time.perf_counter()
+
+
+def observe_since(name, start):
+    """Record the time elapsed since clock() as stage `name`."""
+    if start is not None:
+        REGISTRY.observe(name, time.perf_counter() - start)
+
+
+def load_snapshot(filepath):
+    """
+    Read a JSON snapshot.
+    
+    Returns:
+        dict: Stage name -> Histogram (empty if the file doesn't exist)
+    """
+    if not os.path.exists(filepath):
+        return {}
+    
+    with open(filepath, encoding='utf-8') as f:
+        data = json.load(f)
+    bounds = data.get('bucket_bounds_s', [])
+    if data.get('version') != SNAPSHOT_VERSION or list(bounds) != list(BUCKET_BOUNDS):
+        raise ValueError(f"Incompatible metrics snapshot: {filepath}")
+    
+    return {name: Histogram.from_dict(state) for name, state in data['stages'].items()}
+
+
+def snapshot_dict(histograms):
+    """JSON snapshot contents: quantile summary plus mergeable bucket counts."""
+    return {
+        'version': SNAPSHOT_VERSION,
+        'updated_at': time.time(),
+        'bucket_bounds_s': list(BUCKET_BOUNDS),
+        'stages': {
+            name: {**histograms[name].summary(), **histograms[name].to_dict()}
+            for name in sorted(histograms)
+        }
+    }
+
+
+def to_prometheus(histograms):
+    """
+    Render histograms in the Prometheus text exposition format.
+    
+    Stage names are exported as a `stage` label; the estimated quantiles
+    are exported as a separate gauge.
+    """
+    lines = [
+        f"# HELP {METRIC_NAME} Pipeline stage latency.",
+        f"# TYPE {METRIC_NAME} histogram"
+    ]
+    for name in sorted(histograms):
+        histogram = histograms[name]
+        cumulative = 0
+        for bound, n in zip(BUCKET_BOUNDS, histogram.counts):
+            cumulative += n
+            lines.append(f'{METRIC_NAME}_bucket{{stage="{name}",le="{bound:.6g}"}} {cumulative}')
+        lines.append(f'{METRIC_NAME}_bucket{{stage="{name}",le="+Inf"}} {histogram.count}')
+        lines.append(f'{METRIC_NAME}_sum{{stage="{name}"}} {histogram.total:.9g}')
+        lines.append(f'{METRIC_NAME}_count{{stage="{name}"}} {histogram.count}')
+    
+    lines.append(f"# HELP {METRIC_NAME}_quantile Estimated pipeline stage latency quantiles.")
+    lines.append(f"# TYPE {METRIC_NAME}_quantile gauge")
+    for name in sorted(histograms):
+        for q in QUANTILES:
+            value = histograms[name].quantile(q)
+            lines.append(f'{METRIC_NAME}_quantile{{stage="{name}",quantile="{q}"}} {value:.9g}')
+    
+    return "\n".join(lines) + "\n"
+
+
+def _write_atomic(filepath, text):
+    """Write a file via temp file + rename so readers never see partial output."""
+    import tempfile
+    
+    directory = os.path.dirname(filepath) or '.'
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp_path, filepath)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+@contextlib.contextmanager
+def _file_lock(filepath):
+    """Serialize snapshot updates across processes (no-op without fcntl)."""
+    try:
+        import fcntl
+    except ImportError:
+        yield
+        return
+    
+    with open(filepath + '.lock', 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def flush():
+    """
+    Merge this process' observations into the snapshot file.
+    
+    The in-process histograms are reset afterwards, so long-running
+    processes (the Streamlit app) can flush after every rerun without
+    counting anything twice.
+    """
+    filepath = REGISTRY.snapshot_path
+    if filepath is None:
+        return
+    
+    histograms = REGISTRY.take()
+    if not histograms:
+        return
+    
+    os.makedirs(os.path.dirname(filepath) or '.', exist_ok=True)
+    with _file_lock(filepath):
+        merged = load_snapshot(filepath)
+        for name, histogram in histograms.items():
+            merged.setdefault(name, Histogram()).merge(histogram)
+        
+        _write_atomic(filepath, json.dumps(snapshot_dict(merged), indent=2))
+        _write_atomic(os.path.splitext(filepath)[0] + '.prom', to_prometheus(merged))
+
+
+def print_summary(histograms):
+    """Print a per-stage latency table."""
+    print("-" * 72)
+    print("  PIPELINE STAGE LATENCY")
+    print("-" * 72)
+    print(f"  {'Stage':<30}{'count':>8}{'p50 ms':>11}{'p95 ms':>11}{'p99 ms':>11}")
+    for name in sorted(histograms):
+        histogram = histograms[name]
+        print(f"  {name:<30}{histogram.count:>8}"
+              + "".join(f"{histogram.quantile(q) * 1000.0:>11.3f}" for q in QUANTILES))
+    print("-" * 72)
+
+
+def main(argv=None):
+    """Show a metrics snapshot."""
+    parser = argparse.ArgumentParser(description="Pipeline stage latency snapshot")
+    parser.add_argument('snapshot', nargs='?', default=os.environ.get(METRICS_FILE_ENV),
+                        help=f"JSON snapshot file (default: ${METRICS_FILE_ENV})")
+    parser.add_argument('--prometheus', action='store_true',
+                        help="Print the Prometheus text format instead of a table")
+    args = parser.parse_args(argv)
+    
+    if not args.snapshot:
+        parser.error(f"no snapshot file given and {METRICS_FILE_ENV} is not set")
+    
+    try:
+        histograms = load_snapshot(args.snapshot)
+    except ValueError as e:
+        print(f"ERROR: {e}")
+        sys.exit(1)
+    
+    if args.prometheus:
+        sys.stdout.write(to_prometheus(histograms))
+    elif not histograms:
+        print(f"No observations in {args.snapshot}")
+    else:
+        print_summary(histograms)
+
+
+if __name__ == "__main__":
+    main()
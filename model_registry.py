@@ -0,0 +1,405 @@
+"""
+Versioned Model Registry
+
+Every trained or updated model is published as a new, never modified
+version directory, and a small pointer file names the version consumers
+should use:
+    
+    model/registry/
+        CURRENT              {"version": "v000003", "sha256": ..., "activated_at": ...}
+        v000001/hemoglobin_model.json
+        v000001/hemoglobin_model.pkl
+        v000002/...
+
+Publishing writes the files into a staging directory, renames it to the
+next version name and then replaces CURRENT atomically (temp file +
+rename), so readers see either the old or the new version, never a
+partially written one. Rolling back is pointing CURRENT at an older
+version. Only the newest KEEP_VERSIONS versions (and the current one)
+are kept.
+
+ModelHandle keeps a loaded model and follows CURRENT. The change check
+is one stat() of the pointer file; a new version is fully loaded before
+it is swapped in, and services run the check in a background thread, so
+requests never wait for a load and always see a complete model.
+
+The path and the version come from a single read of CURRENT, and the
+artifact's SHA-256 must match the one recorded there before it is used;
+a mismatch raises ValueError (ModelHandle keeps the loaded version).
+
+Without a registry (models saved by earlier versions of train.py) the
+top-level model/hemoglobin_model.json or .pkl is used.
+
+Only the standard library is imported, so loaders stay cheap to start.
+
+Usage:
+    python model_registry.py                      # list versions
+    python model_registry.py --activate v000002   # roll back / promote
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import argparse
+import tempfile
+import threading
+from datetime import datetime, timezone
+
+
+# Constants
+REGISTRY_DIRNAME = 'registry'
+POINTER_FILENAME = 'CURRENT'
+MODEL_FILENAME = 'hemoglobin_model.pkl'
+COMPACT_MODEL_FILENAME = 'hemoglobin_model.json'
+VERSION_PREFIX = 'v'
+VERSION_DIGITS = 6
+KEEP_VERSIONS = 20
+DEFAULT_CHECK_INTERVAL = 1.0  # seconds between pointer checks
+
+
+def registry_dir(model_dir='model'):
+    """Registry directory inside a model directory."""
+    return os.path.join(model_dir, REGISTRY_DIRNAME)
+
+
+def _is_version(name):
+    return (name.startswith(VERSION_PREFIX) and len(name) == len(VERSION_PREFIX) + VERSION_DIGITS
+            and name[len(VERSION_PREFIX):].isdigit())
+
+
+def list_versions(model_dir='model'):
+    """Published version names, oldest first."""
+    directory = registry_dir(model_dir)
+    if not os.path.isdir(directory):
+        return []
+    return sorted(name for name in os.listdir(directory) if _is_version(name))
+
+
+def read_pointer(model_dir='model'):
+    """
+    Read the CURRENT pointer.
+    
+    Returns:
+        dict: 'version', 'sha256' and 'activated_at', or None if no
+            version has been published
+    """
+    try:
+        with open(os.path.join(registry_dir(model_dir), POINTER_FILENAME), encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _model_file(directory):
+    """The artifact loaders use in a directory: compact JSON first, then the pickle."""
+    for filename in (COMPACT_MODEL_FILENAME, MODEL_FILENAME):
+        path = os.path.join(directory, filename)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def _file_checksum(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def check_digest(path, sha256):
+    """
+    Raises:
+        ValueError: If the file's SHA-256 differs from `sha256`
+    """
+    if _file_checksum(path) != sha256:
+        raise ValueError(f"Model file {path} does not match its registry checksum")
+
+
+def current_model(model_dir='model', verify=True):
+    """
+    Model file consumers should load, with the pointer it was resolved from.
+    
+    CURRENT is read once, so the path and the version always belong
+    together even if another version is activated meanwhile.
+    
+    Args:
+        model_dir (str): Model directory holding the registry
+        verify (bool): Check the artifact against the pointer's SHA-256
+    
+    Returns:
+        tuple: (path, pointer); path is the current registry version's
+            artifact, else the legacy top-level artifact (pointer None),
+            or None if there is no model
+    
+    Raises:
+        ValueError: If verify is set and the artifact does not match
+    """
+    pointer = read_pointer(model_dir)
+    if pointer is not None:
+        directory = os.path.join(registry_dir(model_dir), pointer['version'])
+        # Pointers written before 'file' was recorded name only the version
+        path = os.path.join(directory, pointer['file']) if 'file' in pointer else _model_file(directory)
+        if path is not None and os.path.exists(path):
+            if verify:
+                check_digest(path, pointer['sha256'])
+            return path, pointer
+    return _model_file(model_dir), None
+
+
+def active_model_path(model_dir='model', verify=True):
+    """
+    Path of the model file consumers should load (see current_model()).
+    
+    Returns:
+        str: The current registry version's artifact, else the legacy
+            top-level artifact, or None if there is no model
+    
+    Raises:
+        ValueError: If verify is set and the artifact does not match
+    """
+    return current_model(model_dir, verify)[0]
+
+
+def activate(version, model_dir='model'):
+    """
+    Point CURRENT at a published version (atomic).
+    
+    Returns:
+        dict: The new pointer
+    
+    Raises:
+        ValueError: If the version does not exist or has no model file
+    """
+    path = _model_file(os.path.join(registry_dir(model_dir), version))
+    if not _is_version(version) or path is None:
+        raise ValueError(f"Unknown model version: {version}")
+    
+    pointer = {
+        'version': version,
+        'file': os.path.basename(path),
+        'sha256': _file_checksum(path),
+        'activated_at': datetime.now(timezone.utc).isoformat(timespec='seconds')
+    }
+    directory = registry_dir(model_dir)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(pointer, f, indent=2)
+        os.replace(tmp_path, os.path.join(directory, POINTER_FILENAME))
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    return pointer
+
+
+def prune(model_dir='model', keep=KEEP_VERSIONS):
+    """Delete all but the newest `keep` versions (the current one is always kept)."""
+    pointer = read_pointer(model_dir)
+    current = pointer['version'] if pointer else None
+    for version in list_versions(model_dir)[:-keep or None]:
+        if version != current:
+            shutil.rmtree(os.path.join(registry_dir(model_dir), version), ignore_errors=True)
+
+
+def publish(write_files, model_dir='model', make_current=True, keep=KEEP_VERSIONS):
+    """
+    Publish a new model version.
+    
+    Args:
+        write_files (callable): write_files(directory) writes the model
+            files into an empty staging directory
+        model_dir (str): Model directory holding the registry
+        make_current (bool): Switch CURRENT to the new version
+        keep (int): Versions to keep (see prune())
+    
+    Returns:
+        str: The new version name
+    """
+    directory = registry_dir(model_dir)
+    os.makedirs(directory, exist_ok=True)
+    staging = tempfile.mkdtemp(dir=directory, prefix='.staging-')
+    try:
+        write_files(staging)
+        
+        # rename() fails if a concurrent publisher took the name; try the next one
+        while True:
+            versions = list_versions(model_dir)
+            number = int(versions[-1][len(VERSION_PREFIX):]) + 1 if versions else 1
+            version = f"{VERSION_PREFIX}{number:0{VERSION_DIGITS}d}"
+            try:
+                os.rename(staging, os.path.join(directory, version))
+                break
+            except OSError:
+                if not os.path.exists(os.path.join(directory, version)):
+                    raise
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    
+    if make_current:
+        activate(version, model_dir)
+    prune(model_dir, keep)
+    return version
+
+
+class ModelHandle:
+    """
+    A loaded model that follows the registry's current version.
+    
+    Readers take `handle.model_data` (or get()); a reload replaces the
+    reference in one assignment, so a request uses either the old or the
+    new model for all of its rows.
+    """
+    
+    def __init__(self, load, model_dir='model', check_interval=DEFAULT_CHECK_INTERVAL):
+        """
+        Args:
+            load (callable): load(path) -> model_data dict
+            model_dir (str): Model directory holding the registry
+            check_interval (float): Minimum seconds between change checks
+        
+        Raises:
+            FileNotFoundError: If there is no model
+            ValueError: If the current artifact does not match its checksum
+        """
+        self._load = load
+        self.model_dir = model_dir
+        self.check_interval = check_interval
+        self.model_data = None
+        self.model_path = None
+        self.version = None
+        self.n_reloads = 0
+        self._signature = None
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watcher = None
+        
+        if not self.refresh():
+            raise FileNotFoundError(
+                f"Model file not found in {model_dir}\n"
+                "Please run 'python train.py' first to train the model."
+            )
+    
+    def _current_signature(self):
+        """Cheap identity of what is current: stat() of the pointer, or of the legacy file."""
+        for path in (os.path.join(registry_dir(self.model_dir), POINTER_FILENAME),
+                     os.path.join(self.model_dir, COMPACT_MODEL_FILENAME),
+                     os.path.join(self.model_dir, MODEL_FILENAME)):
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            return (path, stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        return None
+    
+    def refresh(self):
+        """
+        Load the current version if it changed since the last check.
+        
+        Returns:
+            bool: True if a model was (re)loaded
+        
+        Raises:
+            ValueError: If the new artifact does not match its checksum
+        """
+        with self._lock:
+            signature = self._current_signature()
+            if signature is None or signature == self._signature:
+                return False
+            
+            path, pointer = current_model(self.model_dir)
+            if path is None:
+                return False
+            model_data = self._load(path)
+            
+            if self.model_data is not None:
+                self.n_reloads += 1
+            self.model_data = model_data
+            self.model_path = path
+            self.version = pointer['version'] if pointer else None
+            self._signature = signature
+            return True
+    
+    def get(self):
+        """Current model data, checking for a new version at most every check_interval."""
+        if self._watcher is None:
+            now = time.monotonic()
+            if now - self._last_check >= self.check_interval:
+                self._last_check = now
+                self._safe_refresh()
+        return self.model_data
+    
+    def _safe_refresh(self):
+        try:
+            self.refresh()
+        except (OSError, ValueError) as e:
+            # Keep serving the loaded model; the next check retries
+            print(f"WARNING: Model reload failed ({e}); keeping version {self.version}")
+    
+    def start(self):
+        """Check for new versions in a background thread (requests never load)."""
+        if self._watcher is not None:
+            return
+        
+        def watch():
+            while not self._stop.wait(self.check_interval):
+                self._safe_refresh()
+        
+        self._watcher = threading.Thread(target=watch, daemon=True)
+        self._watcher.start()
+    
+    def stop(self):
+        """Stop the background watcher."""
+        self._stop.set()
+
+
+def main(argv=None):
+    """List registry versions or switch the current one."""
+    parser = argparse.ArgumentParser(description="Hemoglobin model registry")
+    parser.add_argument('--model-dir', default='model', help="Model directory (default: model)")
+    parser.add_argument('--activate', metavar='VERSION',
+                        help="Make VERSION current (rollback or promotion)")
+    args = parser.parse_args(argv)
+    
+    if args.activate:
+        try:
+            pointer = activate(args.activate, args.model_dir)
+        except ValueError as e:
+            print(f"ERROR: {e}")
+            sys.exit(1)
+        print(f"Current model version: {pointer['version']}")
+        return
+    
+    versions = list_versions(args.model_dir)
+    if not versions:
+        print(f"No registry versions in {registry_dir(args.model_dir)}; "
+              f"using {active_model_path(args.model_dir) or 'no model'}")
+        return
+    
+    pointer = read_pointer(args.model_dir)
+    current = pointer['version'] if pointer else None
+    print("-" * 60)
+    print(f"  MODEL VERSIONS ({registry_dir(args.model_dir)})")
+    print("-" * 60)
+    for version in versions:
+        metadata = {}
+        path = os.path.join(registry_dir(args.model_dir), version, COMPACT_MODEL_FILENAME)
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                metadata = json.load(f).get('metadata', {})
+        marker = '*' if version == current else ' '
+        created = metadata.get('updated_at') or metadata.get('trained_at') or '-'
+        n_train = metadata.get('n_train')
+        print(f"  {marker} {version}  {created:<28}"
+              f"{f'{n_train:,} samples' if n_train is not None else ''}")
+    print("-" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,316 @@
+"""
+Parallel Batch Scoring
+
+Spreads a batch CSV over a pool of worker processes. The input is cut
+into byte ranges that start and end on line boundaries; every worker
+parses its ranges itself, scores them chunk by chunk with
+predict.score_chunk() and writes the result to a numbered part file.
+The main process only appends the parts to the output in range order, so
+the output has the same rows in the same order as the single-process
+path, whatever order the workers finish in. Each range also returns the
+input drift statistics of its rows, which the main process merges into
+one report (see drift.py).
+
+The model coefficients and, with --uncertainty, the reference feature
+columns and Hb values are copied once into one shared memory block.
+Workers map that block at start-up and wrap NumPy views around it, so
+neither the model nor the reference set is pickled, sent or copied per
+worker. The features are stored column by column, the layout the tiled
+neighbor search (similarity.nearest_neighbors_batch) scans, so no worker
+makes a transposed copy per chunk either.
+
+Parsing, scoring and formatting all happen in the workers, so throughput
+grows with the worker count until the disk becomes the limit.
+
+Byte ranges assume that no quoted field contains a line break, which
+holds for lab exports of numeric CBC values.
+
+Usage:
+    python predict.py --input lab_export.csv --output scored.csv --workers 8
+    
+    summary = score_csv_parallel(model_data, 'lab_export.csv', 'scored.csv', reference=reference)
+"""
+
+import io
+import os
+import math
+import shutil
+import tempfile
+from multiprocessing import shared_memory
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+
+# Constants
+TASKS_PER_WORKER = 4  # ranges per worker, evens out uneven ranges
+MAX_TASK_BYTES = 64 << 20
+MIN_TASK_BYTES = 1 << 20  # smaller inputs use fewer workers (or none)
+PART_PREFIX = '.parts-'
+
+# Worker process state, set once per process by _init_worker()
+_block = None
+_task = None
+_model_data = None
+_reference = None
+
+
+def _share(arrays):
+    """
+    Copy float64 arrays into one new shared memory block.
+    
+    Returns:
+        tuple: (SharedMemory, layout); layout maps each name to its
+            (byte offset, shape) in the block
+    """
+    layout = {}
+    size = 0
+    for name, array in arrays.items():
+        layout[name] = (size, array.shape)
+        size += array.size * np.dtype(np.float64).itemsize
+    
+    block = shared_memory.SharedMemory(create=True, size=max(size, 1))
+    for name, view in _views(block, layout).items():
+        view[...] = arrays[name]
+    return block, layout
+
+
+def _views(block, layout):
+    """NumPy views of the arrays in a shared memory block (no copies)."""
+    return {
+        name: np.ndarray(shape, dtype=np.float64, buffer=block.buf, offset=offset)
+        for name, (offset, shape) in layout.items()
+    }
+
+
+def _linear_terms(model):
+    """Coefficients and intercept of a compact artifact or a scikit-learn estimator."""
+    if hasattr(model, 'coefficients'):
+        return model.coefficients, model.intercept
+    if hasattr(model, 'coef_'):
+        return model.coef_, model.intercept_
+    raise ValueError(f"Parallel scoring needs a linear model, got {type(model).__name__}")
+
+
+def split_ranges(path, n_ranges):
+    """
+    Cut the rows of a CSV file into byte ranges on line boundaries.
+    
+    Args:
+        path (str): CSV file with a header line
+        n_ranges (int): Target number of ranges (fewer for small files)
+    
+    Returns:
+        list: Non-empty (start, end) byte offsets covering every data row
+            once, in file order
+    """
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        f.readline()
+        data_start = f.tell()
+        bounds = [data_start]
+        for i in range(1, n_ranges):
+            target = data_start + (size - data_start) * i // n_ranges
+            if target <= bounds[-1]:
+                continue
+            # Step back one byte, so a target right after a newline stays put
+            f.seek(target - 1)
+            f.readline()
+            if bounds[-1] < f.tell() < size:
+                bounds.append(f.tell())
+        bounds.append(size)
+    return [(start, end) for start, end in zip(bounds, bounds[1:]) if end > start]
+
+
+class _ByteRange(io.RawIOBase):
+    """Read-only file view of bytes start:end of an open binary file."""
+    
+    def __init__(self, f, start, end):
+        f.seek(start)
+        self._f = f
+        self._remaining = end - start
+    
+    def readable(self):
+        return True
+    
+    def readinto(self, buffer):
+        n = min(len(buffer), self._remaining)
+        if n <= 0:
+            return 0
+        n = self._f.readinto(memoryview(buffer)[:n])
+        self._remaining -= n
+        return n
+
+
+def _part_path(parts_dir, index):
+    return os.path.join(parts_dir, f"{index:06d}.csv")
+
+
+def _init_worker(block_name, layout, feature_columns, task):
+    """Map the shared model and reference arrays once per worker process."""
+    global _block, _task, _model_data, _reference
+    from scoring import LinearModel
+    
+    _block = shared_memory.SharedMemory(name=block_name)
+    arrays = _views(_block, layout)
+    _model_data = {
+        'model': LinearModel(arrays['coefficients'], arrays['intercept'][0], feature_columns),
+        'feature_columns': list(feature_columns)
+    }
+    _reference = None
+    if 'reference_columns' in arrays:
+        _reference = (arrays['reference_columns'].T, arrays['reference_hb'])
+    _task = task
+
+
+def _score_range(index, start, end):
+    """
+    Score one byte range of the input into its part file.
+    
+    Returns:
+        tuple: (rows, unscored rows, out-of-range rows, drift statistics
+            from DriftMonitor.state() or None)
+    """
+    import pandas as pd
+    from drift import DriftMonitor
+    from predict import chunk_counts, score_chunk
+    
+    profile = _task['drift_profile']
+    monitor = DriftMonitor(profile, window=None) if profile is not None else None
+    rows = 0
+    unscored = 0
+    out_of_range = 0
+    with open(_task['input_path'], 'rb') as f, \
+            open(_part_path(_task['parts_dir'], index), 'w', newline='', encoding='utf-8') as out:
+        reader = pd.read_csv(io.BufferedReader(_ByteRange(f, start, end)), header=None,
+                             names=_task['columns'], dtype=_task['dtypes'],
+                             chunksize=_task['chunk_size'])
+        for i, chunk in enumerate(reader):
+            scored = score_chunk(_model_data, chunk, _reference, monitor)
+            # The first range carries the header line of the output
+            scored.to_csv(out, header=(index == 0 and i == 0), index=False)
+            chunk_unscored, chunk_out_of_range = chunk_counts(_model_data, scored)
+            rows += len(scored)
+            unscored += chunk_unscored
+            out_of_range += chunk_out_of_range
+    return rows, unscored, out_of_range, monitor.state() if monitor is not None else None
+
+
+def score_csv_parallel(model_data, input_path, output_path, chunk_size, reference=None,
+                       workers=None):
+    """
+    predict.score_file() spread over worker processes.
+    
+    Args:
+        model_data (dict): Loaded model data (a linear model)
+        input_path (str): CSV with feature columns and a Gender column
+        output_path (str): Destination CSV (overwritten)
+        chunk_size (int): Rows per chunk inside a worker
+        reference (tuple): (features, hb) from predict.load_reference(), or
+            None for no uncertainty columns
+        workers (int): Process count (default: all cores); inputs too small
+            to split use fewer, and one worker scores in this process
+    
+    Returns:
+        dict: Same keys as score_file() plus 'workers'
+    
+    Raises:
+        FileNotFoundError: If the input file doesn't exist
+        ValueError: If required columns are missing or the model is not linear
+    """
+    import time
+    import pandas as pd
+    from drift import model_drift_profile
+    from predict import GENDER_COLUMN, score_file
+    
+    if not os.path.exists(input_path):
+        raise FileNotFoundError(f"Input file not found: {input_path}")
+    
+    feature_columns = list(model_data['feature_columns'])
+    numeric_columns = list(feature_columns)
+    if reference is not None:
+        from similarity import SIMILARITY_FEATURES
+        numeric_columns += [col for col in SIMILARITY_FEATURES if col not in numeric_columns]
+    
+    columns = list(pd.read_csv(input_path, nrows=0).columns)
+    missing_cols = [col for col in numeric_columns + [GENDER_COLUMN] if col not in columns]
+    if missing_cols:
+        raise ValueError(f"Missing required columns: {missing_cols}")
+    
+    size = os.path.getsize(input_path)
+    workers = max(1, workers or os.cpu_count() or 1)
+    n_ranges = max(workers * TASKS_PER_WORKER, math.ceil(size / MAX_TASK_BYTES))
+    ranges = split_ranges(input_path, min(n_ranges, math.ceil(size / MIN_TASK_BYTES)))
+    workers = min(workers, len(ranges))
+    if workers <= 1:
+        summary = score_file(model_data, input_path, output_path, chunk_size, reference)
+        summary['workers'] = 1
+        return summary
+    
+    coefficients, intercept = _linear_terms(model_data['model'])
+    arrays = {
+        'coefficients': np.asarray(coefficients, dtype=float),
+        'intercept': np.array([float(intercept)])
+    }
+    if reference is not None:
+        features, hb = reference
+        arrays['reference_columns'] = np.asarray(features, dtype=float).T
+        arrays['reference_hb'] = np.asarray(hb, dtype=float)
+    
+    parts_dir = tempfile.mkdtemp(dir=os.path.dirname(os.path.abspath(output_path)),
+                                 prefix=PART_PREFIX)
+    task = {
+        'input_path': input_path,
+        'parts_dir': parts_dir,
+        'columns': columns,
+        'dtypes': {col: 'float64' for col in numeric_columns},
+        'chunk_size': chunk_size,
+        'drift_profile': model_drift_profile(model_data)
+    }
+    monitor = None
+    if task['drift_profile'] is not None:
+        from drift import DriftMonitor
+        monitor = DriftMonitor(task['drift_profile'], window=None)
+    
+    total_rows = 0
+    unscored = 0
+    out_of_range = 0
+    start = time.perf_counter()
+    block, layout = _share(arrays)
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(block.name, layout, feature_columns, task)) as pool, \
+                open(output_path, 'wb') as out:
+            futures = [pool.submit(_score_range, index, range_start, range_end)
+                       for index, (range_start, range_end) in enumerate(ranges)]
+            
+            # Parts are appended in range order as soon as they are ready
+            for index, future in enumerate(futures):
+                rows, range_unscored, range_out_of_range, drift_state = future.result()
+                part_path = _part_path(parts_dir, index)
+                with open(part_path, 'rb') as part:
+                    shutil.copyfileobj(part, out)
+                os.unlink(part_path)
+                
+                total_rows += rows
+                unscored += range_unscored
+                out_of_range += range_out_of_range
+                if drift_state is not None:
+                    monitor.merge_state(drift_state)
+                elapsed = time.perf_counter() - start
+                print(f"  {total_rows:,} rows scored ({total_rows / elapsed:,.0f} rows/sec)")
+    finally:
+        block.close()
+        block.unlink()
+        shutil.rmtree(parts_dir, ignore_errors=True)
+    
+    elapsed = time.perf_counter() - start
+    return {
+        'rows': total_rows,
+        'unscored': unscored,
+        'out_of_range': out_of_range,
+        'seconds': elapsed,
+        'rows_per_sec': total_rows / elapsed if elapsed > 0 else 0.0,
+        'drift': monitor.report() if monitor is not None else None,
+        'workers': workers
+    }
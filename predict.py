@@ -6,31 +6,88 @@ This script:
 2. Predicts Hemoglobin using the trained regression model
 3. Determines anemia status using clinical rules (not ML)
 
+Batch mode scores a whole CSV export or Excel workbook (.xlsx, streamed
+with openpyxl, see excel_io.py) in fixed-size chunks, so memory use
+stays bounded regardless of the file size. With --uncertainty each chunk
+also gets the similar-sample uncertainty metrics, computed for all of its
+rows at once (see similarity.nearest_neighbors_batch). --workers spreads
+the file over several processes that share the model and reference set
+(see parallel_scoring.py). When the model carries a drift profile, the
+summary ends with an input drift report comparing the file with the
+training data per feature and gender (see drift.py).
+
+One-shot mode scores a single sample given on the command line. It is
+answered by the resident daemon (daemon.py) when one is running, and
+falls back to in-process scoring otherwise. Heavy libraries (joblib,
+NumPy, pandas) are imported only on the paths that need them, so a
+daemon-backed call never loads them. --startup-profile reports the
+import-time cost of any invocation (see startup.py).
+
+--metrics FILE (or PIPELINE_METRICS_FILE) records per-stage latency
+histograms into a snapshot file (see metrics.py).
+
 Usage:
     python predict.py
+    python predict.py --rbc 4.5 --mcv 80 --mch 27 --mchc 33 --gender f
+    python predict.py --input lab_export.csv --output scored.csv
+    python predict.py --input lab_export.csv --output scored.csv --uncertainty
+    python predict.py --input lab_export.csv --output scored.csv --workers 8
+    python predict.py --input lab_export.xlsx --output scored.xlsx --uncertainty
+    python predict.py --metrics metrics/pipeline.json --rbc 4.5 --mcv 80 --mch 27 --mchc 33 --gender f
 """
 
 import os
-import joblib
-from utils import anemia_decision, get_threshold, normalize_gender
+import sys
+import time
+import argparse
+import contextlib
+import metrics
+from utils import (
+    anemia_decision, get_threshold, normalize_gender,
+    encode_gender, threshold_lookup, anemia_status_codes, status_labels,
+    LABEL_ANEMIA
+)
+from validation import RULE_RANGE, validate
 
 
 # Constants (must match train.py)
 MODEL_DIR = 'model'
 MODEL_FILENAME = 'hemoglobin_model.pkl'
+COMPACT_MODEL_FILENAME = 'hemoglobin_model.json'
+
+# Batch scoring
+GENDER_COLUMN = 'Gender'
+BATCH_CHUNK_SIZE = 100_000
 
-# Valid ranges for blood parameters (for input validation)
-VALID_RANGES = {
-    'RBC': (2.0, 7.0),     # million cells/mcL
-    'MCV': (60.0, 120.0),  # fL (femtoliters)
-    'MCH': (15.0, 40.0),   # pg (picograms)
-    'MCHC': (25.0, 40.0)   # g/dL
+# Batch uncertainty: reference dataset and output columns per metric
+DATA_PATH = os.path.join('data', 'anemia_new.csv')
+UNCERTAINTY_COLUMNS = {
+    'mean_hb': 'Similar_Mean_Hb',
+    'std_hb': 'Similar_Std_Hb',
+    'min_hb': 'Similar_Min_Hb',
+    'max_hb': 'Similar_Max_Hb',
+    'mae': 'Similar_MAE',
+    'within_1_pct': 'Within_1_Pct',
+    'within_2_pct': 'Within_2_Pct',
+    'confidence_pct': 'Confidence_Pct'
 }
 
+# One-shot mode command-line fields
+SINGLE_SAMPLE_FIELDS = ['RBC', 'MCV', 'MCH', 'MCHC']
 
-def load_model():
+
+def load_model(model_path=None):
     """
-    Load the saved model using joblib.
+    Load the saved model.
+    
+    By default the current version of the model registry is loaded (see
+    model_registry.py); without a registry, the top-level files saved by
+    earlier versions of train.py are used. Compact JSON artifacts are
+    preferred: they are scored with NumPy and need neither scikit-learn
+    nor unpickling.
+    
+    Args:
+        model_path (str): Load this artifact (.json) or pickle instead
     
     Returns:
         dict: Contains 'model' and 'feature_columns'
@@ -38,40 +95,45 @@ def load_model():
     Raises:
         FileNotFoundError: If model file doesn't exist
     """
-    filepath = os.path.join(MODEL_DIR, MODEL_FILENAME)
+    from model_registry import active_model_path
     
-    if not os.path.exists(filepath):
+    filepath = model_path or active_model_path(MODEL_DIR)
+    if filepath is None or not os.path.exists(filepath):
         raise FileNotFoundError(
-            f"Model file not found: {filepath}\n"
+            f"Model file not found: {filepath or os.path.join(MODEL_DIR, MODEL_FILENAME)}\n"
             "Please run 'python train.py' first to train the model."
         )
     
+    if filepath.endswith('.json'):
+        from scoring import load_artifact
+        model = load_artifact(filepath)
+        return {'model': model, 'feature_columns': model.feature_columns}
+    
+    import joblib
     model_data = joblib.load(filepath)
     return model_data
 
 
-def validate_input(name, value, valid_range):
+def validate_input(features):
     """
-    Validate that an input value is within a reasonable range.
+    Validate blood parameters against VALID_RANGES (see validation.py).
     
     Args:
-        name (str): Parameter name
-        value (float): Input value
-        valid_range (tuple): (min, max) acceptable range
+        features (dict): Parameter name -> value
     
     Returns:
-        bool: True if valid, prints warning if outside range
-    """
-    min_val, max_val = valid_range
+        bool: True if valid, prints a warning per value outside its range
     
-    if value < 0:
-        raise ValueError(f"{name} cannot be negative: {value}")
-    
-    if value < min_val or value > max_val:
-        print(f"  WARNING: {name}={value} is outside typical range ({min_val}-{max_val})")
-        return False
+    Raises:
+        ValueError: If a value is missing, infinite or negative
+    """
+    report = validate(features, list(features))
+    report.raise_for_errors(strict=True)
     
-    return True
+    for violation in report.violations(RULE_RANGE):
+        print(f"  WARNING: {violation['column']}={violation['value']} is outside typical range "
+              f"({violation['min']}-{violation['max']})")
+    return not report.rows().any()
 
 
 def get_user_input():
@@ -95,16 +157,16 @@ def get_user_input():
     # Collect blood parameters one by one
     try:
         rbc = float(input("  RBC (million cells/mcL): "))
-        validate_input('RBC', rbc, VALID_RANGES['RBC'])
+        validate_input({'RBC': rbc})
         
         mcv = float(input("  MCV (fL): "))
-        validate_input('MCV', mcv, VALID_RANGES['MCV'])
+        validate_input({'MCV': mcv})
         
         mch = float(input("  MCH (pg): "))
-        validate_input('MCH', mch, VALID_RANGES['MCH'])
+        validate_input({'MCH': mch})
         
         mchc = float(input("  MCHC (g/dL): "))
-        validate_input('MCHC', mchc, VALID_RANGES['MCHC'])
+        validate_input({'MCHC': mchc})
         
     except ValueError as e:
         raise ValueError(f"Invalid numeric input: {e}")
@@ -154,7 +216,236 @@ def predict_hemoglobin(model_data, features):
     return hemoglobin
 
 
-def display_results(predicted_hb, gender, status):
+def predict_hemoglobin_batch(model_data, X):
+    """
+    Predict Hemoglobin for many samples with a single model call.
+    
+    Args:
+        model_data (dict): Loaded model data
+        X (np.ndarray): Feature matrix, columns in model_data['feature_columns'] order
+    
+    Returns:
+        np.ndarray: Predicted Hemoglobin values (g/dL)
+    """
+    return model_data['model'].predict(X)
+
+
+def score_chunk(model_data, chunk, reference=None, monitor=None):
+    """
+    Score one chunk of a batch input.
+    
+    Adds 'Predicted_Hb', 'Threshold' and 'Status' columns. Rows with missing
+    feature values or an unknown gender are left unscored (empty status).
+    With a reference set, UNCERTAINTY_COLUMNS are added as well (empty
+    for rows without a prediction).
+    
+    Args:
+        model_data (dict): Loaded model data
+        chunk (pd.DataFrame): Rows with feature columns and a Gender column
+        reference (tuple): (features, hb) from load_reference() for the
+            similar-sample analysis
+        monitor (drift.DriftMonitor): Records the chunk's feature values
+    
+    Returns:
+        pd.DataFrame: The chunk with result columns appended
+    """
+    import numpy as np
+    
+    feature_columns = model_data['feature_columns']
+    X = chunk[feature_columns].to_numpy(dtype=float)
+    
+    predicted_hb = np.full(len(chunk), np.nan)
+    # Missing or infinite inputs leave the row unscored
+    complete = np.isfinite(X).all(axis=1)
+    if complete.any():
+        predicted_hb[complete] = predict_hemoglobin_batch(model_data, X[complete])
+    
+    # Clinical rule over the whole chunk; unknown genders or invalid Hb
+    # values get an empty status instead of aborting the export
+    codes = encode_gender(chunk[GENDER_COLUMN])
+    status = anemia_status_codes(predicted_hb, codes)
+    
+    chunk['Predicted_Hb'] = predicted_hb
+    chunk['Threshold'] = threshold_lookup(codes)
+    chunk['Status'] = status_labels(status)
+    
+    if monitor is not None:
+        with metrics.stage('predict.batch_drift'):
+            monitor.update(X, codes)
+    
+    if reference is not None:
+        from similarity import (
+            SIMILARITY_FEATURES, nearest_neighbors_batch, summarize_neighbors_batch
+        )
+        
+        features, hb = reference
+        X_similar = chunk[SIMILARITY_FEATURES].to_numpy(dtype=float)
+        rows = complete & np.isfinite(X_similar).all(axis=1)
+        summary = None
+        if rows.any():
+            with metrics.stage('predict.batch_uncertainty'):
+                _, indices = nearest_neighbors_batch(features, X_similar[rows])
+                summary = summarize_neighbors_batch(hb[indices], predicted_hb[rows], len(hb))
+        for name, column in UNCERTAINTY_COLUMNS.items():
+            values = np.full(len(chunk), np.nan)
+            if summary is not None:
+                values[rows] = summary[name]
+            chunk[column] = values
+    return chunk
+
+
+def load_reference(csv_path=DATA_PATH):
+    """
+    Reference set for the batch similar-sample analysis.
+    
+    Only SIMILARITY_FEATURES and Hb are read, from the memory-mapped
+    dataset cache. The features are stored column by column, the layout
+    the tiled neighbor search scans, so no chunk makes a transposed copy.
+    
+    Returns:
+        tuple: (features, hb); features is an (n, 4) view in
+            SIMILARITY_FEATURES order, hb the (n,) true Hb values
+    
+    Raises:
+        FileNotFoundError: If the dataset doesn't exist
+    """
+    import numpy as np
+    from dataset_cache import load_csv
+    from similarity import SIMILARITY_FEATURES
+    
+    df = load_csv(csv_path, columns=SIMILARITY_FEATURES + ['Hb'])
+    columns = np.stack([df[col].to_numpy(dtype=float) for col in SIMILARITY_FEATURES])
+    return columns.T, df['Hb'].to_numpy(dtype=float)
+
+
+def chunk_counts(model_data, scored):
+    """
+    Row counts of a scored chunk.
+    
+    Returns:
+        tuple: (unscored rows, rows with a feature value that is negative
+            or outside VALID_RANGES; those are still scored)
+    """
+    report = validate(scored, model_data['feature_columns'])
+    return int(scored['Status'].isna().sum()), int(report.rows().sum())
+
+
+@contextlib.contextmanager
+def open_output(output_path):
+    """
+    Chunk writer for a batch result file.
+    
+    Yields write(df, header), which appends a scored chunk to a CSV file
+    or, for an .xlsx path, to a streamed workbook saved on success.
+    """
+    from excel_io import WorkbookWriter, is_workbook
+    
+    if is_workbook(output_path):
+        with WorkbookWriter(output_path) as writer:
+            yield writer.append
+    else:
+        with open(output_path, 'w', newline='', encoding='utf-8') as out:
+            yield lambda df, header: df.to_csv(out, header=header, index=False)
+
+
+def score_file(model_data, input_path, output_path, chunk_size=BATCH_CHUNK_SIZE, reference=None,
+               sheet=None):
+    """
+    Score a CSV file or Excel workbook chunk by chunk and stream the
+    results to a CSV file or workbook.
+    
+    Only one chunk is held in memory at a time, so files larger than RAM
+    can be processed. Workbook columns are mapped to the pipeline's
+    column names (see excel_io.map_columns()).
+    
+    Args:
+        model_data (dict): Loaded model data
+        input_path (str): CSV or .xlsx with feature columns and a Gender column
+        output_path (str): Destination CSV or .xlsx (overwritten)
+        chunk_size (int): Rows per chunk
+        reference (tuple): Add similar-sample uncertainty columns computed
+            against this reference set (see load_reference())
+        sheet (str): Worksheet of a workbook input (default: the first)
+    
+    Returns:
+        dict: Row counts and timing ('rows', 'unscored', 'out_of_range',
+            'seconds', 'rows_per_sec') and the input drift report ('drift',
+            None if the model has no drift profile)
+    
+    Raises:
+        FileNotFoundError: If the input file doesn't exist
+        ValueError: If required columns are missing
+    """
+    if not os.path.exists(input_path):
+        raise FileNotFoundError(f"Input file not found: {input_path}")
+    
+    import pandas as pd
+    from drift import monitor_for_model
+    from excel_io import is_workbook, read_workbook_chunks
+    
+    numeric_columns = list(model_data['feature_columns'])
+    if reference is not None:
+        from similarity import SIMILARITY_FEATURES
+        numeric_columns += [col for col in SIMILARITY_FEATURES if col not in numeric_columns]
+    required_columns = numeric_columns + [GENDER_COLUMN]
+    dtypes = {col: 'float64' for col in numeric_columns}
+    
+    total_rows = 0
+    unscored = 0
+    out_of_range = 0
+    # One window for the whole file
+    monitor = monitor_for_model(model_data, window=None)
+    start = time.perf_counter()
+    
+    if is_workbook(input_path):
+        reader = read_workbook_chunks(input_path, chunk_size, numeric_columns, sheet)
+    else:
+        reader = pd.read_csv(input_path, chunksize=chunk_size, dtype=dtypes)
+    
+    with open_output(output_path) as write:
+        for i, chunk in enumerate(reader):
+            if i == 0:
+                missing_cols = [col for col in required_columns if col not in chunk.columns]
+                if missing_cols:
+                    raise ValueError(f"Missing required columns: {missing_cols}")
+            
+            with metrics.stage('predict.batch_score'):
+                scored = score_chunk(model_data, chunk, reference, monitor)
+            with metrics.stage('predict.batch_write'):
+                write(scored, i == 0)
+            
+            with metrics.stage('predict.batch_validation'):
+                chunk_unscored, chunk_out_of_range = chunk_counts(model_data, scored)
+            total_rows += len(scored)
+            unscored += chunk_unscored
+            out_of_range += chunk_out_of_range
+            
+            elapsed = time.perf_counter() - start
+            print(f"  {total_rows:,} rows scored ({total_rows / elapsed:,.0f} rows/sec)")
+    
+    elapsed = time.perf_counter() - start
+    return {
+        'rows': total_rows,
+        'unscored': unscored,
+        'out_of_range': out_of_range,
+        'seconds': elapsed,
+        'rows_per_sec': total_rows / elapsed if elapsed > 0 else 0.0,
+        'drift': monitor.report() if monitor is not None else None
+    }
+
+
+def calibrated_result(model_data, predicted_hb, gender):
+    """Calibrated interval and misclassification probability, or None if the model has no calibration."""
+    from calibration import calibrated_uncertainty, model_calibration
+    
+    calibration = model_calibration(model_data)
+    if calibration is None:
+        return None
+    gender = normalize_gender(gender)
+    return calibrated_uncertainty(calibration, predicted_hb, gender, get_threshold(gender))
+
+
+def display_results(predicted_hb, gender, status, calibrated=None):
     """Display prediction results in a formatted way."""
     threshold = get_threshold(gender)
     
@@ -163,38 +454,204 @@ def display_results(predicted_hb, gender, status):
     print("  RESULTS")
     print("-" * 60)
     print(f"  Predicted Hemoglobin: {predicted_hb:.2f} g/dL")
+    if calibrated:
+        from calibration import format_interval
+        interval = format_interval(calibrated['lower'], calibrated['upper'],
+                                   unbounded='unbounded (too few calibration samples)')
+        print(f"  {calibrated['coverage']:.0%} Interval: {interval} g/dL")
     print(f"  Gender: {gender}")
     print(f"  Threshold: {threshold:.1f} g/dL")
     print()
     
-    if status == "Anemia":
+    if status == LABEL_ANEMIA:
         print(f"  Anemia Status: ** {status} **")
         print(f"  (Hemoglobin is below {threshold:.1f} g/dL for {gender})")
     else:
         print(f"  Anemia Status: {status}")
+    if calibrated:
+        print(f"  Misclassification probability: {calibrated['misclassification_probability']:.0%}")
     
     print("-" * 60)
     print()
 
 
-def main():
+def run_single(features, gender, use_daemon=True, socket_path=None):
+    """
+    One-shot pipeline: score one sample given on the command line.
+    
+    The resident daemon answers when it is running; otherwise the model is
+    loaded and the sample is scored in this process.
+    """
+    if use_daemon:
+        from daemon import request_prediction, DEFAULT_SOCKET_PATH
+        with metrics.stage('predict.daemon_request'):
+            response = request_prediction(features, gender, socket_path or DEFAULT_SOCKET_PATH)
+        if response is not None:
+            for warning in response['warnings']:
+                print(f"  WARNING: {warning}")
+            display_results(response['predicted_hb'], response['gender'], response['status'],
+                            response.get('calibrated'))
+            return
+    
+    # No daemon: in-process scoring
+    with metrics.stage('predict.input_validation'):
+        validate_input(features)
+        gender = normalize_gender(gender)
+    
+    with metrics.stage('predict.model_load'):
+        model_data = load_model()
+    with metrics.stage('predict.prediction'):
+        predicted_hb = predict_hemoglobin(model_data, features)
+    with metrics.stage('predict.decision'):
+        status = anemia_decision(predicted_hb, gender)
+        calibrated = calibrated_result(model_data, predicted_hb, gender)
+    with metrics.stage('predict.render'):
+        display_results(predicted_hb, gender, status, calibrated)
+
+
+def run_batch(input_path, output_path, chunk_size, uncertainty=False, workers=1, sheet=None):
+    """Batch pipeline: score a CSV file or workbook and print a throughput summary."""
+    if not os.path.exists(input_path):
+        raise FileNotFoundError(f"Input file not found: {input_path}")
+    
+    with metrics.stage('predict.model_load'):
+        model_data = load_model()
+    print("Model loaded successfully.")
+    
+    reference = None
+    if uncertainty:
+        with metrics.stage('predict.reference_load'):
+            reference = load_reference()
+        print(f"Reference dataset loaded: {len(reference[1])} rows")
+    
+    print(f"Scoring {input_path} in chunks of {chunk_size:,} rows...")
+    
+    from excel_io import is_workbook
+    
+    if workers != 1 and (is_workbook(input_path) or is_workbook(output_path)):
+        # Byte ranges and part files only work for CSV
+        print("Excel workbooks are scored in a single process (--workers ignored).")
+        workers = 1
+    
+    if workers == 1:
+        summary = score_file(model_data, input_path, output_path, chunk_size, reference, sheet)
+    else:
+        from parallel_scoring import score_csv_parallel
+        summary = score_csv_parallel(model_data, input_path, output_path, chunk_size,
+                                     reference, workers)
+    
+    print()
+    print("-" * 60)
+    print("  BATCH RESULTS")
+    print("-" * 60)
+    print(f"  Rows:         {summary['rows']:,}")
+    print(f"  Unscored:     {summary['unscored']:,} (missing values or invalid gender)")
+    print(f"  Out of range: {summary['out_of_range']:,} (negative or atypical values, still scored)")
+    print(f"  Elapsed:      {summary['seconds']:.2f} s")
+    print(f"  Throughput:   {summary['rows_per_sec']:,.0f} rows/sec")
+    if 'workers' in summary:
+        print(f"  Workers:      {summary['workers']}")
+    print(f"  Output:       {output_path}")
+    print("-" * 60)
+    if summary['drift'] is not None:
+        from drift import print_report
+        print_report(summary['drift'])
+    print()
+
+
+def parse_args(argv=None):
+    """Parse command-line arguments."""
+    parser = argparse.ArgumentParser(
+        description="Hemoglobin prediction and anemia diagnosis"
+    )
+    parser.add_argument('--input', help="CSV file or Excel workbook (.xlsx) to score in batch mode")
+    parser.add_argument('--output', help="Destination CSV or .xlsx for batch results")
+    parser.add_argument('--sheet', help="Worksheet of an Excel input (default: the first sheet)")
+    parser.add_argument('--chunk-size', type=int, default=BATCH_CHUNK_SIZE,
+                        help=f"Rows per chunk in batch mode (default: {BATCH_CHUNK_SIZE})")
+    parser.add_argument('--uncertainty', action='store_true',
+                        help="Add similar-sample uncertainty columns in batch mode")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Worker processes in batch mode (0: all cores, default: 1)")
+    
+    single = parser.add_argument_group("one-shot mode")
+    for name in SINGLE_SAMPLE_FIELDS:
+        single.add_argument(f'--{name.lower()}', type=float, dest=name, help=f"{name} value")
+    single.add_argument('--gender', help="m/f or male/female")
+    single.add_argument('--socket', help="Daemon socket path")
+    single.add_argument('--no-daemon', action='store_true',
+                        help="Always score in-process, even if a daemon is running")
+    parser.add_argument('--startup-profile', action='store_true',
+                        help="Report import-time cost of this invocation and exit")
+    parser.add_argument('--metrics', metavar='FILE',
+                        help="Record per-stage latency into this snapshot file")
+    args = parser.parse_args(argv)
+    
+    if (args.input is None) != (args.output is None):
+        parser.error("--input and --output must be used together")
+    if args.chunk_size <= 0:
+        parser.error("--chunk-size must be positive")
+    if args.uncertainty and args.input is None:
+        parser.error("--uncertainty requires --input and --output")
+    if args.workers < 0:
+        parser.error("--workers cannot be negative")
+    if args.sheet and args.input is None:
+        parser.error("--sheet requires --input and --output")
+    
+    given = [getattr(args, name) is not None for name in SINGLE_SAMPLE_FIELDS]
+    given.append(args.gender is not None)
+    args.single = any(given)
+    if args.single and not all(given):
+        parser.error("one-shot mode needs --rbc, --mcv, --mch, --mchc and --gender")
+    if args.single and args.input:
+        parser.error("one-shot mode cannot be combined with --input")
+    
+    return args
+
+
+def main(argv=None):
     """Main prediction pipeline."""
+    args = parse_args(argv)
+    
+    if args.startup_profile:
+        from startup import run_startup_profile, strip_flag
+        run_startup_profile(__file__, strip_flag(sys.argv[1:] if argv is None else argv))
+        return
+    
+    if args.metrics:
+        metrics.configure(args.metrics)
+    
     try:
+        if args.input:
+            run_batch(args.input, args.output, args.chunk_size, args.uncertainty,
+                      args.workers or None, args.sheet)
+            return
+        
+        if args.single:
+            features = {name: getattr(args, name) for name in SINGLE_SAMPLE_FIELDS}
+            run_single(features, args.gender, not args.no_daemon, args.socket)
+            return
+        
         # 1. Load trained model
-        model_data = load_model()
+        with metrics.stage('predict.model_load'):
+            model_data = load_model()
         print("Model loaded successfully.")
         
         # 2. Get user input (blood parameters + gender)
         features, gender = get_user_input()
         
         # 3. Predict Hemoglobin using Linear Regression
-        predicted_hb = predict_hemoglobin(model_data, features)
+        with metrics.stage('predict.prediction'):
+            predicted_hb = predict_hemoglobin(model_data, features)
         
         # 4. Determine anemia status using clinical rules (NOT ML)
-        status = anemia_decision(predicted_hb, gender)
+        with metrics.stage('predict.decision'):
+            status = anemia_decision(predicted_hb, gender)
+            calibrated = calibrated_result(model_data, predicted_hb, gender)
         
         # 5. Display results
-        display_results(predicted_hb, gender, status)
+        with metrics.stage('predict.render'):
+            display_results(predicted_hb, gender, status, calibrated)
         
     except FileNotFoundError as e:
         print()
@@ -208,6 +665,8 @@ def main():
         print()
         print("Operation cancelled by user.")
         print()
+    finally:
+        metrics.flush()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,456 @@
+"""
+Compact Reference Store for Similarity Analysis
+
+The uncertainty estimate only needs SIMILARITY_FEATURES and the true Hb
+of every reference row, so instead of keeping the whole dataset (and a
+float64 KD-tree copy of it) resident, the store holds:
+    
+    features  (n, 4) C-contiguous matrix in one of the encodings below
+    hb        (n,)   float32 vector
+
+Encodings (bytes per row including Hb, vs ~112 for a float64 DataFrame
+plus KD-tree):
+    float32   20   exact to ~1e-7 relative
+    float16   12   centered per column; error <= 0.016 on MCV-sized values
+    int8       8   per-column scale/offset; error <= (max - min) / 508
+
+Rows are stored in the leaf order of an implicit k-d tree: every node
+splits its row range at the middle along its widest feature, down to
+leaves of at most LEAF_ROWS rows. Node ranges follow from the row count
+alone, so the index is just one split feature and split value per inner
+node (~n / LEAF_ROWS entries). An exact K-nearest search visits leaves
+nearest first and stops once the next leaf's lower bound exceeds the
+current K-th distance, so the rows scanned grow with K and the depth,
+not with the reference set size. Only one leaf is decoded to float32 at
+a time and only the K best rows are kept.
+
+Tolerance against the float64 DataFrame/KD-tree path (README has the
+measured table): with float32 the neighbour sets only differ between
+equidistant rows and Hb rounding stays below 1e-5 g/dL; float16 and int8
+move the neighbours' mean Hb by up to ~0.2 and ~0.3 g/dL (p99 0.08 and
+0.17) on the reference data.
+
+from_csv() keeps the encoded store next to the dataset cache
+(dataset_cache.py), in the data directory of the CSV's current content:
+    
+    data/.cache/anemia_new/<checksum>/reference-v<version>-<encoding>/
+        features.npy, hb.npy   the arrays above (NumPy format)
+        split_dim.npy,         the k-d tree splits
+        split_value.npy
+        store.json             encoding, columns, scale/offset, max_error
+
+and memory-maps it read-only on later loads. Every process that opens
+the store maps the same file pages, so the OS page cache holds a single
+copy however many server processes or sessions search it, and loading
+it costs no parsing, sorting or encoding. A published store is never
+replaced or deleted, since other processes may be mapping it: the first
+process to publish wins and the others use its store. Stores built in
+memory are made read-only as well: a store is shared by all sessions
+(app.py) and threads, and none of them can change it. A search only
+allocates one decoded leaf, the K results and its queue of tree nodes.
+
+Usage:
+    store = ReferenceStore.from_csv('data/anemia_new.csv')
+    hb = store.nearest_hb(features, k=K_NEIGHBORS)
+    uncertainty = summarize_neighbors(hb, predicted_hb, len(store))
+"""
+
+import os
+import json
+import heapq
+import errno
+import shutil
+import tempfile
+
+import numpy as np
+
+from similarity import K_NEIGHBORS, SIMILARITY_FEATURES
+
+
+# Constants
+ENCODINGS = ('float32', 'float16', 'int8')
+DEFAULT_ENCODING = 'float32'
+TARGET_COLUMN = 'Hb'
+LEAF_ROWS = 1_024  # largest k-d tree leaf
+INT8_LEVELS = 127  # codes use -127..127
+STORE_FORMAT = 'reference-store'
+STORE_VERSION = 2  # 1: rows sorted by one column, no tree
+STORE_PREFIX = 'reference-'
+
+
+class ReferenceStore:
+    """
+    Reference rows reduced to an encoded feature matrix and an Hb vector.
+    
+    Decoded feature value = stored value * scale + offset (per column);
+    max_error holds the largest decoding error seen per column at build
+    time (zeros for float32). Rows are kept in k-d tree leaf order;
+    inner node i (children 2i + 1 and 2i + 2) splits its rows at the
+    middle, on feature split_dim[i] at decoded value split_value[i].
+    All arrays are read-only.
+    """
+    
+    def __init__(self, features, hb, scale, offset, encoding,
+                 feature_columns=SIMILARITY_FEATURES, split_dim=None, split_value=None,
+                 max_error=None, target_column=TARGET_COLUMN):
+        self.features = _read_only(features)
+        self.hb = _read_only(hb)
+        self.scale = _read_only(scale)
+        self.offset = _read_only(offset)
+        self.encoding = encoding
+        self.feature_columns = list(feature_columns)
+        self.split_dim = _read_only(np.zeros(0, dtype=np.int8) if split_dim is None else split_dim)
+        self.split_value = _read_only(np.zeros(0, dtype=np.float32) if split_value is None
+                                      else split_value)
+        if len(self.split_dim) != _tree_nodes(len(self.hb)):
+            raise ValueError(f"Tree of {len(self.split_dim)} nodes does not match "
+                             f"{len(self.hb)} rows")
+        self.max_error = _read_only(np.zeros_like(scale) if max_error is None else max_error)
+        self.target_column = target_column
+    
+    def __len__(self):
+        return len(self.hb)
+    
+    @property
+    def nbytes(self):
+        """Resident size of the arrays in bytes."""
+        return (self.features.nbytes + self.hb.nbytes + self.scale.nbytes + self.offset.nbytes
+                + self.split_dim.nbytes + self.split_value.nbytes)
+    
+    @classmethod
+    def from_frame(cls, df, encoding=DEFAULT_ENCODING, feature_columns=SIMILARITY_FEATURES,
+                   target_column=TARGET_COLUMN):
+        """
+        Build a store from a DataFrame.
+        
+        Columns are converted one at a time, so no full-width float64 copy
+        of the dataset is ever made. Row order is not kept (rows are put
+        in tree order). Rows with a missing or infinite feature or Hb are
+        left out (they cannot be ranked by distance).
+        
+        Args:
+            df: Reference dataset
+            encoding (str): One of ENCODINGS
+            feature_columns (list): Columns to measure similarity on
+            target_column (str): True Hb column
+        
+        Returns:
+            ReferenceStore
+        
+        Raises:
+            ValueError: If the encoding is unknown
+        """
+        if encoding not in ENCODINGS:
+            raise ValueError(f"Unknown encoding: {encoding} (expected one of {', '.join(ENCODINGS)})")
+        
+        columns = [df[col].to_numpy(dtype=np.float32) for col in feature_columns]
+        hb = df[target_column].to_numpy(dtype=np.float32)
+        
+        complete = np.isfinite(hb)
+        for values in columns:
+            complete &= np.isfinite(values)
+        if not complete.all():
+            columns = [values[complete] for values in columns]
+            hb = hb[complete]
+        
+        columns, hb, split_dim = _build_tree(columns, hb)
+        
+        n_features = len(columns)
+        scale = np.ones(n_features, dtype=np.float32)
+        offset = np.zeros(n_features, dtype=np.float32)
+        max_error = np.zeros(n_features, dtype=np.float32)
+        features = np.empty((len(hb), n_features), dtype=encoding)
+        
+        for j, values in enumerate(columns):
+            if encoding == 'float32' or len(values) == 0:
+                features[:, j] = values
+                continue
+            
+            low, high = float(values.min()), float(values.max())
+            offset[j] = (low + high) / 2.0
+            if encoding == 'float16':
+                # Centering halves the magnitude and so the rounding step
+                features[:, j] = values - offset[j]
+            else:
+                scale[j] = max(high - low, np.finfo(np.float32).tiny) / (2 * INT8_LEVELS)
+                codes = np.rint((values - offset[j]) / scale[j])
+                features[:, j] = np.clip(codes, -INT8_LEVELS, INT8_LEVELS)
+            decoded = features[:, j].astype(np.float32) * scale[j] + offset[j]
+            max_error[j] = np.abs(decoded - values).max()
+        
+        # Split values are taken after encoding: rounding is monotonic, so
+        # the decoded left rows stay at or below the decoded right minimum
+        split_value = np.empty(len(split_dim), dtype=np.float32)
+        for node, (_, mid, stop) in enumerate(_node_ranges(len(hb))):
+            j = split_dim[node]
+            split_value[node] = features[mid:stop, j].min().astype(np.float32) * scale[j] + offset[j]
+        
+        return cls(features, hb, scale, offset, encoding, feature_columns,
+                   split_dim, split_value, max_error, target_column)
+    
+    @classmethod
+    def from_csv(cls, csv_path, encoding=DEFAULT_ENCODING, feature_columns=SIMILARITY_FEATURES,
+                 target_column=TARGET_COLUMN):
+        """
+        Memory-map the stored reference store of a CSV dataset, building
+        it first if the CSV content has none for this encoding.
+        
+        The store is built from only the needed columns of the
+        memory-mapped dataset cache, so the other columns are never
+        loaded. If another process publishes the store first, that store
+        is used. If the cache cannot be written or read (e.g. a read-only
+        checkout), or the published store has other columns, the store is
+        built in memory instead.
+        
+        Raises:
+            FileNotFoundError: If the CSV doesn't exist
+            ValueError: If the encoding is unknown
+        """
+        from dataset_cache import cache_dir_for, ensure_cache, load_csv
+        
+        if encoding not in ENCODINGS:
+            raise ValueError(f"Unknown encoding: {encoding} (expected one of {', '.join(ENCODINGS)})")
+        
+        columns = list(feature_columns) + [target_column]
+        try:
+            manifest = ensure_cache(csv_path)
+            data_dir = os.path.join(cache_dir_for(csv_path), manifest['data_dir'])
+            directory = os.path.join(data_dir, f"{STORE_PREFIX}v{STORE_VERSION}-{encoding}")
+            def matches(candidate):
+                return candidate is not None \
+                    and candidate.feature_columns == list(feature_columns) \
+                    and candidate.target_column == target_column
+            
+            published = cls.open(directory)
+            if matches(published):
+                return published
+            
+            store = cls.from_frame(load_csv(csv_path, columns=columns), encoding,
+                                   feature_columns, target_column)
+            # Does nothing if another process has published in the meantime
+            store.save(directory)
+            # Fall back to the store just built if the published one is
+            # unreadable or has other columns
+            published = cls.open(directory)
+            return published if matches(published) else store
+        except FileNotFoundError:
+            raise
+        except OSError as e:
+            print(f"WARNING: Reference store cache unavailable ({e}); building it in memory")
+            return cls.from_frame(load_csv(csv_path, columns=columns), encoding,
+                                  feature_columns, target_column)
+    
+    def save(self, directory):
+        """
+        Write the store as NumPy files that open() memory-maps.
+        
+        The files are written to a temporary directory next to `directory`
+        and renamed into place in one step, so other processes see either
+        no store or a complete one. An existing store is never replaced:
+        processes may be mapping it.
+        
+        Returns:
+            bool: False if `directory` already existed (this build is
+                discarded)
+        """
+        parent = os.path.dirname(os.path.abspath(directory))
+        os.makedirs(parent, exist_ok=True)
+        building_dir = tempfile.mkdtemp(dir=parent, prefix='building-')
+        try:
+            np.save(os.path.join(building_dir, 'features.npy'), self.features)
+            np.save(os.path.join(building_dir, 'hb.npy'), self.hb)
+            np.save(os.path.join(building_dir, 'split_dim.npy'), self.split_dim)
+            np.save(os.path.join(building_dir, 'split_value.npy'), self.split_value)
+            meta = {
+                'format': STORE_FORMAT,
+                'version': STORE_VERSION,
+                'encoding': self.encoding,
+                'feature_columns': self.feature_columns,
+                'target_column': self.target_column,
+                'scale': self.scale.tolist(),
+                'offset': self.offset.tolist(),
+                'max_error': self.max_error.tolist()
+            }
+            with open(os.path.join(building_dir, 'store.json'), 'w', encoding='utf-8') as f:
+                json.dump(meta, f, indent=2)
+            
+            os.rename(building_dir, directory)
+        except OSError as e:
+            shutil.rmtree(building_dir, ignore_errors=True)
+            # Renaming onto an existing non-empty directory fails
+            if e.errno in (errno.EEXIST, errno.ENOTEMPTY) and os.path.isdir(directory):
+                return False
+            raise
+        except BaseException:
+            shutil.rmtree(building_dir, ignore_errors=True)
+            raise
+        return True
+    
+    @classmethod
+    def open(cls, directory):
+        """
+        Memory-map a store written by save().
+        
+        Returns:
+            ReferenceStore: Backed by read-only file mappings, or None if
+                the directory holds no readable store of this version
+        """
+        meta_path = os.path.join(directory, 'store.json')
+        try:
+            with open(meta_path, encoding='utf-8') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if meta.get('format') != STORE_FORMAT or meta.get('version') != STORE_VERSION:
+            return None
+        
+        try:
+            features = np.load(os.path.join(directory, 'features.npy'), mmap_mode='r')
+            hb = np.load(os.path.join(directory, 'hb.npy'), mmap_mode='r')
+            split_dim = np.load(os.path.join(directory, 'split_dim.npy'))
+            split_value = np.load(os.path.join(directory, 'split_value.npy'))
+            return cls(
+                features, hb,
+                np.array(meta['scale'], dtype=np.float32),
+                np.array(meta['offset'], dtype=np.float32),
+                meta['encoding'], meta['feature_columns'], split_dim, split_value,
+                np.array(meta['max_error'], dtype=np.float32), meta['target_column']
+            )
+        except (OSError, ValueError):
+            return None
+    
+    def decode(self, start=0, stop=None):
+        """Decoded float32 features of rows start:stop."""
+        block = self.features[start:stop].astype(np.float32)
+        if self.encoding != 'float32':
+            block *= self.scale
+            block += self.offset
+        return block
+    
+    def query(self, input_vector, k=K_NEIGHBORS):
+        """
+        K nearest rows by Euclidean distance (exact).
+        
+        Tree nodes are visited in order of their lower-bound distance to
+        the input (the distance to the splits on the way from the root),
+        and each leaf reached is scanned. The search stops when the next
+        node's bound exceeds the current K-th distance: no row in it can
+        be closer.
+        
+        Args:
+            input_vector: Feature values in feature_columns order
+            k (int): Number of neighbours (capped at the store size)
+        
+        Returns:
+            tuple: (distances, store row indices), sorted by distance
+        """
+        point = np.asarray(input_vector, dtype=np.float32).reshape(-1)
+        n = len(self)
+        k = min(k, n)
+        if k <= 0:
+            return np.empty(0), np.empty(0, dtype=np.intp)
+        
+        inner = len(self.split_dim)
+        d2 = np.empty(0, dtype=np.float32)
+        indices = np.empty(0, dtype=np.intp)
+        limit = np.inf
+        # (lower bound, node, start, stop, per-feature squared gaps)
+        queue = [(0.0, 0, 0, n, (0.0,) * len(point))]
+        while queue:
+            bound, node, start, stop, gaps = heapq.heappop(queue)
+            if bound > limit:
+                break
+            if node >= inner:
+                diff = self.decode(start, stop)
+                diff -= point
+                d2 = np.concatenate([d2, np.einsum('ij,ij->i', diff, diff)])
+                indices = np.concatenate([indices, np.arange(start, stop)])
+                if len(d2) >= k:
+                    # Ties are broken by row order, so results are deterministic
+                    keep = np.lexsort((indices, d2))[:k]
+                    d2, indices = d2[keep], indices[keep]
+                    # Slightly widened so float32 rounding cannot drop a boundary row
+                    limit = (float(np.sqrt(d2[-1])) * (1 + 1e-5) + 1e-6) ** 2
+                continue
+            
+            j = int(self.split_dim[node])
+            mid = (start + stop) // 2
+            offset = float(point[j]) - float(self.split_value[node])
+            near, far = (2 * node + 1, 2 * node + 2) if offset < 0 else (2 * node + 2, 2 * node + 1)
+            near_range, far_range = ((start, mid), (mid, stop)) if offset < 0 else ((mid, stop), (start, mid))
+            heapq.heappush(queue, (bound, near, *near_range, gaps))
+            # Rows beyond the split are at least |offset| away along feature j
+            far_gaps = gaps[:j] + (offset * offset,) + gaps[j + 1:]
+            heapq.heappush(queue, (bound - gaps[j] + offset * offset, far, *far_range, far_gaps))
+        
+        return np.sqrt(d2.astype(float)), indices
+    
+    def nearest_hb(self, input_features, k=K_NEIGHBORS):
+        """
+        True Hb values of the K rows most similar to an input.
+        
+        Args:
+            input_features (dict): Feature name -> value
+            k (int): Number of neighbours
+        
+        Returns:
+            np.ndarray: float64 Hb values, nearest first
+        """
+        _, indices = self.query([input_features[col] for col in self.feature_columns], k)
+        return self.hb[indices].astype(float)
+
+
+def _tree_nodes(n_rows):
+    """Inner node count of the tree over n_rows (leaves <= LEAF_ROWS rows)."""
+    leaves = 1
+    while -(-n_rows // leaves) > LEAF_ROWS:
+        leaves *= 2
+    return leaves - 1
+
+
+def _node_ranges(n_rows):
+    """(start, mid, stop) of each inner node, in node order."""
+    ranges = []
+    level = [(0, n_rows)]
+    for _ in range(_tree_nodes(n_rows).bit_length()):
+        children = []
+        for start, stop in level:
+            mid = (start + stop) // 2
+            ranges.append((start, mid, stop))
+            children += [(start, mid), (mid, stop)]
+        level = children
+    return ranges
+
+
+def _build_tree(columns, hb):
+    """
+    Reorder rows into k-d tree leaf order.
+    
+    Each inner node's rows are partitioned at the middle along the column
+    with the widest spread in the node; distances are in raw units, so
+    that column separates the most rows.
+    
+    Returns:
+        tuple: (reordered columns, reordered hb, int8 split column per node)
+    """
+    # Copies: the inputs may be read-only views of the dataset cache
+    columns = [np.array(values) for values in columns]
+    hb = np.array(hb)
+    ranges = _node_ranges(len(hb))
+    split_dim = np.zeros(len(ranges), dtype=np.int8)
+    for node, (start, mid, stop) in enumerate(ranges):
+        spreads = [float(values[start:stop].max() - values[start:stop].min()) for values in columns]
+        j = int(np.argmax(spreads))
+        split_dim[node] = j
+        order = np.argpartition(columns[j][start:stop], mid - start)
+        for values in columns:
+            values[start:stop] = values[start:stop][order]
+        hb[start:stop] = hb[start:stop][order]
+    return columns, hb, split_dim
+
+
+def _read_only(array):
+    """The array itself (no copy), flagged non-writable."""
+    array = np.asarray(array)
+    array.flags.writeable = False
+    return array
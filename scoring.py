@@ -0,0 +1,119 @@
+"""
+Compact Linear Model Artifact and NumPy Scoring Engine
+
+train.py exports the fitted regression as a small, versioned JSON file
+(coefficients, intercept, feature order and training statistics). This
+module loads it and scores with a plain NumPy dot product, so consumers
+do not need scikit-learn or pickle.
+
+The loaded LinearModel has the same predict(X) interface as the
+scikit-learn estimator, so it can be used wherever model_data['model']
+is expected.
+
+Usage:
+    model = load_artifact('model/hemoglobin_model.json')
+    hemoglobin = model.predict([[4.5, 80.0, 27.0, 33.0]])
+"""
+
+import os
+import json
+import tempfile
+
+import numpy as np
+
+
+# Artifact format identifiers
+ARTIFACT_FORMAT = 'hemoglobin-linear-regression'
+ARTIFACT_VERSION = 1
+
+
+class LinearModel:
+    """Linear regression scored with NumPy: y = X @ coefficients + intercept."""
+    
+    def __init__(self, coefficients, intercept, feature_columns, metadata=None):
+        if len(coefficients) != len(feature_columns):
+            raise ValueError(
+                f"Artifact has {len(coefficients)} coefficients "
+                f"for {len(feature_columns)} features"
+            )
+        
+        self.coefficients = np.asarray(coefficients, dtype=float)
+        self.intercept = float(intercept)
+        self.feature_columns = list(feature_columns)
+        self.metadata = metadata or {}
+    
+    def predict(self, X):
+        """
+        Predict Hemoglobin for a feature matrix.
+        
+        Args:
+            X: (n_samples, n_features) array-like in feature_columns order
+        
+        Returns:
+            np.ndarray: Predicted values (g/dL)
+        """
+        X = np.asarray(X, dtype=float)
+        return X @ self.coefficients + self.intercept
+    
+    def to_dict(self):
+        """Serializable artifact contents."""
+        return {
+            'format': ARTIFACT_FORMAT,
+            'version': ARTIFACT_VERSION,
+            'feature_columns': self.feature_columns,
+            'coefficients': [float(c) for c in self.coefficients],
+            'intercept': self.intercept,
+            'metadata': self.metadata
+        }
+    
+    @classmethod
+    def from_estimator(cls, estimator, feature_columns, metadata=None):
+        """Build from a fitted scikit-learn linear estimator."""
+        return cls(estimator.coef_, estimator.intercept_, feature_columns, metadata)
+
+
+def save_artifact(model, filepath):
+    """
+    Write the artifact atomically (temp file + rename).
+    
+    Readers never see a partially written file.
+    """
+    directory = os.path.dirname(filepath) or '.'
+    os.makedirs(directory, exist_ok=True)
+    
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(model.to_dict(), f, indent=2)
+        os.replace(tmp_path, filepath)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def load_artifact(filepath):
+    """
+    Load a compact model artifact.
+    
+    Raises:
+        FileNotFoundError: If the file doesn't exist
+        ValueError: If the file is not a supported artifact
+    """
+    with open(filepath, encoding='utf-8') as f:
+        data = json.load(f)
+    
+    if data.get('format') != ARTIFACT_FORMAT:
+        raise ValueError(f"Not a hemoglobin model artifact: {filepath}")
+    if data.get('version') != ARTIFACT_VERSION:
+        raise ValueError(
+            f"Unsupported artifact version {data.get('version')} "
+            f"(expected {ARTIFACT_VERSION}): {filepath}"
+        )
+    
+    return LinearModel(
+        data['coefficients'],
+        data['intercept'],
+        data['feature_columns'],
+        data.get('metadata')
+    )
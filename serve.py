@@ -0,0 +1,577 @@
+"""
+Hemoglobin Inference Service
+
+Local HTTP/JSON service exposing the prediction pipeline:
+1. Predicts Hemoglobin with the trained regression model
+2. Determines anemia status using clinical rules (not ML)
+3. Estimates uncertainty from similar samples in the reference dataset
+4. Adds the calibrated prediction interval and misclassification
+   probability when the model carries a calibration (see calibration.py;
+   the bounds of an unbounded interval are null)
+5. Compares the inputs with the model's training profile, per feature
+   and gender, and logs a warning when they drift (see drift.py)
+
+Concurrent requests are collected into micro-batches (up to
+--max-batch-size samples or --max-wait-ms after the first one arrives)
+and each batch is scored with a single vectorized model call.
+
+The model follows the model registry (see model_registry.py): a new
+current version is loaded in the background and swapped in between
+batches, so retrained models go live without a restart. Each batch is
+scored in the feature order of the model active for it.
+
+Calibrated models answer with their constant-time interval only; as in
+app.py, the similar-sample search runs for models without calibration,
+and the reference dataset is loaded and indexed when the first such
+batch arrives. Reference rows with a missing or infinite feature or Hb
+value are left out of the search.
+
+Endpoints:
+    POST /predict   {"RBC": 4.5, "MCV": 80, "MCH": 27, "MCHC": 33, "Gender": "f"}
+                    or {"samples": [{...}, {...}]}
+    GET  /health
+    GET  /stats
+    GET  /metrics   per-stage latency, Prometheus text format (with --metrics),
+                    and the input drift gauges
+    GET  /drift     input drift report of the current window
+
+Usage:
+    python serve.py --port 8000 --max-batch-size 64 --max-wait-ms 2
+    python serve.py --metrics metrics/serve.json
+    python serve.py --drift-window 20000
+"""
+
+import os
+import json
+import time
+import queue
+import functools
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import numpy as np
+
+import metrics
+from calibration import calibrated_uncertainty, model_calibration
+from dataset_cache import load_csv
+from drift import DEFAULT_WINDOW, format_alert, monitor_for_model, to_prometheus
+from model_registry import DEFAULT_CHECK_INTERVAL, ModelHandle
+from predict import MODEL_DIR, load_model, predict_hemoglobin_batch
+from similarity import (
+    K_NEIGHBORS, SIMILARITY_FEATURES, build_index, summarize_neighbors_batch
+)
+from utils import (
+    encode_gender, threshold_lookup, anemia_status_codes, status_labels,
+    normalize_gender
+)
+from validation import validate
+
+
+# Constants
+DATA_PATH = os.path.join('data', 'anemia_new.csv')
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8000
+DEFAULT_MAX_BATCH_SIZE = 64
+DEFAULT_MAX_WAIT_MS = 2.0
+REQUEST_TIMEOUT = 30.0  # seconds a request waits for its batch
+GENDER_FIELD = 'Gender'
+LISTEN_BACKLOG = 128  # pending connections accepted during bursts
+
+
+class _PendingRequest:
+    """One HTTP request waiting for its rows to be scored."""
+    
+    def __init__(self, X, genders, feature_columns):
+        self.X = X
+        self.genders = genders
+        self.feature_columns = list(feature_columns)
+        self.done = threading.Event()
+        self.results = None
+        self.error = None
+
+
+class MicroBatcher:
+    """
+    Collects concurrent requests and scores them together.
+    
+    A single worker thread takes the first pending request, then keeps
+    adding requests until max_batch_size rows are collected or max_wait
+    seconds have passed, and scores all rows with one model call. If the
+    batch fails, its requests are scored one by one, so an error only
+    reaches the request that caused it.
+    """
+    
+    def __init__(self, model_data, dataset=None, k=K_NEIGHBORS,
+                 max_batch_size=DEFAULT_MAX_BATCH_SIZE,
+                 max_wait_ms=DEFAULT_MAX_WAIT_MS, drift_window=DEFAULT_WINDOW):
+        """
+        Args:
+            model_data: Loaded model dict or a ModelHandle
+            dataset: Reference DataFrame with SIMILARITY_FEATURES and Hb,
+                or a zero-argument function loading it on first use;
+                None disables the similar-sample analysis
+        """
+        # A ModelHandle is followed to new registry versions between batches
+        self.model_handle = model_data if isinstance(model_data, ModelHandle) else None
+        self.model_data = model_data.model_data if self.model_handle is not None else model_data
+        self.k = k
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        
+        # Only the worker thread replaces the monitor (on a new model version)
+        self.drift_window = drift_window
+        self.drift = None
+        self._drift_model = None
+        
+        # Loaded and indexed by the worker thread on first use
+        self.dataset = dataset
+        self.index = None
+        self.reference_hb = None
+        
+        self._queue = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self.n_requests = 0
+        self.n_samples = 0
+        self.n_batches = 0
+        self.largest_batch = 0
+        
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+    
+    @property
+    def feature_columns(self):
+        """Feature columns of the current model version."""
+        model_data = self.model_handle.model_data if self.model_handle is not None else self.model_data
+        return list(model_data['feature_columns'])
+    
+    def submit(self, X, genders, feature_columns=None):
+        """
+        Score rows through the batch queue and wait for the results.
+        
+        Args:
+            X (np.ndarray): (n, n_features) matrix
+            genders (list): Normalized gender per row
+            feature_columns (list): Column order of X (default: the
+                current model's)
+        
+        Returns:
+            list: One result dict per row
+        
+        Raises:
+            ValueError: If the model scoring the batch needs a column X
+                does not have (a new version was swapped in meanwhile)
+        """
+        pending = _PendingRequest(X, genders, feature_columns or self.feature_columns)
+        self._queue.put(pending)
+        
+        if not pending.done.wait(REQUEST_TIMEOUT):
+            raise TimeoutError("Prediction timed out")
+        if pending.error is not None:
+            raise pending.error
+        return pending.results
+    
+    def _run(self):
+        """Worker loop: gather a micro-batch, score it, wake the callers."""
+        while True:
+            batch = [self._queue.get()]
+            n_rows = len(batch[0].X)
+            deadline = time.perf_counter() + self.max_wait
+            
+            while n_rows < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    pending = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                batch.append(pending)
+                n_rows += len(pending.X)
+            
+            try:
+                self._score(batch)
+            except Exception as e:
+                if len(batch) == 1:
+                    batch[0].error = e
+                else:
+                    # Score each request on its own, so only the one that
+                    # fails gets the error
+                    for pending in batch:
+                        try:
+                            self._score([pending])
+                        except Exception as request_error:
+                            pending.error = request_error
+            
+            for pending in batch:
+                pending.done.set()
+            
+            with self._stats_lock:
+                self.n_requests += len(batch)
+                self.n_samples += n_rows
+                self.n_batches += 1
+                self.largest_batch = max(self.largest_batch, n_rows)
+    
+    def _score(self, batch):
+        """Run the full pipeline on all rows of a batch at once."""
+        # One model for the whole batch, even if a new version is swapped in meanwhile
+        model_data = self.model_handle.model_data if self.model_handle is not None else self.model_data
+        feature_columns = list(model_data['feature_columns'])
+        
+        X = np.vstack([_reorder(pending, feature_columns) for pending in batch])
+        genders = [g for pending in batch for g in pending.genders]
+        
+        with metrics.stage('serve.prediction'):
+            predicted_hb = predict_hemoglobin_batch(model_data, X)
+        with metrics.stage('serve.decision'):
+            codes = encode_gender(genders)
+            thresholds = threshold_lookup(codes)
+            statuses = status_labels(anemia_status_codes(predicted_hb, codes))
+        
+        calibration = model_calibration(model_data)
+        neighbors = None
+        if calibration is None and self.dataset is not None \
+                and set(SIMILARITY_FEATURES) <= set(feature_columns):
+            index = self._similarity_index()
+            if index is not None:
+                # One tree query for the whole batch, columns in index order
+                X_similar = X[:, [feature_columns.index(col) for col in SIMILARITY_FEATURES]]
+                with metrics.stage('serve.neighbor_search'):
+                    _, neighbors = index.query(X_similar, k=self.k)
+        
+        uncertainty_start = metrics.clock()
+        summary = None
+        if neighbors is not None:
+            # (batch, K) reductions instead of one summary per row
+            summary = summarize_neighbors_batch(
+                self.reference_hb[neighbors], predicted_hb, len(self.reference_hb)
+            )
+        
+        results = []
+        for i in range(len(X)):
+            calibrated = None
+            if calibration is not None:
+                calibrated = calibrated_uncertainty(
+                    calibration, float(predicted_hb[i]), genders[i], float(thresholds[i])
+                )
+            
+            uncertainty = None
+            if summary is not None:
+                uncertainty = {name: _to_builtin(v[i] if np.ndim(v) else v)
+                               for name, v in summary.items()}
+            
+            results.append({
+                'predicted_hb': float(predicted_hb[i]),
+                'gender': genders[i],
+                'threshold': float(thresholds[i]),
+                'status': statuses[i],
+                'uncertainty': uncertainty,
+                'calibrated': calibrated
+            })
+        metrics.observe_since('serve.uncertainty', uncertainty_start)
+        
+        # Recorded last, so a batch that fails and is rescored request by
+        # request is not counted twice
+        with metrics.stage('serve.drift'):
+            monitor = self._drift_monitor(model_data)
+            if monitor is not None:
+                for alert in monitor.update(X, codes):
+                    print(f"WARNING: {format_alert(alert)}")
+        
+        start = 0
+        for pending in batch:
+            end = start + len(pending.X)
+            pending.results = results[start:end]
+            start = end
+    
+    def _similarity_index(self):
+        """
+        KD-tree over the complete reference rows, built on first use.
+        
+        Returns:
+            KDTree, or None if no reference row is complete
+        """
+        if self.index is None and self.reference_hb is None:
+            with metrics.stage('serve.index_build'):
+                dataset = self.dataset() if callable(self.dataset) else self.dataset
+                # KDTree rejects NaN, and a NaN Hb would spoil the summaries
+                values = dataset[SIMILARITY_FEATURES + ['Hb']].to_numpy(dtype=float)
+                reference = dataset[np.isfinite(values).all(axis=1)]
+                self.reference_hb = reference['Hb'].to_numpy(dtype=float)
+                self.k = min(self.k, len(reference))
+                if len(reference):
+                    self.index = build_index(reference)
+            print(f"Reference dataset indexed: {len(reference)} of {len(dataset)} rows")
+        return self.index
+    
+    def _drift_monitor(self, model_data):
+        """Drift monitor of the scoring model; a new model version starts a fresh one."""
+        if model_data is not self._drift_model:
+            self._drift_model = model_data
+            self.drift = monitor_for_model(model_data, self.drift_window)
+        return self.drift
+    
+    def drift_report(self):
+        """Input drift report, or None if the model has no drift profile."""
+        monitor = self.drift
+        return monitor.report() if monitor is not None else None
+    
+    def stats(self):
+        """Get batching counters."""
+        with self._stats_lock:
+            return {
+                'requests': self.n_requests,
+                'samples': self.n_samples,
+                'batches': self.n_batches,
+                'mean_batch_size': self.n_samples / self.n_batches if self.n_batches else 0.0,
+                'largest_batch': self.largest_batch,
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait * 1000.0,
+                'model_version': self.model_handle.version if self.model_handle is not None else None,
+                'model_reloads': self.model_handle.n_reloads if self.model_handle is not None else 0
+            }
+
+
+def _reorder(pending, feature_columns):
+    """
+    A request's rows in the column order of the scoring model.
+    
+    Raises:
+        ValueError: If the request lacks a column the model needs
+    """
+    if pending.feature_columns == feature_columns:
+        return pending.X
+    missing = [col for col in feature_columns if col not in pending.feature_columns]
+    if missing:
+        raise ValueError(f"Missing fields {missing} required by the current model version")
+    return pending.X[:, [pending.feature_columns.index(col) for col in feature_columns]]
+
+
+def _to_builtin(value):
+    """Convert NumPy scalars to plain Python numbers for JSON output."""
+    if hasattr(value, 'item'):
+        return value.item()
+    return value
+
+
+def parse_samples(payload, feature_columns):
+    """
+    Validate a /predict request body.
+    
+    Args:
+        payload (dict): Either one sample or {"samples": [...]}
+        feature_columns (list): Required numeric fields
+    
+    Returns:
+        tuple: (X matrix, list of normalized genders)
+    
+    Raises:
+        ValueError: If a field is missing or invalid
+    """
+    if not isinstance(payload, dict):
+        raise ValueError("Request body must be a JSON object")
+    
+    samples = payload['samples'] if 'samples' in payload else [payload]
+    if not isinstance(samples, list) or not samples:
+        raise ValueError("'samples' must be a non-empty list")
+    
+    X = np.empty((len(samples), len(feature_columns)))
+    genders = []
+    for i, sample in enumerate(samples):
+        if not isinstance(sample, dict):
+            raise ValueError(f"Sample {i} must be a JSON object")
+        
+        missing = [col for col in feature_columns + [GENDER_FIELD] if col not in sample]
+        if missing:
+            raise ValueError(f"Sample {i}: missing fields {missing}")
+        
+        for j, col in enumerate(feature_columns):
+            value = sample[col]
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                raise ValueError(f"Sample {i}: {col} must be a number")
+            X[i, j] = value
+        
+        gender = sample[GENDER_FIELD]
+        if not isinstance(gender, str):
+            raise ValueError(f"Sample {i}: {GENDER_FIELD} must be a string")
+        genders.append(normalize_gender(gender))
+    
+    # One vectorized check for the whole request; json.loads accepts NaN and Infinity
+    error = validate(X, feature_columns).first_error(strict=True)
+    if error is not None:
+        row, message = error
+        raise ValueError(f"Sample {row}: {message}")
+    
+    return X, genders
+
+
+class PredictionHandler(BaseHTTPRequestHandler):
+    """JSON request handler; the batcher is attached to the server."""
+    
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are written separately; without TCP_NODELAY the
+    # body waits for the client's delayed ACK (~40 ms per request)
+    disable_nagle_algorithm = True
+    
+    def do_GET(self):
+        if self.path == '/health':
+            self._send_json(200, {'status': 'ok'})
+        elif self.path == '/stats':
+            self._send_json(200, self.server.batcher.stats())
+        elif self.path == '/metrics':
+            text = metrics.to_prometheus(metrics.REGISTRY.copy())
+            report = self.server.batcher.drift_report()
+            if report is not None:
+                text += to_prometheus(report)
+            self._send_text(200, text)
+        elif self.path == '/drift':
+            report = self.server.batcher.drift_report()
+            if report is None:
+                self._send_json(404, {'error': "The model has no drift profile (retrain with train.py)"})
+            else:
+                self._send_json(200, report)
+        else:
+            self._send_json(404, {'error': f"Unknown endpoint: {self.path}"})
+    
+    def do_POST(self):
+        if self.path != '/predict':
+            self._send_json(404, {'error': f"Unknown endpoint: {self.path}"})
+            return
+        
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            payload = json.loads(self.rfile.read(length) or b'null')
+            batcher = self.server.batcher
+            feature_columns = batcher.feature_columns
+            X, genders = parse_samples(payload, feature_columns)
+        except (ValueError, json.JSONDecodeError) as e:
+            self._send_json(400, {'error': str(e)})
+            return
+        
+        try:
+            results = batcher.submit(X, genders, feature_columns)
+        except ValueError as e:
+            self._send_json(400, {'error': str(e)})
+            return
+        except Exception as e:
+            self._send_json(500, {'error': str(e)})
+            return
+        
+        if 'samples' in payload:
+            self._send_json(200, {'results': results})
+        else:
+            self._send_json(200, results[0])
+    
+    def _send_json(self, code, body):
+        data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+    
+    def _send_text(self, code, text):
+        data = text.encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+    
+    def log_message(self, format, *args):
+        # Per-request access logs would dominate the cost of a request
+        pass
+
+
+class InferenceServer(ThreadingHTTPServer):
+    """Threaded HTTP server with a listen backlog sized for bursts."""
+    
+    daemon_threads = True
+    request_queue_size = LISTEN_BACKLOG
+
+
+def create_server(batcher, host=DEFAULT_HOST, port=DEFAULT_PORT):
+    """Create the HTTP server bound to host:port."""
+    server = InferenceServer((host, port), PredictionHandler)
+    server.batcher = batcher
+    return server
+
+
+def parse_args(argv=None):
+    """Parse command-line arguments."""
+    parser = argparse.ArgumentParser(description="Hemoglobin inference service")
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--max-batch-size', type=int, default=DEFAULT_MAX_BATCH_SIZE,
+                        help=f"Maximum samples per model call (default: {DEFAULT_MAX_BATCH_SIZE})")
+    parser.add_argument('--max-wait-ms', type=float, default=DEFAULT_MAX_WAIT_MS,
+                        help=f"Maximum time to wait for a batch to fill (default: {DEFAULT_MAX_WAIT_MS})")
+    parser.add_argument('--reload-interval', type=float, default=DEFAULT_CHECK_INTERVAL,
+                        help="Seconds between checks for a new model version; 0 disables "
+                             f"hot reload (default: {DEFAULT_CHECK_INTERVAL})")
+    parser.add_argument('--no-uncertainty', action='store_true',
+                        help="Skip the similar-sample uncertainty analysis")
+    parser.add_argument('--metrics', metavar='FILE',
+                        help="Record per-stage latency (served on /metrics, saved to FILE on exit)")
+    parser.add_argument('--drift-window', type=int, default=DEFAULT_WINDOW,
+                        help=f"Samples per cohort in each input drift window (default: {DEFAULT_WINDOW})")
+    args = parser.parse_args(argv)
+    
+    if args.max_batch_size <= 0:
+        parser.error("--max-batch-size must be positive")
+    if args.max_wait_ms < 0:
+        parser.error("--max-wait-ms cannot be negative")
+    if args.reload_interval < 0:
+        parser.error("--reload-interval cannot be negative")
+    if args.drift_window <= 0:
+        parser.error("--drift-window must be positive")
+    
+    return args
+
+
+def main(argv=None):
+    """Start the inference service."""
+    args = parse_args(argv)
+    
+    if args.metrics:
+        metrics.configure(args.metrics)
+    
+    try:
+        models = ModelHandle(load_model, MODEL_DIR, check_interval=args.reload_interval)
+    except (FileNotFoundError, ValueError) as e:
+        print(f"ERROR: {e}")
+        return
+    print(f"Model loaded successfully ({models.version or models.model_path}).")
+    if args.reload_interval > 0:
+        models.start()
+    
+    dataset = None
+    if not args.no_uncertainty:
+        if os.path.exists(DATA_PATH):
+            # Loaded when the first batch of a model without calibration arrives
+            dataset = functools.partial(load_csv, DATA_PATH, columns=SIMILARITY_FEATURES + ['Hb'])
+        else:
+            print(f"WARNING: Dataset not found ({DATA_PATH}); uncertainty disabled.")
+    
+    batcher = MicroBatcher(
+        models, dataset,
+        max_batch_size=args.max_batch_size,
+        max_wait_ms=args.max_wait_ms,
+        drift_window=args.drift_window
+    )
+    server = create_server(batcher, args.host, args.port)
+    
+    print(f"Serving on http://{args.host}:{args.port} "
+          f"(max batch {args.max_batch_size}, max wait {args.max_wait_ms} ms)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print()
+        print("Server stopped.")
+    finally:
+        server.server_close()
+        metrics.flush()
+
+
+if __name__ == "__main__":
+    main()
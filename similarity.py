@@ -0,0 +1,352 @@
+"""
+Similarity-Based Prediction Uncertainty
+
+Finds the K reference samples closest to an input on SIMILARITY_FEATURES
+and summarizes how their true Hemoglobin values spread around the model's
+prediction. Shared by the Streamlit app and the HTTP inference service;
+the app searches the compact ReferenceStore (reference_store.py) and only
+uses summarize_neighbors() from here.
+
+Many inputs at once (batch scoring) go through find_similar_batch() and
+summarize_neighbors_batch(): query-by-reference distance tiles of at most
+TILE_BYTES are scanned, a running (N, K) nearest set is kept, and the
+metrics are (N, K) array reductions. Per row they equal the single-query
+functions; both break ties in distance by row order.
+
+Usage:
+    index = build_index(df)
+    similar = find_similar_samples(df, features, k=K_NEIGHBORS, index=index)
+    uncertainty = calculate_uncertainty(similar, predicted_hb, len(df))
+    
+    uncertainty = calculate_uncertainty_batch(df, X, predicted_hb)  # arrays of length N
+"""
+
+import numpy as np
+
+
+# Constants
+K_NEIGHBORS = 30  # Number of similar samples to consider
+KDTREE_LEAF_SIZE = 40
+TIE_TOLERANCE = 1e-9  # KD-tree radius slack when collecting ties at the K-th distance
+
+# Batch search: memory cap of one query-by-reference distance tile
+TILE_BYTES = 32 << 20
+TILE_BYTES_PER_CELL = 17  # squared distance, temporary (also partitioned in place) and bound mask
+QUERY_TILE_ROWS = 256
+
+# Features used for similarity calculation
+SIMILARITY_FEATURES = ['RBC', 'MCV', 'MCH', 'MCHC']
+
+
+def build_index(df):
+    """Build a KD-tree over SIMILARITY_FEATURES of a reference dataset."""
+    from sklearn.neighbors import KDTree
+    
+    X = np.ascontiguousarray(df[SIMILARITY_FEATURES].to_numpy(dtype=float))
+    return KDTree(X, leaf_size=KDTREE_LEAF_SIZE)
+
+
+def _squared_distances(X, input_vector):
+    """Squared Euclidean distances of rows to one input; incomplete rows rank last."""
+    d2 = np.sum((X - input_vector) ** 2, axis=1)
+    d2[np.isnan(d2)] = np.inf
+    return d2
+
+
+def _select_stable(d2, indices, k):
+    """
+    K candidates ordered by (squared distance, row), as
+    nearest_neighbors_batch() does; returns (distances, indices).
+    """
+    order = np.lexsort((indices, d2))[:k]
+    return np.sqrt(d2[order]), indices[order]
+
+
+def find_similar_samples(df, input_features, k=K_NEIGHBORS, index=None):
+    """
+    Find K most similar samples in the dataset based on Euclidean distance.
+    
+    Ties in distance are broken by row order, so the rows equal those of
+    find_similar_batch() with or without an index.
+    
+    Args:
+        df: Dataset with features and true Hb values
+        input_features: Dictionary of input feature values
+        k: Number of nearest neighbors to return
+        index: KDTree from build_index(); if None, distances
+            are computed against every row
+    
+    Returns:
+        DataFrame of similar samples with distances
+    """
+    # Build input vector
+    input_vector = np.array([[input_features[col] for col in SIMILARITY_FEATURES]])
+    k = min(k, len(df))
+    
+    if index is not None:
+        # Sublinear tree query, then every row tying the K-th distance
+        # (the tree breaks ties arbitrarily), re-measured like the full
+        # scan so distances compare exactly
+        distances, _ = index.query(input_vector, k=k)
+        radius = distances[0, -1]
+        candidates = index.query_radius(input_vector, r=radius * (1 + TIE_TOLERANCE) + TIE_TOLERANCE)[0]
+        X_candidates = df.iloc[candidates][SIMILARITY_FEATURES].to_numpy(dtype=float)
+        distances, indices = _select_stable(_squared_distances(X_candidates, input_vector),
+                                            candidates.astype(np.intp), k)
+    else:
+        X_data = df[SIMILARITY_FEATURES].to_numpy(dtype=float)
+        all_d2 = _squared_distances(X_data, input_vector)
+        
+        # Partial sort: only the rows within the K-th distance are ordered
+        kth = np.partition(all_d2, k - 1)[k - 1]
+        candidates = np.flatnonzero(all_d2 <= kth)
+        distances, indices = _select_stable(all_d2[candidates], candidates, k)
+    
+    # Only the K selected rows are materialized
+    similar = df.iloc[indices].assign(_distance=distances)
+    
+    return similar
+
+
+def calculate_uncertainty(similar_samples, predicted_hb, total_samples):
+    """
+    Calculate prediction uncertainty based on similar samples.
+    
+    Args:
+        similar_samples: DataFrame of similar samples
+        predicted_hb: Model's predicted Hemoglobin value
+        total_samples: Total number of samples in dataset
+    
+    Returns:
+        Dictionary with uncertainty metrics including percentages
+    """
+    return summarize_neighbors(similar_samples['Hb'].values, predicted_hb, total_samples)
+
+
+def summarize_neighbors(true_hb_values, predicted_hb, total_samples):
+    """
+    Uncertainty metrics from the true Hb values of the similar samples.
+    
+    Same result as calculate_uncertainty(), for callers that already hold
+    the neighbors' Hb values (an array or a list).
+    """
+    true_hb_values = np.asarray(true_hb_values, dtype=float)
+    
+    # Calculate metrics
+    mean_hb = np.mean(true_hb_values)
+    std_hb = np.std(true_hb_values)
+    min_hb = np.min(true_hb_values)
+    max_hb = np.max(true_hb_values)
+    
+    # MAE between prediction and true values of similar samples
+    mae = np.mean(np.abs(true_hb_values - predicted_hb))
+    
+    # Calculate percentage of similar samples within ±1 g/dL of prediction
+    within_1 = np.sum(np.abs(true_hb_values - predicted_hb) <= 1.0)
+    within_1_pct = (within_1 / len(true_hb_values)) * 100
+    
+    # Calculate percentage within ±2 g/dL
+    within_2 = np.sum(np.abs(true_hb_values - predicted_hb) <= 2.0)
+    within_2_pct = (within_2 / len(true_hb_values)) * 100
+    
+    # Confidence score based on how close prediction is to mean of similar samples
+    # Lower difference = higher confidence
+    diff_from_mean = abs(predicted_hb - mean_hb)
+    # Scale: if diff is 0, confidence is 100%; if diff >= 3, confidence approaches 50%
+    confidence_pct = max(50, 100 - (diff_from_mean * 16.67))
+    confidence_pct = min(100, confidence_pct)
+    
+    return {
+        'n_samples': len(true_hb_values),
+        'total_samples': total_samples,
+        'mean_hb': mean_hb,
+        'std_hb': std_hb,
+        'min_hb': min_hb,
+        'max_hb': max_hb,
+        'mae': mae,
+        'typical_deviation': std_hb,
+        'within_1_pct': within_1_pct,
+        'within_2_pct': within_2_pct,
+        'confidence_pct': confidence_pct
+    }
+
+
+def _merge_candidates(n_queries, k, rows, d2, indices):
+    """
+    K best (distance, row) entries per query from flat candidate arrays.
+    
+    Every query must have at least k candidates. Returns (n_queries, k)
+    squared distances and indices ordered by (distance, row).
+    """
+    order = np.lexsort((indices, d2, rows))
+    starts = np.searchsorted(rows[order], np.arange(n_queries))
+    take = order[(starts[:, None] + np.arange(k)).ravel()]
+    return d2[take].reshape(n_queries, k), indices[take].reshape(n_queries, k)
+
+
+def nearest_neighbors_batch(reference, queries, k=K_NEIGHBORS, tile_bytes=TILE_BYTES):
+    """
+    K nearest reference rows for every query row (exact, full scan).
+    
+    The query-by-reference distance matrix is computed in tiles of at most
+    tile_bytes. Each query keeps its current K-th distance as a bound, and
+    only the tile cells within it are extracted and merged into the
+    running (N, K) result; after the first tile that is a small fraction
+    of the cells. Memory does not depend on the reference size.
+    
+    Args:
+        reference: (n, d) reference feature matrix
+        queries: (N, d) query feature matrix, same column order
+        k (int): Number of neighbours (capped at the reference size)
+        tile_bytes (int): Memory cap of one distance tile
+    
+    Returns:
+        tuple: (distances, indices), both (N, K), sorted by distance; ties
+            are broken by reference row order
+    """
+    reference = np.asarray(reference, dtype=float)
+    queries = np.asarray(queries, dtype=float).reshape(-1, reference.shape[1])
+    n_ref, n_queries = len(reference), len(queries)
+    k = min(k, n_ref)
+    if n_queries == 0 or k == 0:
+        return np.empty((n_queries, k)), np.empty((n_queries, k), dtype=np.intp)
+    
+    cells = max(k, tile_bytes // TILE_BYTES_PER_CELL)
+    ref_rows = min(n_ref, max(k, cells // min(n_queries, QUERY_TILE_ROWS)))
+    query_rows = max(1, cells // ref_rows)
+    
+    # Incomplete rows rank last instead of dropping out of the comparisons
+    has_nan = bool(np.isnan(reference).any() or np.isnan(queries).any())
+    columns = np.ascontiguousarray(reference.T)
+    d2_buffer = np.empty(min(query_rows, n_queries) * ref_rows)
+    diff_buffer = np.empty_like(d2_buffer)
+    
+    best_d2 = np.empty((n_queries, k))
+    best_idx = np.empty((n_queries, k), dtype=np.intp)
+    for q_start in range(0, n_queries, query_rows):
+        Q = queries[q_start:q_start + query_rows]
+        n_q = len(Q)
+        tile_d2 = tile_idx = None
+        
+        for r_start in range(0, n_ref, ref_rows):
+            n_r = min(ref_rows, n_ref - r_start)
+            d2 = d2_buffer[:n_q * n_r].reshape(n_q, n_r)
+            diff = diff_buffer[:n_q * n_r].reshape(n_q, n_r)
+            
+            # Accumulated one feature at a time, in the same order as the
+            # single-query row sum, so distances are bit-identical
+            np.subtract(Q[:, :1], columns[0, r_start:r_start + n_r], out=d2)
+            np.multiply(d2, d2, out=d2)
+            for j in range(1, len(columns)):
+                np.subtract(Q[:, j:j + 1], columns[j, r_start:r_start + n_r], out=diff)
+                np.multiply(diff, diff, out=diff)
+                np.add(d2, diff, out=d2)
+            if has_nan:
+                d2[np.isnan(d2)] = np.inf
+            
+            if tile_d2 is None:
+                # The first tile's K-th distance is the initial bound;
+                # partitioned in the free diff buffer (np.partition would
+                # allocate a copy of the tile beyond TILE_BYTES_PER_CELL)
+                np.copyto(diff, d2)
+                diff.partition(k - 1, axis=1)
+                bound = diff[:, k - 1:k].copy()
+            else:
+                bound = tile_d2[:, -1:]
+            
+            cells_in = np.flatnonzero(d2 <= bound)
+            if len(cells_in) == 0:
+                continue
+            rows, cols = np.divmod(cells_in, n_r)
+            cand_d2 = d2.ravel()[cells_in]
+            cand_idx = cols + r_start
+            if tile_d2 is not None:
+                rows = np.concatenate([np.repeat(np.arange(n_q), k), rows])
+                cand_d2 = np.concatenate([tile_d2.ravel(), cand_d2])
+                cand_idx = np.concatenate([tile_idx.ravel(), cand_idx])
+            tile_d2, tile_idx = _merge_candidates(n_q, k, rows, cand_d2, cand_idx)
+        
+        best_d2[q_start:q_start + n_q] = tile_d2
+        best_idx[q_start:q_start + n_q] = tile_idx
+    
+    return np.sqrt(best_d2), best_idx
+
+
+def find_similar_batch(df, queries, k=K_NEIGHBORS, tile_bytes=TILE_BYTES):
+    """
+    Find the K most similar dataset rows for many inputs at once.
+    
+    Args:
+        df: Dataset with SIMILARITY_FEATURES
+        queries: (N, 4) matrix in SIMILARITY_FEATURES order (or a
+            DataFrame with those columns)
+        k (int): Number of nearest neighbors per input
+        tile_bytes (int): Memory cap of one distance tile
+    
+    Returns:
+        tuple: (distances, positional row indices into df), both (N, K)
+    """
+    if hasattr(queries, 'columns'):
+        queries = queries[SIMILARITY_FEATURES].to_numpy(dtype=float)
+    reference = df[SIMILARITY_FEATURES].to_numpy(dtype=float)
+    return nearest_neighbors_batch(reference, queries, k, tile_bytes)
+
+
+def summarize_neighbors_batch(true_hb_values, predicted_hb, total_samples):
+    """
+    summarize_neighbors() for many inputs as (N, K) array reductions.
+    
+    Args:
+        true_hb_values: (N, K) true Hb of each input's similar samples
+        predicted_hb: (N,) model predictions
+        total_samples (int): Total number of samples in dataset
+    
+    Returns:
+        dict: Same keys as summarize_neighbors(); per-input metrics are
+            (N,) arrays, 'n_samples' and 'total_samples' are ints
+    """
+    true_hb_values = np.asarray(true_hb_values, dtype=float)
+    predicted_hb = np.asarray(predicted_hb, dtype=float).reshape(-1, 1)
+    n_samples = true_hb_values.shape[1]
+    
+    mean_hb = np.mean(true_hb_values, axis=1)
+    std_hb = np.std(true_hb_values, axis=1)
+    abs_error = np.abs(true_hb_values - predicted_hb)
+    
+    # Same confidence scale as summarize_neighbors()
+    diff_from_mean = np.abs(predicted_hb[:, 0] - mean_hb)
+    confidence_pct = np.minimum(100, np.maximum(50, 100 - (diff_from_mean * 16.67)))
+    
+    return {
+        'n_samples': n_samples,
+        'total_samples': total_samples,
+        'mean_hb': mean_hb,
+        'std_hb': std_hb,
+        'min_hb': np.min(true_hb_values, axis=1),
+        'max_hb': np.max(true_hb_values, axis=1),
+        'mae': np.mean(abs_error, axis=1),
+        'typical_deviation': std_hb,
+        'within_1_pct': (np.sum(abs_error <= 1.0, axis=1) / n_samples) * 100,
+        'within_2_pct': (np.sum(abs_error <= 2.0, axis=1) / n_samples) * 100,
+        'confidence_pct': confidence_pct
+    }
+
+
+def calculate_uncertainty_batch(df, queries, predicted_hb, k=K_NEIGHBORS, tile_bytes=TILE_BYTES):
+    """
+    Uncertainty metrics for many inputs: find_similar_batch() followed by
+    summarize_neighbors_batch().
+    
+    Args:
+        df: Dataset with SIMILARITY_FEATURES and true Hb values
+        queries: (N, 4) matrix in SIMILARITY_FEATURES order
+        predicted_hb: (N,) model predictions
+        k (int): Number of nearest neighbors per input
+        tile_bytes (int): Memory cap of one distance tile
+    
+    Returns:
+        dict: See summarize_neighbors_batch()
+    """
+    _, indices = find_similar_batch(df, queries, k, tile_bytes)
+    true_hb = df['Hb'].to_numpy(dtype=float)
+    return summarize_neighbors_batch(true_hb[indices], predicted_hb, len(df))
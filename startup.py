@@ -0,0 +1,226 @@
+"""
+Startup Import-Time Profiling and Cold-Start Budget
+
+Runs entry points under `python -X importtime`, parses the per-module
+timings and reports where start-up time goes. Each entry point path has
+a cold-start budget (import time of the modules the entry point itself
+loads, in ms, excluding what a bare interpreter imports) that can be
+checked for regressions. Each path is measured a few times and the
+fastest run is kept, which filters out scheduler and disk noise. A path
+whose process exits with an error (e.g. an import fails) is reported as
+failed, not as fast.
+
+Entry points also expose this as a flag, e.g.:
+    python predict.py --startup-profile --rbc 4.5 --mcv 80 --mch 27 --mchc 33 --gender f
+    python train.py --startup-profile
+
+The flag runs the profiled invocation for real (train.py trains and
+saves a model), so profile side-effect-free paths where possible.
+
+Usage:
+    python startup.py            # report all budgeted paths
+    python startup.py --check    # exit with status 1 if any path is over budget or fails
+"""
+
+import os
+import sys
+import argparse
+import subprocess
+
+
+# Cold-start budgets: name -> (interpreter arguments, budget in ms).
+# Budgets count only modules a bare `python -c pass` does not import.
+STARTUP_BUDGETS = {
+    'predict --help': (['predict.py', '--help'], 25),
+    'predict one-shot (in-process)': (
+        ['predict.py', '--rbc', '4.5', '--mcv', '80', '--mch', '27',
+         '--mchc', '33', '--gender', 'f', '--socket', os.devnull],
+        250
+    ),
+    'predict missing input file': (
+        ['predict.py', '--input', 'missing.csv', '--output', os.devnull],
+        25
+    ),
+    'train --help': (['train.py', '--help'], 25),
+    'app import': (['-c', 'import app'], 800),
+}
+
+DEFAULT_TOP_N = 15
+DEFAULT_REPEAT = 3
+
+
+def parse_importtime(stderr):
+    """
+    Parse `-X importtime` output.
+    
+    Returns:
+        list: (module, self_us, cumulative_us, depth) tuples in load order
+    """
+    records = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        try:
+            self_part, cumulative_part, name = line[len('import time:'):].split('|', 2)
+            self_us = int(self_part)
+            cumulative_us = int(cumulative_part)
+        except ValueError:
+            continue
+        # One leading space, then two per nesting level
+        depth = (len(name) - len(name.lstrip(' ')) - 1) // 2
+        records.append((name.strip(), self_us, cumulative_us, depth))
+    return records
+
+
+def _run_importtime(args, cwd=None):
+    """
+    Run `python -X importtime <args>` once and parse its timings.
+    
+    Returns:
+        tuple: (records, returncode, last stderr line that is not an
+            import timing, e.g. the exception of a failed run)
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime'] + list(args),
+        cwd=cwd,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True
+    )
+    messages = [line for line in result.stderr.splitlines()
+                if line.strip() and not line.startswith('import time:')]
+    return parse_importtime(result.stderr), result.returncode, messages[-1] if messages else ''
+
+
+def interpreter_modules(cwd=None):
+    """Top-level modules a bare interpreter imports (site, encodings, ...)."""
+    records, _, _ = _run_importtime(['-c', 'pass'], cwd=cwd)
+    return {name for name, _, _, depth in records if depth == 0}
+
+
+def measure(args, cwd=None, baseline=None, repeat=DEFAULT_REPEAT):
+    """
+    Measure the import time of one invocation.
+    
+    The child's stdin is closed and its stdout discarded, so interactive
+    paths exit at the first prompt.
+    
+    Args:
+        args (list): Interpreter arguments, e.g. ['predict.py', '--help']
+        cwd (str): Working directory
+        baseline (set): Modules to exclude; see interpreter_modules()
+        repeat (int): Number of runs; the fastest one is reported
+    
+    Returns:
+        dict: 'net_ms' (entry point's own imports), per-module 'records',
+            'returncode' and 'error' (last stderr message) of the run; a
+            failing run is reported instead of the fastest one
+    """
+    if baseline is None:
+        baseline = interpreter_modules(cwd)
+    
+    best = None
+    for _ in range(repeat):
+        records, returncode, error = _run_importtime(args, cwd=cwd)
+        net_us = sum(
+            cumulative for name, _, cumulative, depth in records
+            if depth == 0 and name not in baseline
+        )
+        profile = {'net_ms': net_us / 1000.0, 'records': records,
+                   'returncode': returncode, 'error': error}
+        if returncode != 0:
+            # A crash stops importing early and would look fast
+            return profile
+        if best is None or net_us < best['net_ms'] * 1000.0:
+            best = profile
+    return best
+
+
+def top_level_modules(records, baseline=(), n=DEFAULT_TOP_N):
+    """Heaviest top-level imports as (module, cumulative_ms), largest first."""
+    top = [
+        (name, cumulative / 1000.0) for name, _, cumulative, depth in records
+        if depth == 0 and name not in baseline
+    ]
+    top.sort(key=lambda item: item[1], reverse=True)
+    return top[:n]
+
+
+def print_report(title, profile, baseline, budget=None, top_n=DEFAULT_TOP_N):
+    """Print one startup profile."""
+    print("-" * 60)
+    print(f"  STARTUP PROFILE: {title}")
+    print("-" * 60)
+    print(f"  Import time:  {profile['net_ms']:.1f} ms (excluding interpreter start-up)")
+    if profile['returncode'] != 0:
+        print(f"  FAILED:       exit status {profile['returncode']}: {profile['error']}")
+    elif budget is not None:
+        verdict = "OK" if profile['net_ms'] <= budget else "OVER BUDGET"
+        print(f"  Budget:       {budget} ms  [{verdict}]")
+    print()
+    print("  Heaviest top-level imports (cumulative):")
+    for name, ms in top_level_modules(profile['records'], baseline, top_n):
+        print(f"    {ms:8.1f} ms  {name}")
+    print("-" * 60)
+    print()
+
+
+def run_startup_profile(script, argv):
+    """
+    Profile one invocation of an entry point (the --startup-profile flag).
+    
+    Args:
+        script (str): Script path, e.g. 'predict.py'
+        argv (list): Its command-line arguments without --startup-profile
+    """
+    cwd = os.path.dirname(os.path.abspath(script))
+    baseline = interpreter_modules(cwd)
+    profile = measure([os.path.basename(script)] + list(argv), cwd=cwd, baseline=baseline)
+    print_report(" ".join([os.path.basename(script)] + list(argv)), profile, baseline)
+
+
+def strip_flag(argv, flag='--startup-profile'):
+    """Return argv without the profiling flag."""
+    return [arg for arg in argv if arg != flag]
+
+
+def check_budgets(budgets=STARTUP_BUDGETS, cwd=None, verbose=True):
+    """
+    Measure every budgeted path.
+    
+    Returns:
+        list: Names of paths over budget or failing
+    """
+    cwd = cwd or os.path.dirname(os.path.abspath(__file__))
+    baseline = interpreter_modules(cwd)
+    
+    over = []
+    for name, (args, budget) in budgets.items():
+        profile = measure(args, cwd=cwd, baseline=baseline)
+        if verbose:
+            print_report(name, profile, baseline, budget, top_n=5)
+        if profile['returncode'] != 0 or profile['net_ms'] > budget:
+            over.append(name)
+    return over
+
+
+def main(argv=None):
+    """Report (and optionally enforce) the cold-start budgets."""
+    parser = argparse.ArgumentParser(description="Startup import-time budget check")
+    parser.add_argument('--check', action='store_true',
+                        help="Exit with status 1 if any path exceeds its budget or fails")
+    args = parser.parse_args(argv)
+    
+    over = check_budgets()
+    
+    if over:
+        print(f"Over budget or failed: {', '.join(over)}")
+        if args.check:
+            sys.exit(1)
+    else:
+        print("All entry points are within their cold-start budgets.")
+
+
+if __name__ == "__main__":
+    main()
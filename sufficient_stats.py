@@ -0,0 +1,320 @@
+"""
+Out-of-Core Least Squares via Sufficient Statistics
+
+Ordinary least squares only needs the means and centered cross-products
+of the data (the normal equations), so training can stream any number
+of CSV shards in fixed-size chunks and never hold more than one chunk
+per worker in memory. Each shard is summarized in its own process,
+the partial statistics are merged (Chan et al. pairwise update, which
+stays accurate for large offsets such as MCV ~ 80 fL) and the system is
+solved once.
+
+The train/test holdout is drawn per block of HOLDOUT_BLOCK_ROWS rows of
+a shard from a generator seeded with (random_state, shard, block) and
+advanced to the row's offset in the block. A row's assignment depends
+only on its position in the shard, so the evaluation pass sees exactly
+the same split as the fitting pass, and --chunk-size (a memory setting)
+does not change the split, the model or its metrics.
+
+Usage:
+    python train.py --shards data/2024-*.csv --chunk-size 1000000 --workers 8
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+
+# Defaults
+DEFAULT_CHUNK_SIZE = 500_000
+HOLDOUT_BLOCK_ROWS = 1 << 20  # rows per holdout generator stream
+
+
+class RegressionStatistics:
+    """
+    Mergeable sufficient statistics for y ~ X @ coef + intercept.
+    
+    Stores the row count, feature/target means and centered
+    cross-products Cxx = sum((x - mean_x)(x - mean_x)^T),
+    Cxy = sum((x - mean_x)(y - mean_y)) and Cyy = sum((y - mean_y)^2).
+    """
+    
+    def __init__(self, n_features):
+        self.n = 0
+        self.mean_x = np.zeros(n_features)
+        self.mean_y = 0.0
+        self.cxx = np.zeros((n_features, n_features))
+        self.cxy = np.zeros(n_features)
+        self.cyy = 0.0
+    
+    def update(self, X, y):
+        """Add a block of rows."""
+        X = np.asarray(X, dtype=float)
+        y = np.asarray(y, dtype=float)
+        if len(y) == 0:
+            return
+        
+        block = RegressionStatistics(X.shape[1])
+        block.n = len(y)
+        block.mean_x = X.mean(axis=0)
+        block.mean_y = float(y.mean())
+        Xc = X - block.mean_x
+        yc = y - block.mean_y
+        block.cxx = Xc.T @ Xc
+        block.cxy = Xc.T @ yc
+        block.cyy = float(yc @ yc)
+        self.merge(block)
+    
+    def merge(self, other):
+        """Combine with statistics of a disjoint set of rows (in place)."""
+        if other.n == 0:
+            return
+        if self.n == 0:
+            self.n = other.n
+            self.mean_x = other.mean_x.copy()
+            self.mean_y = other.mean_y
+            self.cxx = other.cxx.copy()
+            self.cxy = other.cxy.copy()
+            self.cyy = other.cyy
+            return
+        
+        n = self.n + other.n
+        weight = self.n * other.n / n
+        dx = other.mean_x - self.mean_x
+        dy = other.mean_y - self.mean_y
+        
+        self.cxx = self.cxx + other.cxx + weight * np.outer(dx, dx)
+        self.cxy = self.cxy + other.cxy + weight * dx * dy
+        self.cyy = self.cyy + other.cyy + weight * dy * dy
+        self.mean_x = self.mean_x + dx * (other.n / n)
+        self.mean_y = self.mean_y + dy * (other.n / n)
+        self.n = n
+    
+    def solve(self):
+        """
+        Solve the normal equations.
+        
+        Returns:
+            tuple: (coefficients, intercept)
+        
+        Raises:
+            ValueError: If there are no rows
+        """
+        if self.n == 0:
+            raise ValueError("No training rows")
+        
+        # Minimum-norm solution, like LinearRegression, if Cxx is singular
+        coefficients = np.linalg.lstsq(self.cxx, self.cxy, rcond=None)[0]
+        intercept = self.mean_y - self.mean_x @ coefficients
+        return coefficients, float(intercept)
+    
+    def feature_std(self):
+        """Population standard deviation of each feature."""
+        return np.sqrt(np.diag(self.cxx) / self.n)
+    
+    def target_std(self):
+        """Population standard deviation of the target."""
+        return float(np.sqrt(self.cyy / self.n))
+    
+    def to_dict(self):
+        """Serializable state."""
+        return {
+            'n': int(self.n),
+            'mean_x': [float(v) for v in self.mean_x],
+            'mean_y': float(self.mean_y),
+            'cxx': [[float(v) for v in row] for row in self.cxx],
+            'cxy': [float(v) for v in self.cxy],
+            'cyy': float(self.cyy)
+        }
+    
+    @classmethod
+    def from_dict(cls, data):
+        """Rebuild from to_dict() output."""
+        stats = cls(len(data['mean_x']))
+        stats.n = data['n']
+        stats.mean_x = np.asarray(data['mean_x'], dtype=float)
+        stats.mean_y = data['mean_y']
+        stats.cxx = np.asarray(data['cxx'], dtype=float)
+        stats.cxy = np.asarray(data['cxy'], dtype=float)
+        stats.cyy = data['cyy']
+        return stats
+
+
+def holdout_mask(start, n_rows, test_size, random_state, shard_index):
+    """
+    Holdout assignment of rows start .. start + n_rows - 1 of a shard.
+    
+    Returns:
+        np.ndarray: (n_rows,) boolean mask, True for test rows
+    """
+    draws = np.empty(n_rows)
+    position = 0
+    while position < n_rows:
+        block, offset = divmod(start + position, HOLDOUT_BLOCK_ROWS)
+        count = min(n_rows - position, HOLDOUT_BLOCK_ROWS - offset)
+        # One uniform double per 64-bit output, so advancing skips `offset` rows
+        bit_generator = np.random.PCG64([random_state, shard_index, block])
+        bit_generator.advance(offset)
+        draws[position:position + count] = np.random.Generator(bit_generator).random(count)
+        position += count
+    return draws < test_size
+
+
+def _iter_chunks(path, feature_columns, target_column, chunk_size, test_size,
+                 random_state, shard_index):
+    """
+    Yield (X, y, is_test, n_raw_rows) per chunk with incomplete rows removed.
+    
+    The holdout mask is drawn before incomplete rows are dropped, so a
+    row's assignment does not depend on its neighbours.
+    """
+    import pandas as pd
+    
+    columns = feature_columns + [target_column]
+    reader = pd.read_csv(path, usecols=columns, dtype={col: 'float64' for col in columns},
+                         chunksize=chunk_size)
+    start = 0
+    for chunk in reader:
+        is_test = holdout_mask(start, len(chunk), test_size, random_state, shard_index)
+        start += len(chunk)
+        
+        values = chunk[columns].to_numpy()
+        complete = ~np.isnan(values).any(axis=1)
+        values = values[complete]
+        yield values[:, :-1], values[:, -1], is_test[complete], len(chunk)
+
+
+def shard_statistics(path, feature_columns, target_column, chunk_size, test_size,
+                     random_state, shard_index):
+    """
+    Summarize the training rows of one shard (runs in a worker process).
+    
+    Returns:
+        dict: 'stats' (RegressionStatistics.to_dict()), 'rows', 'dropped',
+            'n_test' and per-column 'negative' counts
+    """
+    stats = RegressionStatistics(len(feature_columns))
+    rows = dropped = n_test = 0
+    negative = np.zeros(len(feature_columns) + 1, dtype=np.int64)
+    
+    for X, y, is_test, n_raw in _iter_chunks(path, feature_columns, target_column,
+                                             chunk_size, test_size, random_state,
+                                             shard_index):
+        rows += n_raw
+        dropped += n_raw - len(y)
+        n_test += int(is_test.sum())
+        negative += (np.column_stack([X, y]) < 0).sum(axis=0)
+        stats.update(X[~is_test], y[~is_test])
+    
+    return {
+        'stats': stats.to_dict(),
+        'rows': rows,
+        'dropped': dropped,
+        'n_test': n_test,
+        'negative': dict(zip(feature_columns + [target_column], negative.tolist()))
+    }
+
+
+def shard_evaluation(path, feature_columns, target_column, chunk_size, test_size,
+                     random_state, shard_index, coefficients, intercept):
+    """
+    Accumulate test-set error sums of one shard (runs in a worker process).
+    
+    Returns:
+        dict: 'n', 'abs_error', 'sq_error' and target RegressionStatistics
+            (for the total sum of squares in R2)
+    """
+    coefficients = np.asarray(coefficients, dtype=float)
+    target = RegressionStatistics(0)
+    n = 0
+    abs_error = sq_error = 0.0
+    
+    for X, y, is_test, _ in _iter_chunks(path, feature_columns, target_column,
+                                         chunk_size, test_size, random_state,
+                                         shard_index):
+        X, y = X[is_test], y[is_test]
+        residual = y - (X @ coefficients + intercept)
+        n += len(y)
+        abs_error += float(np.abs(residual).sum())
+        sq_error += float(residual @ residual)
+        target.update(np.empty((len(y), 0)), y)
+    
+    return {'n': n, 'abs_error': abs_error, 'sq_error': sq_error,
+            'target': target.to_dict()}
+
+
+def _map_shards(fn, paths, settings, workers, extra=()):
+    """Run fn(path, *settings, shard_index, *extra) per shard in a process pool."""
+    calls = [(path, *settings, index, *extra) for index, path in enumerate(paths)]
+    workers = max(1, min(workers or os.cpu_count() or 1, len(paths)))
+    if workers == 1:
+        return [fn(*call) for call in calls]
+    
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(fn, *call) for call in calls]
+        return [future.result() for future in futures]
+
+
+def fit_shards(paths, feature_columns, target_column, chunk_size=DEFAULT_CHUNK_SIZE,
+               test_size=0.2, random_state=42, workers=None):
+    """
+    Fit OLS over CSV shards with one worker process per shard.
+    
+    Args:
+        paths (list): CSV files
+        feature_columns (list): Feature column names (model input order)
+        target_column (str): Target column name
+        chunk_size (int): Rows read at a time per worker
+        test_size (float): Fraction of rows held out for evaluation
+        random_state (int): Seed of the holdout assignment
+        workers (int): Process count (default: one per shard, up to the CPU count)
+    
+    Returns:
+        dict: 'coefficients', 'intercept', 'train' (merged
+            RegressionStatistics), 'metrics' (MAE/RMSE/R2/n_samples) and
+            'shards' (per-shard row counts)
+    
+    Raises:
+        FileNotFoundError: If a shard doesn't exist
+        ValueError: If there are no training rows
+    """
+    for path in paths:
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Data file not found: {path}")
+    
+    settings = (feature_columns, target_column, chunk_size, test_size, random_state)
+    
+    shard_results = _map_shards(shard_statistics, paths, settings, workers)
+    train = RegressionStatistics(len(feature_columns))
+    for result in shard_results:
+        train.merge(RegressionStatistics.from_dict(result['stats']))
+    coefficients, intercept = train.solve()
+    
+    metrics = {'MAE': float('nan'), 'RMSE': float('nan'), 'R2': float('nan'), 'n_samples': 0}
+    if test_size > 0:
+        evaluations = _map_shards(shard_evaluation, paths, settings, workers,
+                                  extra=(coefficients.tolist(), intercept))
+        n = sum(e['n'] for e in evaluations)
+        if n > 0:
+            target = RegressionStatistics(0)
+            for e in evaluations:
+                target.merge(RegressionStatistics.from_dict(e['target']))
+            sq_error = sum(e['sq_error'] for e in evaluations)
+            metrics = {
+                'MAE': sum(e['abs_error'] for e in evaluations) / n,
+                'RMSE': float(np.sqrt(sq_error / n)),
+                'R2': 1.0 - sq_error / target.cyy if target.cyy > 0 else float('nan'),
+                'n_samples': n
+            }
+    
+    return {
+        'coefficients': coefficients,
+        'intercept': intercept,
+        'train': train,
+        'metrics': metrics,
+        'shards': [
+            {key: result[key] for key in ('rows', 'dropped', 'n_test', 'negative')}
+            for result in shard_results
+        ]
+    }
@@ -0,0 +1,33 @@
+"""Split-conformal intervals reach their coverage on new samples."""
+
+import numpy as np
+
+from calibration import build_calibration, prediction_interval
+
+
+def _residual_sample(n_rows, seed):
+    """Predictions with gender-dependent, Hb-dependent errors."""
+    rng = np.random.default_rng(seed)
+    genders = rng.choice(['male', 'female'], n_rows)
+    y_pred = rng.uniform(8.0, 17.0, n_rows)
+    scale = np.where(genders == 'male', 0.6, 0.9) * np.where(y_pred < 11.0, 1.5, 1.0)
+    return y_pred + rng.normal(0.0, scale), y_pred, genders
+
+
+def test_intervals_cover_new_samples():
+    calibration = build_calibration(*_residual_sample(3_000, seed=0))
+    y_true, y_pred, genders = _residual_sample(20_000, seed=1)
+    
+    for coverage in calibration['levels']:
+        bounds = np.array([prediction_interval(calibration, p, g, coverage)
+                           for p, g in zip(y_pred, genders)])
+        covered = (bounds[:, 0] <= y_true) & (y_true <= bounds[:, 1])
+        # Guaranteed >= coverage in expectation; 1.5% slack for sampling noise
+        assert covered.mean() >= coverage - 0.015
+
+
+def test_too_few_rows_give_unbounded_interval():
+    y_true, y_pred, _ = _residual_sample(5, seed=2)
+    calibration = build_calibration(y_true, y_pred)
+    
+    assert prediction_interval(calibration, 12.0, coverage=0.95) == (None, None)
@@ -0,0 +1,84 @@
+"""Dataset cache round trip, reuse, rebuild and invalidation."""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from dataset_cache import cache_dir_for, ensure_cache, load_csv
+
+
+def _write_dataset(path, n_rows, seed):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'Gender': rng.choice(['Male', 'Female'], n_rows),
+        'Age': rng.integers(18, 90, n_rows),
+        'MCV': np.round(rng.normal(85.0, 8.0, n_rows), 1),
+        'Hb': np.round(rng.normal(13.0, 2.0, n_rows), 2)
+    })
+    df.to_csv(path, index=False)
+    return df
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / 'lab.csv')
+    source = _write_dataset(path, 1_000, seed=0)
+    
+    df = load_csv(path)
+    
+    assert list(df.columns) == list(source.columns)
+    assert df['Gender'].tolist() == source['Gender'].tolist()
+    np.testing.assert_array_equal(df['Age'].to_numpy(), source['Age'].to_numpy())
+    np.testing.assert_allclose(df['MCV'].to_numpy(), source['MCV'].to_numpy(), rtol=1e-6)
+    # The target is kept bit-identical
+    np.testing.assert_array_equal(df['Hb'].to_numpy(), source['Hb'].to_numpy())
+    assert load_csv(path, columns=['Hb']).columns.tolist() == ['Hb']
+
+
+def test_unchanged_content_reuses_the_cache(tmp_path):
+    path = str(tmp_path / 'lab.csv')
+    _write_dataset(path, 500, seed=1)
+    manifest = ensure_cache(path)
+    
+    # A touched but unchanged file is not reconverted
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    touched = ensure_cache(path)
+    
+    assert touched['data_dir'] == manifest['data_dir']
+    assert touched['source_mtime_ns'] == stat.st_mtime_ns + 10**9
+
+
+def test_changed_content_rebuilds(tmp_path):
+    path = str(tmp_path / 'lab.csv')
+    _write_dataset(path, 500, seed=2)
+    old = ensure_cache(path)
+    
+    source = _write_dataset(path, 600, seed=3)
+    new = ensure_cache(path)
+    
+    assert new['data_dir'] != old['data_dir']
+    assert new['n_rows'] == 600
+    np.testing.assert_array_equal(load_csv(path)['Hb'].to_numpy(), source['Hb'].to_numpy())
+    # The superseded data directory is removed
+    assert sorted(os.listdir(cache_dir_for(path))) == sorted([new['data_dir'], 'manifest.json'])
+
+
+def test_same_size_edit_rebuilds(tmp_path):
+    path = str(tmp_path / 'lab.csv')
+    _write_dataset(path, 500, seed=4)
+    old = ensure_cache(path)
+    
+    # Same size, different content: the checksum decides
+    with open(path, encoding='utf-8') as f:
+        header, first, rest = f.read().split('\n', 2)
+    edited = first[:-1] + ('1' if first[-1] != '1' else '2')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join([header, edited, rest]))
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    
+    new = ensure_cache(path)
+    assert new['source_size'] == old['source_size']
+    assert new['data_dir'] != old['data_dir']
+    assert load_csv(path)['Hb'].iloc[0] == float(edited.split(',')[-1])
@@ -0,0 +1,71 @@
+"""Drift monitor alerts on shifted inputs and stays quiet on stable ones."""
+
+import numpy as np
+
+from drift import DriftMonitor, build_profile
+from utils import encode_gender
+
+FEATURES = ['RBC', 'MCV', 'MCH', 'MCHC']
+
+
+def _samples(n_rows, seed, mcv_shift=0.0):
+    rng = np.random.default_rng(seed)
+    X = np.round(rng.normal([4.5, 85.0 + mcv_shift, 28.0, 33.0], [0.6, 8.0, 3.0, 1.5],
+                            (n_rows, 4)), 1)
+    return X, rng.choice(['male', 'female'], n_rows)
+
+
+def _monitor(window=None):
+    return DriftMonitor(build_profile(*_samples(5_000, seed=0), FEATURES), window)
+
+
+def test_stable_inputs_do_not_alert():
+    monitor = _monitor()
+    X, genders = _samples(3_000, seed=1)
+    
+    assert monitor.update(X, encode_gender(genders)) == []
+    assert monitor.report()['status'] in ('ok', 'warning')
+
+
+def test_shifted_feature_alerts_once():
+    monitor = _monitor()
+    X, genders = _samples(3_000, seed=2, mcv_shift=8.0)
+    
+    alerts = monitor.update(X, encode_gender(genders))
+    assert {alert['feature'] for alert in alerts} == {'MCV'}
+    assert {alert['cohort'] for alert in alerts} == {'all', 'male', 'female'}
+    assert monitor.report()['cohorts']['all']['features']['MCV']['status'] == 'drift'
+    
+    # Already flagged pairs are not reported again
+    assert monitor.update(X, encode_gender(genders)) == []
+
+
+def test_single_samples_match_batch():
+    X, genders = _samples(1_000, seed=3, mcv_shift=8.0)
+    batch, single = _monitor(), _monitor()
+    
+    batch.update(X, encode_gender(genders))
+    alerts = []
+    for row, gender in zip(X, genders):
+        alerts += single.observe(dict(zip(FEATURES, row)), gender)
+    
+    assert {alert['feature'] for alert in alerts} == {'MCV'}
+    for cohort in ('all', 'male', 'female'):
+        expected = batch.report()['cohorts'][cohort]['features']['MCV']
+        result = single.report()['cohorts'][cohort]['features']['MCV']
+        assert result['n'] == expected['n']
+        assert abs(result['psi'] - expected['psi']) < 1e-9
+
+
+def test_non_finite_samples_are_skipped():
+    monitor = _monitor()
+    X, genders = _samples(500, seed=4)
+    X[::10, 0] = np.inf
+    X[5::10, 2] = np.nan
+    
+    monitor.update(X, encode_gender(genders))
+    monitor.observe([np.inf, 85.0, 28.0, 33.0], 'male')
+    
+    report = monitor.report()['cohorts']['all']
+    assert report['n_total'] == 400
+    assert np.isfinite(report['features']['RBC']['mean'])
@@ -0,0 +1,67 @@
+"""Incremental updates match a full refit on all rows."""
+
+import numpy as np
+import pandas as pd
+
+from incremental import STATISTICS_KEY, update_from_csv, update_model
+from scoring import LinearModel
+from sufficient_stats import RegressionStatistics
+
+FEATURES = ['RBC', 'MCV', 'MCH', 'MCHC']
+
+
+def _rows(n_rows, seed):
+    """Lab-like features around realistic offsets, so centering matters."""
+    rng = np.random.default_rng(seed)
+    X = rng.normal([4.5, 85.0, 28.0, 33.0], [0.6, 8.0, 3.0, 1.5], (n_rows, 4))
+    y = X @ [1.2, 0.05, 0.2, 0.3] - 9.0 + rng.normal(0.0, 0.8, n_rows)
+    return X, y
+
+
+def _fitted_model(X, y):
+    stats = RegressionStatistics(X.shape[1])
+    stats.update(X, y)
+    coefficients, intercept = stats.solve()
+    return LinearModel(coefficients, intercept, FEATURES, {STATISTICS_KEY: stats.to_dict()})
+
+
+def _full_refit(X, y):
+    design = np.column_stack([X, np.ones(len(X))])
+    solution = np.linalg.lstsq(design, y, rcond=None)[0]
+    return solution[:-1], solution[-1]
+
+
+def test_update_matches_full_refit():
+    X_old, y_old = _rows(5_000, seed=0)
+    X_new, y_new = _rows(700, seed=1)
+    model = _fitted_model(X_old, y_old)
+    
+    updated = update_model(model, X_new, y_new)
+    coefficients, intercept = _full_refit(np.vstack([X_old, X_new]), np.concatenate([y_old, y_new]))
+    
+    np.testing.assert_allclose(updated.coefficients, coefficients, rtol=0, atol=1e-6)
+    assert abs(updated.intercept - intercept) < 1e-6
+    assert updated.metadata['n_train'] == 5_700
+    assert updated.metadata['n_incremental'] == 700
+    # The input model is not modified
+    assert model.metadata[STATISTICS_KEY]['n'] == 5_000
+
+
+def test_csv_update_matches_array_update(tmp_path):
+    X_old, y_old = _rows(2_000, seed=2)
+    X_new, y_new = _rows(900, seed=3)
+    X_new[::50, 1] = np.nan
+    model = _fitted_model(X_old, y_old)
+    
+    path = tmp_path / 'new.csv'
+    frame = pd.DataFrame(X_new, columns=FEATURES)
+    frame['Hb'] = y_new
+    frame.to_csv(path, index=False)
+    
+    # Small chunks, so the update merges several of them
+    from_csv, counts = update_from_csv(model, [str(path)], chunk_size=128)
+    from_arrays = update_model(model, X_new, y_new)
+    
+    assert counts == {'rows': 900, 'dropped': 18}
+    np.testing.assert_allclose(from_csv.coefficients, from_arrays.coefficients, rtol=0, atol=1e-6)
+    assert abs(from_csv.intercept - from_arrays.intercept) < 1e-6
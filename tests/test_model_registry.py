@@ -0,0 +1,76 @@
+"""Registry publish, activate and rollback, and artifact digest checks."""
+
+import os
+
+import pytest
+
+from model_registry import (
+    ModelHandle, activate, current_model, list_versions, publish, read_pointer
+)
+
+
+def _writer(content):
+    """write_files() callback publishing one compact artifact."""
+    def write_files(directory):
+        with open(os.path.join(directory, 'hemoglobin_model.json'), 'w', encoding='utf-8') as f:
+            f.write(content)
+    return write_files
+
+
+def _read(path):
+    with open(path, encoding='utf-8') as f:
+        return f.read()
+
+
+def test_publish_activate_and_rollback(tmp_path):
+    model_dir = str(tmp_path)
+    first = publish(_writer('first'), model_dir)
+    second = publish(_writer('second'), model_dir)
+    
+    assert list_versions(model_dir) == [first, second]
+    path, pointer = current_model(model_dir)
+    assert pointer['version'] == second
+    assert _read(path) == 'second'
+    
+    # Rolling back is pointing CURRENT at the older version
+    activate(first, model_dir)
+    path, pointer = current_model(model_dir)
+    assert pointer['version'] == first
+    assert _read(path) == 'first'
+    
+    # A version published without make_current does not become current
+    third = publish(_writer('third'), model_dir, make_current=False)
+    assert read_pointer(model_dir)['version'] == first
+    assert list_versions(model_dir) == [first, second, third]
+    
+    with pytest.raises(ValueError):
+        activate('v999999', model_dir)
+
+
+def test_prune_keeps_the_current_version(tmp_path):
+    model_dir = str(tmp_path)
+    first = publish(_writer('first'), model_dir)
+    for content in ('second', 'third', 'fourth'):
+        publish(_writer(content), model_dir, make_current=False, keep=2)
+    
+    versions = list_versions(model_dir)
+    assert first in versions
+    assert len(versions) == 3
+
+
+def test_digest_mismatch_is_rejected(tmp_path):
+    model_dir = str(tmp_path)
+    publish(_writer('first'), model_dir)
+    handle = ModelHandle(_read, model_dir, check_interval=0)
+    assert handle.get() == 'first'
+    
+    second = publish(_writer('second'), model_dir)
+    path, _ = current_model(model_dir)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('tampered')
+    
+    with pytest.raises(ValueError):
+        current_model(model_dir)
+    # The handle keeps serving the model it has
+    assert handle.get() == 'first'
+    assert handle.version != second
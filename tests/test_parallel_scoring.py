@@ -0,0 +1,60 @@
+"""Parallel batch scoring writes the same file as the single-process path."""
+
+import numpy as np
+import pandas as pd
+
+import parallel_scoring
+from drift import DRIFT_KEY, build_profile
+from parallel_scoring import score_csv_parallel
+from predict import score_file
+from scoring import LinearModel
+
+FEATURES = ['RBC', 'MCV', 'MCH', 'MCHC']
+
+
+def _model_data():
+    rng = np.random.default_rng(0)
+    X = np.round(rng.normal([4.5, 85.0, 28.0, 33.0], [0.6, 8.0, 3.0, 1.5], (2_000, 4)), 1)
+    model = LinearModel([1.2, 0.05, 0.2, 0.3], -9.0, FEATURES,
+                        {DRIFT_KEY: build_profile(X, rng.choice(['male', 'female'], 2_000), FEATURES)})
+    return {'model': model, 'feature_columns': FEATURES}
+
+
+def _write_input(path, n_rows, seed):
+    """Lab export with missing, infinite, negative and unknown-gender rows."""
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame(np.round(rng.normal([4.5, 85.0, 28.0, 33.0], [0.6, 8.0, 3.0, 1.5],
+                                          (n_rows, 4)), 1), columns=FEATURES)
+    df.loc[::97, 'MCV'] = np.nan
+    df.loc[5::131, 'MCH'] = np.inf
+    df.loc[7::151, 'RBC'] = -1.0
+    df['Gender'] = rng.choice(['Male', 'Female', 'f', 'unknown'], n_rows)
+    df.to_csv(path, index=False)
+
+
+def test_workers_match_serial_output(tmp_path, monkeypatch):
+    # Split a small file into many ranges
+    monkeypatch.setattr(parallel_scoring, 'MIN_TASK_BYTES', 8 << 10)
+    input_path = str(tmp_path / 'input.csv')
+    _write_input(input_path, 6_000, seed=1)
+    model_data = _model_data()
+    
+    rng = np.random.default_rng(2)
+    reference = (np.round(rng.normal([4.5, 85.0, 28.0, 33.0], [0.6, 8.0, 3.0, 1.5], (3_000, 4)), 1),
+                 rng.normal(13.0, 2.0, 3_000))
+    
+    for ref in (None, reference):
+        serial_path = tmp_path / 'serial.csv'
+        parallel_path = tmp_path / 'parallel.csv'
+        serial = score_file(model_data, input_path, str(serial_path), 500, ref)
+        parallel = score_csv_parallel(model_data, input_path, str(parallel_path), 500, ref,
+                                      workers=4)
+        
+        assert parallel['workers'] == 4
+        assert parallel_path.read_bytes() == serial_path.read_bytes()
+        for key in ('rows', 'unscored', 'out_of_range'):
+            assert parallel[key] == serial[key]
+        serial_mcv = serial['drift']['cohorts']['all']['features']['MCV']
+        parallel_mcv = parallel['drift']['cohorts']['all']['features']['MCV']
+        assert parallel_mcv['n'] == serial_mcv['n']
+        assert abs(parallel_mcv['psi'] - serial_mcv['psi']) < 1e-9
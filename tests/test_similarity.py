@@ -0,0 +1,36 @@
+"""Single-query and batch similarity search agree on tied distances."""
+
+import numpy as np
+import pandas as pd
+
+from similarity import (
+    SIMILARITY_FEATURES, build_index, find_similar_batch, find_similar_samples
+)
+
+
+def _tied_reference(n_rows=2_000, seed=0):
+    """Lab values on a coarse grid, so many rows share a distance."""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'RBC': np.round(rng.uniform(4.0, 4.4, n_rows), 1),
+        'MCV': np.round(rng.uniform(80.0, 80.4, n_rows), 1),
+        'MCH': np.round(rng.uniform(27.0, 27.4, n_rows), 1),
+        'MCHC': np.round(rng.uniform(33.0, 33.4, n_rows), 1),
+        'Hb': rng.uniform(8.0, 16.0, n_rows)
+    })
+
+
+def test_single_query_matches_batch_on_ties():
+    df = _tied_reference()
+    queries = df[SIMILARITY_FEATURES].to_numpy()[:50]
+    index = build_index(df)
+    
+    # Small tiles so the batch merges candidates across several tiles
+    distances, indices = find_similar_batch(df, queries, k=30, tile_bytes=64 << 10)
+    
+    for row, query in enumerate(queries):
+        features = dict(zip(SIMILARITY_FEATURES, query))
+        for tree in (None, index):
+            similar = find_similar_samples(df, features, k=30, index=tree)
+            np.testing.assert_array_equal(similar.index.to_numpy(), indices[row])
+            np.testing.assert_array_equal(similar['_distance'].to_numpy(), distances[row])
@@ -0,0 +1,65 @@
+"""Vectorized validation agrees with the rules checked cell by cell."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from validation import RULE_MISSING, RULE_NEGATIVE, RULE_RANGE, VALID_RANGES, validate
+
+COLUMNS = ['RBC', 'MCV', 'MCH', 'MCHC']
+
+
+def _expected_rule(column, value):
+    """The rule a single value breaks, or None."""
+    if np.isnan(value):
+        return RULE_MISSING
+    if value < 0:
+        return RULE_NEGATIVE
+    low, high = VALID_RANGES[column]
+    if value < low or value > high:
+        return RULE_RANGE
+    return None
+
+
+def test_masks_match_cell_by_cell_rules():
+    rng = np.random.default_rng(0)
+    values = rng.normal([4.5, 85.0, 28.0, 33.0], [3.0, 40.0, 15.0, 10.0], (2_000, 4))
+    values[rng.random(values.shape) < 0.02] = np.nan
+    values[5] = [-1.0, 130.0, np.nan, 33.0]
+    
+    report = validate(pd.DataFrame(values, columns=COLUMNS), COLUMNS)
+    
+    for rule in (RULE_MISSING, RULE_NEGATIVE, RULE_RANGE):
+        expected = np.array([[_expected_rule(col, v) == rule for col, v in zip(COLUMNS, row)]
+                             for row in values])
+        np.testing.assert_array_equal(report.masks[rule], expected)
+    assert not report.ok
+    assert report.counts()['RBC'][RULE_NEGATIVE] == int((values[:, 0] < 0).sum())
+    # A negative value is not also reported as out of range
+    assert [v['rule'] for v in report.violations() if v['row'] == 5] == [RULE_NEGATIVE, RULE_RANGE]
+
+
+def test_input_forms_agree():
+    row = {'RBC': 4.5, 'MCV': 130.0, 'MCH': 27.0, 'MCHC': 33.0}
+    reports = [
+        validate(row, COLUMNS),
+        validate(pd.DataFrame([row]), COLUMNS),
+        validate(np.array([[row[col] for col in COLUMNS]]), COLUMNS)
+    ]
+    for report in reports:
+        assert report.ok
+        assert report.violations() == reports[0].violations()
+        assert report.violations()[0]['column'] == 'MCV'
+
+
+def test_missing_columns_and_strict_errors():
+    report = validate({'RBC': 4.5, 'MCV': 85.0}, COLUMNS)
+    assert report.missing_columns == ['MCH', 'MCHC']
+    with pytest.raises(ValueError, match='Missing required columns'):
+        report.raise_for_errors()
+    
+    report = validate({'RBC': 4.5, 'MCV': np.inf, 'MCH': np.nan, 'MCHC': 33.0}, COLUMNS)
+    # Non-finite values only fail single-sample (strict) validation
+    report.raise_for_errors()
+    with pytest.raises(ValueError, match='MCV must be a finite number'):
+        report.raise_for_errors(strict=True)
@@ -2,7 +2,9 @@
 Hemoglobin Regression Model Training
 
 This script trains a Linear Regression model to predict Hemoglobin (Hb)
-from blood parameters and saves it using joblib.
+from blood parameters and saves it using joblib. A compact JSON artifact
+(coefficients, intercept, feature order, training statistics) is written
+next to it for scikit-learn-free scoring (see scoring.py).
 
 Features used: RBC, MCV, MCH, MCHC
 Target: Hb (Hemoglobin)
@@ -11,32 +13,85 @@ Dataset: data/anemia_new.csv
 
 Usage:
     python train.py
+    python train.py --startup-profile
+    python train.py --metrics metrics/pipeline.json
+    python train.py --shards "data/monthly/*.csv" --chunk-size 1000000 --workers 8
+    python train.py --select --folds 5 --repeats 3
+    python train.py --update data/new_measurements.csv
+
+Heavy libraries (pandas, scikit-learn, joblib) are imported inside the
+functions that use them, so argument errors and a missing data file are
+reported without loading them.
+
+--metrics FILE (or PIPELINE_METRICS_FILE) records how long each training
+stage takes into a latency snapshot file (see metrics.py).
+
+--shards trains out-of-core: each CSV shard is streamed in chunks by its
+own worker process and reduced to least-squares sufficient statistics,
+which are merged and solved once (see sufficient_stats.py). Memory use
+does not grow with the data size.
+
+--select compares candidate models and feature subsets with repeated
+k-fold cross-validation in parallel and prints a leaderboard; it does not
+save a model (see cv_selection.py).
+
+--update folds new labeled rows into the saved model in O(new rows) using
+the least-squares sufficient statistics stored in the compact artifact,
+and publishes the result as a new model version (see incremental.py).
+
+Training on the default dataset also calibrates prediction intervals:
+the held-out test residuals are summarized per cohort and predicted-Hb
+bin (split conformal, see calibration.py) and stored in the compact
+artifact, so consumers get intervals and anemia probabilities without
+loading a dataset. Sharded training does not calibrate, and --update
+drops the calibration of the model it updates.
+
+It also profiles the training features per cohort (moments, quantiles
+and bin fractions, see drift.py) and stores the profile in the artifact,
+so the scoring paths can flag inputs that drift away from what the model
+was trained on. Sharded training does not profile either.
 """
 
 import os
-import pandas as pd
-import numpy as np
-from sklearn.model_selection import train_test_split
-from sklearn.linear_model import LinearRegression
-from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
-import joblib
+import sys
+import argparse
+from datetime import datetime, timezone
+from calibration import CALIBRATION_KEY, build_calibration
+from drift import DRIFT_KEY, build_profile
+from metrics import stage, configure as configure_metrics, flush as flush_metrics
 
 
 # Constants
 DATA_FILE = 'data/anemia_new.csv'
 FEATURE_COLUMNS = ['RBC', 'MCV', 'MCH', 'MCHC']
 TARGET_COLUMN = 'Hb'
+GENDER_COLUMN = 'Gender'  # only groups calibration residuals and drift profiles
 MODEL_FILENAME = 'hemoglobin_model.pkl'
+COMPACT_MODEL_FILENAME = 'hemoglobin_model.json'
 TEST_SIZE = 0.2
 RANDOM_STATE = 42
+SHARD_CHUNK_SIZE = 500_000  # rows per chunk in sharded (out-of-core) training
+
+# Model selection defaults (names must match cv_selection.FEATURE_SETS)
+SELECTION_FOLDS = 5
+SELECTION_REPEATS = 3
+SELECTION_MODELS = ('ols', 'ridge', 'lasso')
+SELECTION_ALPHAS = (0.001, 0.01, 0.1, 1.0, 10.0)
+SELECTION_FEATURE_SETS = ('base', 'base+PCV', 'base+Age', 'base+PCV+Age')
 
 
 def load_data(filepath):
-    """Load the dataset from CSV file."""
+    """
+    Load the dataset from CSV file.
+    
+    The CSV is converted once into a memory-mapped binary cache and
+    reloaded from it while the file is unchanged (see dataset_cache.py).
+    """
     if not os.path.exists(filepath):
         raise FileNotFoundError(f"Data file not found: {filepath}")
     
-    df = pd.read_csv(filepath)
+    from dataset_cache import load_csv
+    df = load_csv(filepath)
     print(f"Dataset loaded: {len(df)} rows")
     return df
 
@@ -57,18 +112,17 @@ def check_missing_values(df):
 
 
 def validate_data(df):
-    """Validate that required columns exist and values are reasonable."""
-    # Check required columns
-    required_columns = FEATURE_COLUMNS + [TARGET_COLUMN]
-    missing_cols = [col for col in required_columns if col not in df.columns]
+    """Validate that required columns exist and values are reasonable (see validation.py)."""
+    from validation import RULE_NEGATIVE, validate
     
-    if missing_cols:
-        raise ValueError(f"Missing required columns: {missing_cols}")
+    report = validate(df, FEATURE_COLUMNS + [TARGET_COLUMN])
+    if report.missing_columns:
+        raise ValueError(f"Missing required columns: {report.missing_columns}")
     
-    # Check for negative values in features
-    for col in FEATURE_COLUMNS + [TARGET_COLUMN]:
-        if (df[col] < 0).any():
-            print(f"WARNING: Negative values found in {col}")
+    # Negative values are reported, the rows are still used
+    for col, counts in report.counts().items():
+        if counts[RULE_NEGATIVE]:
+            print(f"WARNING: Negative values found in {col} ({counts[RULE_NEGATIVE]} rows)")
     
     print("Data validation passed.")
 
@@ -83,8 +137,9 @@ def prepare_features(df):
     Note: Gender is NOT used as a feature.
           It is only used for clinical decision logic.
     """
-    X = df[FEATURE_COLUMNS].values
-    y = df[TARGET_COLUMN].values
+    # float64 for fitting (cached feature columns are stored as float32)
+    X = df[FEATURE_COLUMNS].to_numpy(dtype=float)
+    y = df[TARGET_COLUMN].to_numpy(dtype=float)
     
     print(f"Features: {FEATURE_COLUMNS}")
     print(f"Target: {TARGET_COLUMN}")
@@ -94,6 +149,8 @@ def prepare_features(df):
 
 def train_model(X_train, y_train):
     """Train a Linear Regression model (no scaling applied)."""
+    from sklearn.linear_model import LinearRegression
+    
     model = LinearRegression()
     model.fit(X_train, y_train)
     return model
@@ -108,6 +165,9 @@ def evaluate_model(model, X_test, y_test):
         - RMSE: Root Mean Squared Error
         - R2: Coefficient of Determination
     """
+    import numpy as np
+    from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+    
     y_pred = model.predict(X_test)
     
     mae = mean_absolute_error(y_test, y_pred)
@@ -122,29 +182,404 @@ def evaluate_model(model, X_test, y_test):
     }
 
 
-def save_model(model, model_dir='model'):
+def print_calibration(calibration):
+    """Print the calibrated interval half widths (all test rows pooled)."""
+    print()
+    print("-" * 60)
+    print(f"  PREDICTION INTERVALS (split conformal, {calibration['n_calibration']} test rows)")
+    print("-" * 60)
+    for level, half_width in zip(calibration['levels'], calibration['pooled']['half_widths']):
+        width = f"+/-{half_width:.2f} g/dL" if half_width is not None else "unbounded (too few rows)"
+        print(f"  {level:.0%} coverage: {width}")
+    groups = [f"{cohort}: {sum(cell is not None for cell in group['bins'])} bins"
+              for cohort, group in calibration['groups'].items()]
+    if groups:
+        print(f"  Calibrated groups: {', '.join(groups)}")
+    print("-" * 60)
+
+
+def training_statistics(X_train, y_train, metrics):
+    """
+    Summarize the training run for the compact model artifact.
+    
+    Includes sample counts, test metrics and per-feature mean/std of the
+    training data.
+    """
+    import sklearn
+    from sufficient_stats import RegressionStatistics
+    
+    train_stats = RegressionStatistics(X_train.shape[1])
+    train_stats.update(X_train, y_train)
+    
+    return {
+        'trained_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'sklearn_version': sklearn.__version__,
+        'update_count': 0,
+        'n_train': int(len(X_train)),
+        'n_test': int(metrics['n_samples']),
+        'test_metrics': {name: float(metrics[name]) for name in ('MAE', 'RMSE', 'R2')},
+        'feature_mean': dict(zip(FEATURE_COLUMNS, map(float, X_train.mean(axis=0)))),
+        'feature_std': dict(zip(FEATURE_COLUMNS, map(float, X_train.std(axis=0)))),
+        'target_mean': float(y_train.mean()),
+        'target_std': float(y_train.std()),
+        'sufficient_statistics': train_stats.to_dict()
+    }
+
+
+def save_model(model, model_dir='model', metadata=None):
     """
-    Save the trained model and metadata using joblib.
+    Save the trained model and metadata as a new model registry version.
     
     Saved data includes:
         - model: Trained LinearRegression model
         - feature_columns: List of feature names used
+    
+    The version holds the joblib file and the compact JSON artifact
+    (coefficients, intercept, feature order and the given metadata). It
+    becomes current only after both files are complete, so running
+    consumers never load a partial model (see model_registry.py).
+    
+    Returns:
+        str: The new version name
     """
-    os.makedirs(model_dir, exist_ok=True)
+    import joblib
+    from model_registry import publish, registry_dir
+    from scoring import LinearModel, save_artifact
     
     model_data = {
         'model': model,
         'feature_columns': FEATURE_COLUMNS
     }
     
-    filepath = os.path.join(model_dir, MODEL_FILENAME)
-    joblib.dump(model_data, filepath)
+    def write_files(directory):
+        joblib.dump(model_data, os.path.join(directory, MODEL_FILENAME))
+        save_artifact(LinearModel.from_estimator(model, FEATURE_COLUMNS, metadata),
+                      os.path.join(directory, COMPACT_MODEL_FILENAME))
+    
+    version = publish(write_files, model_dir)
+    version_dir = os.path.join(registry_dir(model_dir), version)
+    
+    print(f"Model saved: {os.path.join(version_dir, MODEL_FILENAME)}")
+    print(f"Compact model saved: {os.path.join(version_dir, COMPACT_MODEL_FILENAME)}")
+    print(f"Current model version: {version}")
+    return version
+
+
+def expand_shards(patterns):
+    """Expand glob patterns (PowerShell passes them through unexpanded)."""
+    import glob
+    
+    paths = []
+    for pattern in patterns:
+        # Unmatched patterns are kept so the missing file is reported by name
+        paths.extend(sorted(glob.glob(pattern)) or [pattern])
+    return paths
+
+
+def estimator_from_coefficients(coefficients, intercept):
+    """Build a fitted LinearRegression from a solved coefficient vector."""
+    import numpy as np
+    from sklearn.linear_model import LinearRegression
+    
+    model = LinearRegression()
+    model.coef_ = np.asarray(coefficients, dtype=float)
+    model.intercept_ = np.float64(intercept)
+    model.n_features_in_ = len(model.coef_)
+    return model
+
+
+def sharded_statistics(train_stats, metrics, shard_paths):
+    """
+    Summarize a sharded training run for the compact model artifact.
+    
+    Same fields as training_statistics(), computed from the merged
+    sufficient statistics instead of an in-memory training matrix.
+    """
+    import sklearn
+    
+    return {
+        'trained_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'sklearn_version': sklearn.__version__,
+        'training_mode': 'sharded',
+        'update_count': 0,
+        'shards': [os.path.basename(path) for path in shard_paths],
+        'n_train': int(train_stats.n),
+        'n_test': int(metrics['n_samples']),
+        'test_metrics': {name: float(metrics[name]) for name in ('MAE', 'RMSE', 'R2')},
+        'feature_mean': dict(zip(FEATURE_COLUMNS, map(float, train_stats.mean_x))),
+        'feature_std': dict(zip(FEATURE_COLUMNS, map(float, train_stats.feature_std()))),
+        'target_mean': float(train_stats.mean_y),
+        'target_std': train_stats.target_std(),
+        'sufficient_statistics': train_stats.to_dict()
+    }
+
+
+def run_sharded(patterns, chunk_size, workers):
+    """Out-of-core training pipeline over one or more CSV shards."""
+    from sufficient_stats import fit_shards
+    
+    paths = expand_shards(patterns)
+    
+    print()
+    print("=" * 60)
+    print("  HEMOGLOBIN REGRESSION MODEL TRAINING (SHARDED)")
+    print("=" * 60)
+    print()
+    print(f"Shards: {len(paths)}, chunk size: {chunk_size:,} rows")
+    print(f"Features: {FEATURE_COLUMNS}")
+    print(f"Target: {TARGET_COLUMN}")
+    print()
+    print("Accumulating sufficient statistics...")
+    
+    with stage('train.sharded_fit'):
+        result = fit_shards(
+            paths, FEATURE_COLUMNS, TARGET_COLUMN, chunk_size=chunk_size,
+            test_size=TEST_SIZE, random_state=RANDOM_STATE, workers=workers
+        )
+    
+    for path, shard in zip(paths, result['shards']):
+        print(f"  {path}: {shard['rows']:,} rows ({shard['dropped']:,} incomplete)")
+        for col, count in shard['negative'].items():
+            if count:
+                print(f"    WARNING: {count:,} negative values in {col}")
+    
+    metrics = result['metrics']
+    print()
+    print(f"Training set: {result['train'].n:,} samples")
+    print(f"Test set: {metrics['n_samples']:,} samples")
+    
+    print()
+    print("-" * 60)
+    print("  MODEL PERFORMANCE (Test Set)")
+    print("-" * 60)
+    print(f"  MAE:  {metrics['MAE']:.4f} g/dL")
+    print(f"  RMSE: {metrics['RMSE']:.4f} g/dL")
+    print(f"  R2:   {metrics['R2']:.4f}")
+    print("-" * 60)
+    
+    print()
+    model = estimator_from_coefficients(result['coefficients'], result['intercept'])
+    with stage('train.model_save'):
+        save_model(model, metadata=sharded_statistics(result['train'], metrics, paths))
+
+
+def training_split_statistics(model):
+    """
+    Rebuild the sufficient statistics of a model saved before they were stored.
+    
+    Replays the train/test split of the default dataset and checks that
+    the statistics reproduce the model's coefficients.
+    
+    Raises:
+        FileNotFoundError: If the dataset doesn't exist
+        ValueError: If the dataset no longer reproduces the model
+    """
+    import numpy as np
+    from sklearn.model_selection import train_test_split
+    from sufficient_stats import RegressionStatistics
+    
+    df = load_data(DATA_FILE).dropna(subset=FEATURE_COLUMNS + [TARGET_COLUMN])
+    X = df[FEATURE_COLUMNS].to_numpy(dtype=float)
+    y = df[TARGET_COLUMN].to_numpy(dtype=float)
+    X_train, _, y_train, _ = train_test_split(
+        X, y, test_size=TEST_SIZE, random_state=RANDOM_STATE
+    )
+    
+    stats = RegressionStatistics(len(FEATURE_COLUMNS))
+    stats.update(X_train, y_train)
+    
+    # Cached float32 features shift the solution by ~1e-6 at most
+    coefficients, intercept = stats.solve()
+    if not (np.allclose(coefficients, model.coefficients, rtol=1e-4, atol=1e-6)
+            and np.isclose(intercept, model.intercept, rtol=1e-4, atol=1e-4)):
+        raise ValueError(
+            f"{DATA_FILE} does not reproduce the saved model; "
+            "retrain with 'python train.py' before updating"
+        )
+    return stats
+
+
+def run_update(patterns, chunk_size, model_dir='model'):
+    """Incremental update pipeline: fold new rows into the saved model."""
+    import incremental
+    from model_registry import active_model_path
+    from scoring import load_artifact
+    
+    compact_path = active_model_path(model_dir)
+    if compact_path is None or not compact_path.endswith('.json'):
+        raise FileNotFoundError(
+            f"Compact model file not found in {model_dir}\n"
+            "Please run 'python train.py' first to train the model."
+        )
+    
+    print()
+    print("=" * 60)
+    print("  HEMOGLOBIN REGRESSION MODEL UPDATE")
+    print("=" * 60)
+    print()
+    
+    model = load_artifact(compact_path)
+    stats = incremental.model_statistics(model)
+    if stats is None:
+        print(f"Model has no stored statistics; rebuilding them from {DATA_FILE}...")
+        stats = training_split_statistics(model)
+    
+    print(f"Current model: {compact_path}, {stats.n:,} training samples")
+    
+    paths = expand_shards(patterns)
+    with stage('train.incremental_update'):
+        updated, counts = incremental.update_from_csv(
+            model, paths, TARGET_COLUMN, stats=stats, chunk_size=chunk_size
+        )
+    
+    update = updated.metadata['last_update']
+    print(f"New rows: {counts['rows']:,} ({counts['dropped']:,} incomplete, skipped)")
+    
+    print()
+    print("-" * 60)
+    print("  CURRENT MODEL ON NEW ROWS (before update)")
+    print("-" * 60)
+    print(f"  MAE:  {update['prequential_MAE']:.4f} g/dL")
+    print(f"  RMSE: {update['prequential_RMSE']:.4f} g/dL")
+    print("-" * 60)
+    
+    print()
+    print(f"Updated model: {updated.metadata['n_train']:,} training samples "
+          f"({updated.metadata['n_incremental']:,} added incrementally)")
+    if CALIBRATION_KEY in model.metadata:
+        print("Calibrated prediction intervals removed (they describe the previous "
+              "coefficients); retrain with 'python train.py' to recalibrate.")
+    print()
+    with stage('train.model_save'):
+        save_model(
+            estimator_from_coefficients(updated.coefficients, updated.intercept),
+            model_dir=model_dir, metadata=updated.metadata
+        )
+
+
+def run_selection(args):
+    """Model selection pipeline: cross-validate candidates and print a leaderboard."""
+    import cv_selection
     
-    print(f"Model saved: {filepath}")
+    print()
+    print("=" * 60)
+    print("  HEMOGLOBIN REGRESSION MODEL SELECTION")
+    print("=" * 60)
+    print()
+    
+    df = load_data(DATA_FILE)
+    candidates = cv_selection.build_candidates(args.feature_sets, args.models, args.alphas)
+    print(f"Candidates: {len(candidates)}, "
+          f"{args.repeats} x {args.folds}-fold cross-validation")
+    print()
+    
+    with stage('train.model_selection'):
+        result = cv_selection.run_selection(
+            df, TARGET_COLUMN, candidates, n_folds=args.folds,
+            n_repeats=args.repeats, random_state=RANDOM_STATE, workers=args.workers
+        )
+    cv_selection.print_leaderboard(result)
 
 
-def main():
+def parse_args(argv=None):
+    """Parse command-line arguments."""
+    parser = argparse.ArgumentParser(description="Hemoglobin regression model training")
+    parser.add_argument('--startup-profile', action='store_true',
+                        help="Report import-time cost of this invocation and exit")
+    parser.add_argument('--metrics', metavar='FILE',
+                        help="Record per-stage latency into this snapshot file")
+    
+    sharded = parser.add_argument_group("out-of-core training")
+    sharded.add_argument('--shards', nargs='+', metavar='CSV',
+                         help="CSV files or glob patterns to train on instead of the default dataset")
+    sharded.add_argument('--chunk-size', type=int, default=SHARD_CHUNK_SIZE,
+                         help=f"Rows read at a time per worker (default: {SHARD_CHUNK_SIZE})")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Worker processes for --shards and --select (default: CPU count)")
+    
+    updating = parser.add_argument_group("incremental update")
+    updating.add_argument('--update', nargs='+', metavar='CSV',
+                          help="Fold the labeled rows of these CSV files into the saved model")
+    
+    selection = parser.add_argument_group("model selection")
+    selection.add_argument('--select', action='store_true',
+                           help="Cross-validate candidate models and print a leaderboard")
+    selection.add_argument('--folds', type=int, default=SELECTION_FOLDS,
+                           help=f"Folds per repeat (default: {SELECTION_FOLDS})")
+    selection.add_argument('--repeats', type=int, default=SELECTION_REPEATS,
+                           help=f"Cross-validation repeats (default: {SELECTION_REPEATS})")
+    selection.add_argument('--models', nargs='+', default=list(SELECTION_MODELS),
+                           choices=SELECTION_MODELS, help="Model types to compare")
+    selection.add_argument('--alphas', nargs='+', type=float, default=list(SELECTION_ALPHAS),
+                           help="Ridge/lasso penalty grid")
+    selection.add_argument('--feature-sets', nargs='+', default=list(SELECTION_FEATURE_SETS),
+                           choices=SELECTION_FEATURE_SETS, help="Feature subsets to compare")
+    args = parser.parse_args(argv)
+    
+    if sum(map(bool, (args.shards, args.select, args.update))) > 1:
+        parser.error("--shards, --select and --update cannot be combined")
+    if args.folds < 2:
+        parser.error("--folds must be at least 2")
+    if args.repeats <= 0:
+        parser.error("--repeats must be positive")
+    if any(alpha <= 0 for alpha in args.alphas):
+        parser.error("--alphas must be positive")
+    if args.chunk_size <= 0:
+        parser.error("--chunk-size must be positive")
+    if args.workers is not None and args.workers <= 0:
+        parser.error("--workers must be positive")
+    
+    return args
+
+
+def main(argv=None):
     """Main training pipeline."""
+    args = parse_args(argv)
+    
+    if args.startup_profile:
+        from startup import run_startup_profile, strip_flag
+        run_startup_profile(__file__, strip_flag(sys.argv[1:] if argv is None else argv))
+        return
+    
+    if args.metrics:
+        configure_metrics(args.metrics)
+    
+    if args.select:
+        try:
+            run_selection(args)
+        except (FileNotFoundError, ValueError) as e:
+            print(f"ERROR: {e}")
+            sys.exit(1)
+        flush_metrics()
+        return
+    
+    if args.update:
+        try:
+            run_update(args.update, args.chunk_size)
+        except (FileNotFoundError, ValueError) as e:
+            print(f"ERROR: {e}")
+            sys.exit(1)
+        flush_metrics()
+        
+        print()
+        print("Update completed successfully!")
+        print()
+        return
+    
+    if args.shards:
+        try:
+            run_sharded(args.shards, args.chunk_size, args.workers)
+        except (FileNotFoundError, ValueError) as e:
+            print(f"ERROR: {e}")
+            sys.exit(1)
+        flush_metrics()
+        
+        print()
+        print("Training completed successfully!")
+        print("To make predictions, run: python predict.py")
+        print()
+        return
+    
     print()
     print("=" * 60)
     print("  HEMOGLOBIN REGRESSION MODEL TRAINING")
@@ -152,25 +587,34 @@ def main():
     print()
     
     # 1. Load data
-    df = load_data(DATA_FILE)
+    with stage('train.data_load'):
+        df = load_data(DATA_FILE)
     
     # 2. Validate data
-    validate_data(df)
+    with stage('train.validation'):
+        validate_data(df)
     
     # 3. Check for missing values
-    has_missing = check_missing_values(df)
-    if has_missing:
-        print("Dropping rows with missing values...")
-        df = df.dropna(subset=FEATURE_COLUMNS + [TARGET_COLUMN])
-        print(f"Remaining rows: {len(df)}")
+    with stage('train.missing_values'):
+        has_missing = check_missing_values(df)
+        if has_missing:
+            print("Dropping rows with missing values...")
+            df = df.dropna(subset=FEATURE_COLUMNS + [TARGET_COLUMN])
+            print(f"Remaining rows: {len(df)}")
     
     # 4. Prepare features (Gender NOT included)
-    X, y = prepare_features(df)
+    with stage('train.feature_prep'):
+        X, y = prepare_features(df)
     
-    # 5. Train/Test split
-    X_train, X_test, y_train, y_test = train_test_split(
-        X, y, test_size=TEST_SIZE, random_state=RANDOM_STATE
-    )
+    # 5. Train/Test split (genders follow the same split; they only
+    # group the calibration residuals and the drift profile)
+    from sklearn.model_selection import train_test_split
+    with stage('train.split'):
+        genders = (df[GENDER_COLUMN].to_numpy(dtype=object) if GENDER_COLUMN in df.columns
+                   else [None] * len(df))
+        X_train, X_test, y_train, y_test, genders_train, genders_test = train_test_split(
+            X, y, genders, test_size=TEST_SIZE, random_state=RANDOM_STATE
+        )
     print()
     print(f"Training set: {len(X_train)} samples")
     print(f"Test set: {len(X_test)} samples")
@@ -178,11 +622,13 @@ def main():
     # 6. Train model
     print()
     print("Training Linear Regression model...")
-    model = train_model(X_train, y_train)
+    with stage('train.fit'):
+        model = train_model(X_train, y_train)
     print("Training complete.")
     
     # 7. Evaluate model (regression metrics only)
-    metrics = evaluate_model(model, X_test, y_test)
+    with stage('train.evaluation'):
+        metrics = evaluate_model(model, X_test, y_test)
     
     print()
     print("-" * 60)
@@ -193,9 +639,19 @@ def main():
     print(f"  R2:   {metrics['R2']:.4f}")
     print("-" * 60)
     
-    # 8. Save model
+    # 8. Calibrate prediction intervals on the held-out test residuals
+    with stage('train.calibration'):
+        calibration = build_calibration(y_test, model.predict(X_test), genders_test)
+    print_calibration(calibration)
+    
+    # 9. Save model
     print()
-    save_model(model)
+    with stage('train.model_save'):
+        metadata = training_statistics(X_train, y_train, metrics)
+        metadata[CALIBRATION_KEY] = calibration
+        metadata[DRIFT_KEY] = build_profile(X_train, genders_train, FEATURE_COLUMNS)
+        save_model(model, metadata=metadata)
+    flush_metrics()
     
     print()
     print("Training completed successfully!")
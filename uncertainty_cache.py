@@ -0,0 +1,250 @@
+"""
+Uncertainty Result Cache
+
+CBC analyzers report values on coarse grids (RBC to 0.01, MCV/MCH/MCHC
+to 0.1), so the same feature vectors are scored again and again. This
+module memoizes kNN search results keyed on the quantized feature
+vector, the number of neighbors and the reference dataset version.
+Neighbors do not depend on the model, so a retrained model reuses them.
+
+A cached value must only depend on its key: callers search neighbors
+of the quantized features and cache their Hb values, then summarize
+them against the prediction of the raw input on every call (the
+summary's MAE and within-1 share depend on that prediction).
+
+Two tiers:
+    1. In-process LRU with a fixed entry limit
+    2. Optional SQLite file that several app workers can share, capped
+       at max_disk_entries (the oldest stored entries are evicted)
+
+Usage:
+    cache = UncertaintyCache(max_entries=10000, db_path='cache.sqlite')
+    key = cache.make_key(features, dataset_version, k)
+    result = cache.get_or_compute(key, compute_fn)
+"""
+
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+
+
+# Analyzer reporting resolution per feature
+QUANTIZATION_STEPS = {
+    'RBC': 0.01,   # million cells/mcL
+    'MCV': 0.1,    # fL
+    'MCH': 0.1,    # pg
+    'MCHC': 0.1    # g/dL
+}
+
+DEFAULT_MAX_ENTRIES = 10_000
+DEFAULT_MAX_DISK_ENTRIES = 100_000
+DISK_EVICTION_INTERVAL = 100  # puts between eviction passes on the SQLite tier
+SQLITE_TIMEOUT = 5.0  # seconds to wait for a lock held by another worker
+
+
+def quantize_features(features):
+    """
+    Snap feature values to the analyzer reporting grid.
+    
+    Args:
+        features (dict): Feature name -> value
+    
+    Returns:
+        dict: Same keys, values rounded to QUANTIZATION_STEPS
+    """
+    quantized = {}
+    for name, value in features.items():
+        step = QUANTIZATION_STEPS.get(name)
+        if step is None:
+            quantized[name] = float(value)
+        else:
+            quantized[name] = round(round(float(value) / step) * step, 6)
+    return quantized
+
+
+def _to_builtin(value):
+    """Convert NumPy scalars to plain Python numbers for JSON storage."""
+    if hasattr(value, 'item'):
+        return value.item()
+    return value
+
+
+class UncertaintyCache:
+    """
+    Two-tier memo cache for neighbor search results.
+    
+    All methods are thread-safe; Streamlit serves sessions from threads.
+    """
+    
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, db_path=None,
+                 max_disk_entries=DEFAULT_MAX_DISK_ENTRIES):
+        """
+        Args:
+            max_entries (int): In-process LRU size limit
+            db_path (str): Optional SQLite file for the shared tier
+            max_disk_entries (int): SQLite tier size limit; it may exceed
+                the limit by up to DISK_EVICTION_INTERVAL entries between
+                eviction passes
+        """
+        if max_entries <= 0:
+            raise ValueError(f"max_entries must be positive: {max_entries}")
+        if max_disk_entries <= 0:
+            raise ValueError(f"max_disk_entries must be positive: {max_disk_entries}")
+        
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self.db_path = db_path
+        
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_evictions = 0
+        self._disk_puts = 0
+        
+        if db_path is not None:
+            self._conn = sqlite3.connect(db_path, timeout=SQLITE_TIMEOUT,
+                                         check_same_thread=False)
+            # WAL lets readers in other workers proceed during a write
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            # Separate from the former 'uncertainty' table, whose values
+            # were summaries tied to one prediction
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS neighbors ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, stored_at REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS neighbors_stored_at ON neighbors (stored_at)"
+            )
+            self._conn.commit()
+    
+    @staticmethod
+    def make_key(features, dataset_version, k):
+        """
+        Build a cache key from the quantized feature vector and dataset version.
+        
+        Args:
+            features (dict): Feature name -> value
+            dataset_version (str): Identifier of the reference dataset
+            k (int): Number of neighbors
+        
+        Returns:
+            str: Cache key
+        """
+        quantized = quantize_features(features)
+        vector = ",".join(f"{name}={quantized[name]!r}" for name in sorted(quantized))
+        return f"{dataset_version}|k={k}|{vector}"
+    
+    def get(self, key):
+        """Return the cached result for key, or None on a miss."""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+                return self._entries[key]
+            
+            if self._conn is not None:
+                row = self._conn.execute(
+                    "SELECT value FROM neighbors WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    value = json.loads(row[0])
+                    self._remember(key, value)
+                    self.disk_hits += 1
+                    return value
+            
+            self.misses += 1
+            return None
+    
+    def put(self, key, value):
+        """Store a result dict in both tiers."""
+        value = {name: _to_builtin(v) for name, v in value.items()}
+        
+        with self._lock:
+            self._remember(key, value)
+            
+            if self._conn is not None:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO neighbors (key, value, stored_at) VALUES (?, ?, ?)",
+                    (key, json.dumps(value), time.time())
+                )
+                self._disk_puts += 1
+                if self._disk_puts % DISK_EVICTION_INTERVAL == 0:
+                    self._evict_disk()
+                self._conn.commit()
+        
+        return value
+    
+    def _evict_disk(self):
+        """Delete the oldest stored SQLite entries beyond max_disk_entries."""
+        cursor = self._conn.execute(
+            "DELETE FROM neighbors WHERE key IN ("
+            "SELECT key FROM neighbors ORDER BY stored_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_disk_entries,)
+        )
+        self.disk_evictions += max(cursor.rowcount, 0)
+    
+    def get_or_compute(self, key, compute):
+        """
+        Return the cached result for key, computing and storing it on a miss.
+        
+        Args:
+            key (str): Key from make_key()
+            compute (callable): Zero-argument function returning a result dict
+                that only depends on the key
+        """
+        value = self.get(key)
+        if value is None:
+            value = self.put(key, compute())
+        return value
+    
+    def _remember(self, key, value):
+        """Insert into the LRU tier, evicting the oldest entry if full."""
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+    
+    def stats(self):
+        """
+        Get hit/miss counters.
+        
+        Returns:
+            dict: Counters, current LRU size and overall hit rate
+        """
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            hits = self.memory_hits + self.disk_hits
+            return {
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'disk_evictions': self.disk_evictions,
+                'entries': len(self._entries),
+                'hit_rate': hits / lookups if lookups else 0.0
+            }
+    
+    def clear(self):
+        """Drop all entries from both tiers and reset counters."""
+        with self._lock:
+            self._entries.clear()
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM neighbors")
+                self._conn.commit()
+            self.memory_hits = self.disk_hits = self.misses = self.evictions = 0
+            self.disk_evictions = 0
+    
+    def close(self):
+        """Close the SQLite connection, if any."""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
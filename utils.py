@@ -9,6 +9,13 @@ WHO Threshold Values:
     - Female (f): Hemoglobin < 12 g/dL → Anemia
 
 Gender input format: "male" or "female" (string, case-insensitive)
+
+The rules are stored in a compiled threshold table indexed by cohort code.
+Array functions (encode_gender, threshold_lookup, anemia_status_codes)
+evaluate whole NumPy arrays or pandas Series in one vectorized pass; the
+scalar functions below use the same table for single values. NumPy is
+only imported when an array function is first called, so scalar callers
+stay cheap to start.
 """
 
 
@@ -16,6 +23,165 @@ Gender input format: "male" or "female" (string, case-insensitive)
 THRESHOLD_MALE = 13.0    # g/dL
 THRESHOLD_FEMALE = 12.0  # g/dL
 
+# Status codes returned by the array engine
+STATUS_INVALID = -1
+STATUS_NORMAL = 0
+STATUS_ANEMIA = 1
+
+LABEL_NORMAL = "Normal"
+LABEL_ANEMIA = "Kansızlık"
+
+# Cohort code for unknown gender values
+INVALID_CODE = -1
+
+# Cohort table: code -> name and threshold. Aliases map input strings to codes.
+_COHORT_NAMES = ["male", "female"]
+_COHORT_THRESHOLDS = [THRESHOLD_MALE, THRESHOLD_FEMALE]
+_GENDER_ALIASES = {"male": 0, "m": 0, "female": 1, "f": 1}
+
+# Compiled (threshold, label) lookup tables, built on first use and
+# published as one tuple, so a thread never sees one table without the
+# other. The trailing entry of each is the sentinel read by INVALID_CODE
+# (-1), so lookups never need a separate validity branch.
+_TABLES = None
+
+
+def _compiled_tables():
+    """Return the (threshold, label) lookup arrays, compiling them if needed."""
+    global _TABLES
+    tables = _TABLES
+    if tables is None:
+        import numpy as np
+        tables = (np.array(_COHORT_THRESHOLDS + [np.nan]),
+                  np.array([LABEL_NORMAL, LABEL_ANEMIA, None], dtype=object))
+        _TABLES = tables
+    return tables
+
+
+def register_cohort(name, threshold, aliases=()):
+    """
+    Add a threshold cohort (e.g. pregnant women, children) to the table.
+    
+    Args:
+        name (str): Cohort name, also accepted as a gender alias
+        threshold (float): Anemia threshold in g/dL
+        aliases (iterable): Additional input strings mapped to this cohort
+    
+    Returns:
+        int: Cohort code assigned to the new cohort
+    
+    Raises:
+        ValueError: If the name or an alias is already registered
+    """
+    global _TABLES
+    
+    keys = [name.lower().strip()] + [a.lower().strip() for a in aliases]
+    taken = [k for k in keys if k in _GENDER_ALIASES]
+    if taken:
+        raise ValueError(f"Cohort alias already registered: {taken}")
+    if threshold <= 0:
+        raise ValueError(f"Invalid threshold: {threshold}. Must be positive.")
+    
+    code = len(_COHORT_NAMES)
+    _COHORT_NAMES.append(keys[0])
+    _COHORT_THRESHOLDS.append(float(threshold))
+    for key in keys:
+        _GENDER_ALIASES[key] = code
+    
+    # Recompiled on the next array call
+    _TABLES = None
+    return code
+
+
+def encode_gender(genders):
+    """
+    Map gender values to integer cohort codes.
+    
+    Each distinct value is normalized once, so the per-row cost is a single
+    table lookup. Pandas categorical Series reuse their existing codes.
+    
+    Args:
+        genders: Array-like or pandas Series of gender strings
+    
+    Returns:
+        np.ndarray: int16 cohort codes, INVALID_CODE for unknown values
+    """
+    import numpy as np
+    
+    categorical = getattr(genders, 'cat', None)
+    if categorical is not None:
+        categories = np.asarray(categorical.categories, dtype=str)
+        codes = np.asarray(categorical.codes)
+        lut = _alias_codes(categories)
+        # Missing categorical values have code -1
+        return np.where(codes >= 0, lut[codes], INVALID_CODE).astype(np.int16)
+    
+    values = np.asarray(genders, dtype=object).astype(str)
+    uniques, inverse = np.unique(values, return_inverse=True)
+    return _alias_codes(uniques)[inverse.reshape(values.shape)]
+
+
+def _alias_codes(values):
+    """Look up the cohort code of each distinct string value."""
+    import numpy as np
+    return np.array(
+        [_GENDER_ALIASES.get(v.lower().strip(), INVALID_CODE) for v in values],
+        dtype=np.int16
+    )
+
+
+def threshold_lookup(codes):
+    """
+    Get anemia thresholds for an array of cohort codes.
+    
+    Returns:
+        np.ndarray: Thresholds in g/dL, NaN where the code is INVALID_CODE
+    """
+    threshold_table, _ = _compiled_tables()
+    return threshold_table[codes]
+
+
+def anemia_status_codes(predicted_hb, codes):
+    """
+    Apply the clinical rule to whole arrays in one vectorized pass.
+    
+    Args:
+        predicted_hb: Array of Hemoglobin values (g/dL)
+        codes: Cohort codes from encode_gender()
+    
+    Returns:
+        np.ndarray: int8 status codes (STATUS_NORMAL, STATUS_ANEMIA, or
+            STATUS_INVALID for unknown gender, negative or non-finite Hb)
+    """
+    import numpy as np
+    
+    threshold_table, _ = _compiled_tables()
+    predicted_hb = np.asarray(predicted_hb, dtype=float)
+    thresholds = threshold_table[codes]
+    
+    status = (predicted_hb < thresholds).astype(np.int8)
+    # NaN compares False, so this also catches missing Hb and thresholds;
+    # an infinite Hb (from an infinite input) is invalid as well
+    invalid = ~(predicted_hb >= 0) | np.isinf(predicted_hb) | np.isnan(thresholds)
+    status[invalid] = STATUS_INVALID
+    return status
+
+
+def status_labels(status):
+    """
+    Convert status codes to display labels.
+    
+    Returns:
+        np.ndarray: Object array of "Normal" / "Kansızlık", None for invalid
+    """
+    _, label_table = _compiled_tables()
+    return label_table[status]
+
+
+def _gender_code(gender):
+    """Return the cohort code for one gender string, or INVALID_CODE."""
+    return _GENDER_ALIASES.get(gender.lower().strip(), INVALID_CODE)
+
 
 def anemia_decision(predicted_hb, gender):
     """
@@ -28,40 +194,34 @@ def anemia_decision(predicted_hb, gender):
         gender (str): Patient gender ("male", "female", "m", or "f")
     
     Returns:
-        str: "Anemia" or "Normal"
+        str: "Kansızlık" or "Normal"
     
     Raises:
         ValueError: If gender is invalid
         ValueError: If predicted_hb is negative
     
     Clinical Rules:
-        Male   & Hb < 13 g/dL → "Anemia"
-        Female & Hb < 12 g/dL → "Anemia"
+        Male   & Hb < 13 g/dL → "Kansızlık"
+        Female & Hb < 12 g/dL → "Kansızlık"
         Otherwise            → "Normal"
     """
     # Validate hemoglobin value
     if predicted_hb < 0:
         raise ValueError(f"Invalid Hemoglobin value: {predicted_hb}. Must be positive.")
     
-    # Normalize gender input
-    gender_normalized = gender.lower().strip()
-    
     # Determine threshold based on gender
-    if gender_normalized in ["male", "m"]:
-        threshold = THRESHOLD_MALE
-    elif gender_normalized in ["female", "f"]:
-        threshold = THRESHOLD_FEMALE
-    else:
+    code = _gender_code(gender)
+    if code == INVALID_CODE:
         raise ValueError(
             f"Invalid gender: '{gender}'. "
             "Please use 'male', 'female', 'm', or 'f'."
         )
     
     # Apply clinical decision rule
-    if predicted_hb < threshold:
-        return "Kansızlık"
+    if predicted_hb < _COHORT_THRESHOLDS[code]:
+        return LABEL_ANEMIA
     else:
-        return "Normal"
+        return LABEL_NORMAL
 
 
 def get_threshold(gender):
@@ -74,14 +234,10 @@ def get_threshold(gender):
     Returns:
         float: Threshold value in g/dL
     """
-    gender_normalized = gender.lower().strip()
-    
-    if gender_normalized in ["male", "m"]:
-        return THRESHOLD_MALE
-    elif gender_normalized in ["female", "f"]:
-        return THRESHOLD_FEMALE
-    else:
+    code = _gender_code(gender)
+    if code == INVALID_CODE:
         raise ValueError(f"Invalid gender: '{gender}'")
+    return _COHORT_THRESHOLDS[code]
 
 
 def normalize_gender(gender):
@@ -94,11 +250,7 @@ def normalize_gender(gender):
     Returns:
         str: "male" or "female"
     """
-    gender_normalized = gender.lower().strip()
-    
-    if gender_normalized in ["male", "m"]:
-        return "male"
-    elif gender_normalized in ["female", "f"]:
-        return "female"
-    else:
+    code = _gender_code(gender)
+    if code == INVALID_CODE:
         raise ValueError(f"Invalid gender: '{gender}'")
+    return _COHORT_NAMES[code]
@@ -0,0 +1,238 @@
+"""
+Vectorized Input Validation
+
+One rule set for every entry point (predict.py, app.py, train.py,
+daemon.py, serve.py):
+    - required columns must be present
+    - values must not be negative (error)
+    - values should lie within VALID_RANGES (warning only)
+
+validate() compiles the rules for the requested columns into lower and
+upper bound vectors once, then checks a whole (n, c) matrix with a few
+array comparisons, so a million-row batch costs the same handful of
+NumPy operations as a single sample. The ValidationReport it returns
+holds per-row/per-column masks; entry points turn its violations into
+their own messages (console or Streamlit warnings, JSON fields, errors).
+
+A negative value is only reported as negative, not also as out of
+range. Missing values (NaN) are reported under RULE_MISSING but do not
+fail validation; batch scoring leaves such rows unscored. Single-sample
+entry points (predict.py, daemon.py, serve.py) validate strictly: a
+missing or infinite value is an error there.
+
+NumPy is imported on first use, so importing this module stays cheap.
+
+Usage:
+    report = validate(chunk, ['RBC', 'MCV', 'MCH', 'MCHC'])
+    report.raise_for_errors()  # strict=True for a single sample
+    for violation in report.violations(RULE_RANGE):
+        print(f"{violation['column']}={violation['value']} is outside typical range")
+"""
+
+import functools
+
+
+# Valid ranges for blood parameters (soft warnings)
+VALID_RANGES = {
+    'RBC': (2.0, 7.0),     # million cells/mcL
+    'MCV': (60.0, 120.0),  # fL (femtoliters)
+    'MCH': (15.0, 40.0),   # pg (picograms)
+    'MCHC': (25.0, 40.0)   # g/dL
+}
+
+# Rule names used in reports
+RULE_MISSING = 'missing'
+RULE_NEGATIVE = 'negative'
+RULE_RANGE = 'out_of_range'
+RULES = (RULE_MISSING, RULE_NEGATIVE, RULE_RANGE)
+
+
+@functools.lru_cache(maxsize=None)
+def compile_rules(columns):
+    """
+    Bound vectors for a tuple of columns.
+    
+    Columns without a VALID_RANGES entry get unbounded ranges, so only
+    the negativity rule applies to them (e.g. the Hb target).
+    
+    Returns:
+        tuple: (low, high) read-only float arrays in column order
+    """
+    import numpy as np
+    
+    low = np.array([VALID_RANGES.get(col, (-np.inf, np.inf))[0] for col in columns], dtype=float)
+    high = np.array([VALID_RANGES.get(col, (-np.inf, np.inf))[1] for col in columns], dtype=float)
+    low.flags.writeable = False
+    high.flags.writeable = False
+    return low, high
+
+
+def _as_matrix(data, columns):
+    """(n, c) float matrix of the present columns, the present columns and the missing ones."""
+    import numpy as np
+    
+    if hasattr(data, 'columns'):
+        present = [col for col in columns if col in data.columns]
+        values = data[present].to_numpy(dtype=float)
+    elif isinstance(data, dict):
+        present = [col for col in columns if col in data]
+        if present:
+            values = np.column_stack([np.asarray(data[col], dtype=float).reshape(-1)
+                                      for col in present])
+        else:
+            values = np.empty((1, 0))
+    else:
+        # Matrix already in column order
+        present = list(columns)
+        values = np.asarray(data, dtype=float).reshape(-1, len(present))
+    
+    missing = [col for col in columns if col not in present]
+    return values, present, missing
+
+
+class ValidationReport:
+    """
+    Result of validate(): the checked values and one boolean (n, c) mask
+    per rule, with c the present columns (missing_columns lists the rest).
+    """
+    
+    def __init__(self, values, columns, missing_columns, masks, low, high):
+        self.values = values
+        self.columns = list(columns)
+        self.missing_columns = list(missing_columns)
+        self.masks = masks
+        self.low = low
+        self.high = high
+    
+    @property
+    def n_rows(self):
+        return len(self.values)
+    
+    @property
+    def ok(self):
+        """True if no required column is missing and no value is negative."""
+        return not self.missing_columns and not self.masks[RULE_NEGATIVE].any()
+    
+    def rows(self, rule=None):
+        """
+        Rows with at least one violation.
+        
+        Args:
+            rule (str): One of RULES; default: negative or out of range
+        
+        Returns:
+            np.ndarray: (n,) boolean mask
+        """
+        if rule is None:
+            return (self.masks[RULE_NEGATIVE] | self.masks[RULE_RANGE]).any(axis=1)
+        return self.masks[rule].any(axis=1)
+    
+    def counts(self):
+        """Violations per column: {column: {rule: count}}."""
+        totals = {rule: self.masks[rule].sum(axis=0) for rule in RULES}
+        return {
+            col: {rule: int(totals[rule][j]) for rule in RULES}
+            for j, col in enumerate(self.columns)
+        }
+    
+    def violations(self, rule=None, limit=None):
+        """
+        Violating cells in row order.
+        
+        Args:
+            rule (str): One of RULES; default: negative and out of range
+            limit (int): Return at most this many
+        
+        Returns:
+            list: dicts with 'row', 'column', 'value', 'rule', 'min', 'max'
+        """
+        import numpy as np
+        
+        rules = [rule] if rule is not None else [RULE_NEGATIVE, RULE_RANGE]
+        # Rule code per cell: 0 = none, else position in rules + 1
+        codes = np.zeros(self.values.shape, dtype=np.int8)
+        for code, name in enumerate(rules, start=1):
+            codes[self.masks[name]] = code
+        
+        rows, cols = np.nonzero(codes)
+        if limit is not None:
+            rows, cols = rows[:limit], cols[:limit]
+        return [
+            {
+                'row': int(i),
+                'column': self.columns[j],
+                'value': float(self.values[i, j]),
+                'rule': rules[codes[i, j] - 1],
+                'min': float(self.low[j]),
+                'max': float(self.high[j])
+            }
+            for i, j in zip(rows.tolist(), cols.tolist())
+        ]
+    
+    def first_error(self, strict=False):
+        """
+        The first error: a missing required column, else a non-finite
+        value (strict only), else a negative value, in row order.
+        
+        Args:
+            strict (bool): Also treat missing (NaN) and infinite values as
+                errors, as single-sample entry points do
+        
+        Returns:
+            tuple: (row, message), row None for a missing column; or None
+        """
+        import numpy as np
+        
+        if self.missing_columns:
+            return None, f"Missing required columns: {self.missing_columns}"
+        if strict:
+            rows, cols = np.nonzero(~np.isfinite(self.values))
+            if len(rows):
+                i, j = int(rows[0]), int(cols[0])
+                return i, f"{self.columns[j]} must be a finite number: {self.values[i, j]}"
+        negative = self.violations(RULE_NEGATIVE, limit=1)
+        if negative:
+            return negative[0]['row'], f"{negative[0]['column']} cannot be negative: {negative[0]['value']}"
+        return None
+    
+    def raise_for_errors(self, strict=False):
+        """
+        Args:
+            strict (bool): See first_error()
+        
+        Raises:
+            ValueError: With the message of first_error()
+        """
+        error = self.first_error(strict)
+        if error is not None:
+            raise ValueError(error[1])
+
+
+def validate(data, columns):
+    """
+    Check values against the required-column, negativity and range rules.
+    
+    Args:
+        data: DataFrame, dict of column -> scalar or array, or an (n, c)
+            matrix whose columns are in `columns` order
+        columns (list): Required columns
+    
+    Returns:
+        ValidationReport
+    
+    Raises:
+        ValueError: If values cannot be converted to numbers
+    """
+    import numpy as np
+    
+    values, present, missing = _as_matrix(data, columns)
+    low, high = compile_rules(tuple(present))
+    
+    with np.errstate(invalid='ignore'):
+        nan = np.isnan(values)
+        negative = values < 0
+        # NaN compares False everywhere, so it only shows up as missing
+        out_of_range = ((values < low) | (values > high)) & ~negative
+    
+    masks = {RULE_MISSING: nan, RULE_NEGATIVE: negative, RULE_RANGE: out_of_range}
+    return ValidationReport(values, present, missing, masks, low, high)